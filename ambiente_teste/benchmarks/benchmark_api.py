@@ -0,0 +1,296 @@
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+from ambiente_teste.benchmarks.comum import DIRETORIO_RESULTADOS, TOLERANCIA, descrever_ambiente, finalizar_relatorio
+from ambiente_teste.carga.gerador_carga import HistogramaLatencia
+from ambiente_teste.corridas.solicitar_corridas import CIDADE
+from ambiente_teste.em_processo import LADO_GRADE, carregar_carros, importar_api, registrar_grafo_sintetico
+
+CAMINHO_RESULTADO = DIRETORIO_RESULTADOS / "benchmark_api.json"
+CAMINHO_BASELINE = DIRETORIO_RESULTADOS / "benchmark_api_baseline.json"
+
+LINHAS_PADRAO = [1000, 100000, 1000000]
+SEMENTE = 42
+
+# Requisições e concorrência dos cenários de requisição única; as listagens rodam em sequência, REPETICOES vezes
+REQUISICOES = 200
+CONCORRENCIA = 10
+REPETICOES = 5
+LIMITE_PAGINA = 500
+
+# Linhas inseridas por comando na semeadura; motoristas disponíveis (os demais ficam "ocupado", como em produção,
+# senão cada solicitação carregaria todos os motoristas); fração das corridas ainda no status "solicitado"
+TAMANHO_BLOCO = 10000
+CARROS = 50
+MOTORISTAS_DISPONIVEIS = 1000
+FRACAO_SOLICITADAS = 0.10
+PONTOS_ROTA = 10
+
+# Orçamento de p99 (ms) dos endpoints cujo custo não deve crescer com o tamanho das tabelas
+ORCAMENTOS_P99_MS = {
+    "GET /mapas_rotas/coordenadas_aleatorias": 200,
+    "POST /corridas/solicitar": 2000,
+    "PUT /corridas/finalizar_corrida": 500,
+    "GET /mapas_rotas/visualizar_corrida (frio)": 3000,
+    "GET /mapas_rotas/visualizar_corrida (cache)": 200,
+    f"GET /corridas/listar_disponiveis?limite={LIMITE_PAGINA}": 1000,
+}
+
+# Métricas comparadas com a baseline (True = valor maior é pior)
+METRICAS_BASELINE = {"p50_ms": True, "p99_ms": True, "req_por_s": False}
+
+
+# Recria as tabelas e insere "linhas" motoristas, clientes e corridas (mais CARROS carros), em blocos.
+# As corridas usam endereços reais da cidade e uma rota em linha reta com PONTOS_ROTA pontos.
+async def semear_banco(linhas: int, gerador: random.Random) -> dict:
+    from carros.models.carro_model import CarroModel
+    from carros.services.custo_carro import tabela_custos
+    from clientes.models.cliente_model import ClienteModel
+    from core.database import Base, SessionLocal, engine
+    from corridas.models.corrida_model import CorridaModel
+    from corridas.services.contador_demanda import contador_demanda
+    from mapas_rotas.services.amostrador_enderecos import amostrador_enderecos
+    from motoristas.models.motorista_model import MotoristaModel
+    from sqlalchemy import insert
+
+    enderecos = amostrador_enderecos.carregar(CIDADE)
+    solicitadas = max(1, int(linhas * FRACAO_SOLICITADAS))
+    horario_base = datetime(2024, 6, 1)
+
+    def gerar_motorista(i: int) -> dict:
+        return {"nome": f"Motorista {i}", "email": f"motorista{i}@benchmark.com", "telefone": f"8{i:010d}",
+                "cpf": f"{i:011d}", "status": "disponivel" if i < MOTORISTAS_DISPONIVEIS else "ocupado",
+                "id_carro": 1 + i % CARROS}
+
+    def gerar_cliente(i: int) -> dict:
+        return {"nome": f"Cliente {i}", "email": f"cliente{i}@benchmark.com", "telefone": f"7{i:010d}",
+                "cpf": f"{i:011d}"}
+
+    def gerar_corrida(i: int) -> dict:
+        origem, destino = gerador.sample(enderecos, 2)
+        distancia_km = round(gerador.uniform(1.0, 15.0), 2)
+        # Corridas finalizadas já têm os preços calculados. Todas as linhas levam as mesmas chaves: o insert em lote
+        # usa as colunas da primeira linha do bloco e descartaria as demais
+        precos = {"preco_km": None, "preco_total": None, "valor_motorista": None, "nivel_taxa": None}
+        if i >= solicitadas:
+            precos = {
+                "preco_km": 2.0, "preco_total": round(distancia_km * 2.0, 2),
+                "valor_motorista": round(distancia_km * 1.56, 2), "nivel_taxa": gerador.randint(1, 5),
+            }
+        rota = "|".join(
+            f"{origem['latitude'] + (destino['latitude'] - origem['latitude']) * k / (PONTOS_ROTA - 1):.6f},"
+            f"{origem['longitude'] + (destino['longitude'] - origem['longitude']) * k / (PONTOS_ROTA - 1):.6f}"
+            for k in range(PONTOS_ROTA)
+        )
+        return {
+            "origem_rua": origem["nome_rua"], "origem_bairro": origem["bairro"],
+            "origem_latitude": origem["latitude"], "origem_longitude": origem["longitude"],
+            "destino_rua": destino["nome_rua"], "destino_bairro": destino["bairro"],
+            "destino_latitude": destino["latitude"], "destino_longitude": destino["longitude"],
+            "distancia_km": distancia_km, "coordenadas_rota": rota, **precos,
+            "horario_pedido": horario_base + timedelta(seconds=gerador.randint(0, 86399)),
+            "status": "solicitado" if i < solicitadas else "finalizada",
+            # As corridas ativas ficam com os primeiros clientes; os demais podem solicitar
+            "id_cliente": 1 + i % linhas, "id_motorista": 1 + i % linhas,
+        }
+
+    inicio = time.perf_counter()
+    async with engine.begin() as conexao:
+        await conexao.run_sync(Base.metadata.drop_all)
+        await conexao.run_sync(Base.metadata.create_all)
+        await conexao.execute(insert(CarroModel), carregar_carros(CARROS))
+        for modelo, gerar in ((MotoristaModel, gerar_motorista), (ClienteModel, gerar_cliente),
+                              (CorridaModel, gerar_corrida)):
+            for bloco in range(0, linhas, TAMANHO_BLOCO):
+                fim = min(bloco + TAMANHO_BLOCO, linhas)
+                await conexao.execute(insert(modelo), [gerar(i) for i in range(bloco, fim)])
+
+    # Recarrega as tabelas em memória da API a partir do banco novo, como no aquecimento
+    async with SessionLocal() as db:
+        await tabela_custos.carregar(db)
+        await contador_demanda.hidratar(db)
+
+    duracao = time.perf_counter() - inicio
+    return {"linhas": linhas, "corridas_solicitadas": solicitadas, "tempo_semeadura_s": round(duracao, 3)}
+
+
+# Executa as chamadas com "concorrencia" requisições em andamento e mede vazão e latências.
+# Em cenários só de leitura (GET), uma primeira chamada fora da medição aquece caches e consultas compiladas.
+async def medir_cenario(cliente: httpx.AsyncClient, chamadas: list, concorrencia: int = CONCORRENCIA) -> dict:
+    histograma = HistogramaLatencia()
+    contagem_status = {}
+    pendentes = iter(chamadas)
+
+    if all(metodo == "GET" for metodo, _, _ in chamadas):
+        metodo, caminho, opcoes = chamadas[0]
+        await (await cliente.request(metodo, caminho, **opcoes)).aread()
+
+    async def trabalhador():
+        for metodo, caminho, opcoes in pendentes:
+            inicio = time.perf_counter()
+            resposta = await cliente.request(metodo, caminho, **opcoes)
+            await resposta.aread()
+            histograma.registrar(time.perf_counter() - inicio)
+            contagem_status[str(resposta.status_code)] = contagem_status.get(str(resposta.status_code), 0) + 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(min(concorrencia, len(chamadas)))))
+    duracao = time.perf_counter() - inicio
+
+    erros = sum(quantidade for codigo, quantidade in contagem_status.items() if int(codigo) >= 400)
+    return {
+        "requisicoes": len(chamadas),
+        "concorrencia": concorrencia,
+        "req_por_s": round(len(chamadas) / duracao, 3) if duracao else 0.0,
+        **histograma.resumo(),
+        "erros": erros,
+        "status": contagem_status,
+    }
+
+
+# Monta os cenários de um tamanho de banco: (nome, chamadas, concorrência).
+def montar_cenarios(semeadura: dict, gerador: random.Random, requisicoes: int, repeticoes: int) -> list:
+    from mapas_rotas.services.amostrador_enderecos import amostrador_enderecos
+
+    linhas = semeadura["linhas"]
+    solicitadas = semeadura["corridas_solicitadas"]
+
+    # Clientes sem corrida ativa (os seguintes aos das corridas solicitadas) e um par de coordenadas para cada um
+    clientes_livres = list(range(solicitadas + 1, linhas + 1))
+    clientes = gerador.sample(clientes_livres, min(requisicoes, len(clientes_livres)))
+    pares = amostrador_enderecos.sortear_pares(CIDADE, len(clientes), gerador.getrandbits(32))
+    solicitar = [
+        ("POST", "/corridas/solicitar", {"json": {
+            "cliente": {"id_cliente": id_cliente}, "origem": par["origem"], "destino": par["destino"],
+            "horario_pedido": datetime(2024, 6, 1, gerador.randint(0, 23), gerador.randint(0, 59)).isoformat(),
+        }})
+        for id_cliente, par in zip(clientes, pares)
+    ]
+
+    finalizar = [
+        ("PUT", f"/corridas/finalizar_corrida/{corrida_id}", {"json": {
+            "taxa_manutencao": 0.5, "taxa_limpeza": 0.1, "preco_km": 2.0, "valor_motorista": 15.0,
+            "preco_total": 20.0, "nivel_taxa": gerador.randint(1, 5),
+        }})
+        for corrida_id in range(1, min(requisicoes, solicitadas) + 1)
+    ]
+
+    # Mapas de corridas finalizadas diferentes (sem cache) e da mesma corrida (servido do cache)
+    finalizadas = range(solicitadas + 1, linhas + 1)
+    mapas_frios = gerador.sample(finalizadas, min(max(1, requisicoes // 4), len(finalizadas)))
+    visualizar = [("GET", "/mapas_rotas/visualizar_corrida", {"params": {"corrida_id": c}}) for c in mapas_frios]
+
+    listagens = [
+        "/corridas/listar", "/corridas/listar_disponiveis", f"/corridas/listar_disponiveis?limite={LIMITE_PAGINA}",
+        "/clientes/listar/", "/clientes/listar_sem_corrida/", "/motoristas/listar", "/motoristas/listar_disponiveis",
+        "/carros/listar/",
+    ]
+
+    return [
+        ("GET /mapas_rotas/coordenadas_aleatorias",
+         [("GET", "/mapas_rotas/coordenadas_aleatorias", {"params": {"cidade": CIDADE}})] * requisicoes, CONCORRENCIA),
+        ("POST /corridas/solicitar", solicitar, CONCORRENCIA),
+        ("PUT /corridas/finalizar_corrida", finalizar, CONCORRENCIA),
+        ("GET /mapas_rotas/visualizar_corrida (frio)", visualizar, CONCORRENCIA),
+        ("GET /mapas_rotas/visualizar_corrida (cache)", visualizar[:1] * requisicoes, CONCORRENCIA),
+        *((f"GET {caminho}", [("GET", caminho, {})] * repeticoes, 1) for caminho in listagens),
+    ]
+
+
+# Roda o benchmark para cada tamanho de banco, com a API em processo (ASGI) sobre um SQLite temporário.
+async def executar_benchmark(app, tamanhos: list, requisicoes: int = REQUISICOES, repeticoes: int = REPETICOES,
+                             semente: int = SEMENTE) -> dict:
+    resultados = {}
+    semeaduras = []
+    transporte = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+
+    async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark", timeout=None) as cliente:
+        for linhas in tamanhos:
+            gerador = random.Random(semente)
+            print(f"\nSemeando o banco com {linhas} linhas por tabela...")
+            semeadura = await semear_banco(linhas, gerador)
+            semeaduras.append(semeadura)
+            print(f"Banco semeado em {semeadura['tempo_semeadura_s']:.2f} s.")
+
+            for nome, chamadas, concorrencia in montar_cenarios(semeadura, gerador, requisicoes, repeticoes):
+                resultado = await medir_cenario(cliente, chamadas, concorrencia)
+                resultados[f"{linhas}/{nome}"] = resultado
+                print(f"  {nome:<52} {resultado['req_por_s']:>10.1f} req/s  p99 {resultado['p99_ms']:>10.1f} ms  "
+                      f"erros {resultado['erros']}")
+
+    return {
+        "ambiente": descrever_ambiente(httpx=httpx.__version__),
+        "parametros": {"requisicoes": requisicoes, "repeticoes_listagens": repeticoes, "semente": semente,
+                       "semeaduras": semeaduras},
+        "resultados": resultados,
+    }
+
+
+# Lista as medições cujo p99 passou do orçamento do endpoint.
+def verificar_orcamentos(relatorio: dict) -> list:
+    excedidos = []
+    for nome, resultado in relatorio["resultados"].items():
+        orcamento = ORCAMENTOS_P99_MS.get(nome.split("/", 1)[1])
+        if orcamento is not None and resultado["p99_ms"] > orcamento:
+            excedidos.append({"medicao": nome, "p99_ms": resultado["p99_ms"], "orcamento_ms": orcamento})
+    return excedidos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta da API (em processo, SQLite)")
+    parser.add_argument("--linhas", default=",".join(map(str, LINHAS_PADRAO)),
+                        help="Tamanhos do banco (linhas por tabela), separados por vírgula")
+    parser.add_argument("--requisicoes", type=int, default=REQUISICOES, help="Requisições por cenário")
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES, help="Repetições de cada listagem")
+    parser.add_argument("--lado", type=int, default=LADO_GRADE, help="Nós por lado da grade sintética")
+    parser.add_argument("--saida", type=Path, default=CAMINHO_RESULTADO, help="Arquivo JSON com o resultado")
+    parser.add_argument("--baseline", type=Path, default=CAMINHO_BASELINE, help="Arquivo JSON da baseline")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA, help="Piora aceita (0.20 = 20%%)")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Gravar este resultado como nova baseline")
+    args = parser.parse_args()
+
+    # Caminhos resolvidos antes de importar a API (a importação muda o diretório de trabalho para api/)
+    caminho_saida, caminho_baseline = args.saida.resolve(), args.baseline.resolve()
+    tamanhos = [int(valor) for valor in args.linhas.split(",") if valor.strip()]
+
+    with tempfile.TemporaryDirectory(prefix="benchmark_api_") as diretorio:
+        app = importar_api(f"sqlite+aiosqlite:///{Path(diretorio) / 'benchmark.db'}")
+        registrar_grafo_sintetico(args.lado, Path(diretorio))
+        relatorio = asyncio.run(executar_benchmark(app, tamanhos, args.requisicoes, args.repeticoes))
+
+    print("\n📊 BENCHMARK DA API:\n")
+    print(f"{'medição':<62}{'n':>6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'erros':>7}")
+    for nome, r in relatorio["resultados"].items():
+        print(f"{nome:<62}{r['requisicoes']:>6}{r['req_por_s']:>10.1f}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+              f"{r['max_ms']:>10.1f}{r['erros']:>7}")
+
+    relatorio["orcamentos_excedidos"] = verificar_orcamentos(relatorio)
+    for excedido in relatorio["orcamentos_excedidos"]:
+        print(f" [✘] {excedido['medicao']}: p99 {excedido['p99_ms']} ms acima do orçamento de "
+              f"{excedido['orcamento_ms']} ms")
+
+    # Latências de respostas de erro não medem o endpoint: a execução falha e não vira baseline
+    relatorio["cenarios_com_erro"] = [nome for nome, resultado in relatorio["resultados"].items() if resultado["erros"]]
+    for nome in relatorio["cenarios_com_erro"]:
+        print(f" [✘] {nome}: {relatorio['resultados'][nome]['erros']} requisição(ões) com erro "
+              f"{relatorio['resultados'][nome]['status']}")
+    salvar_baseline = args.salvar_baseline and not relatorio["cenarios_com_erro"]
+    if args.salvar_baseline and not salvar_baseline:
+        print(" Baseline não salva: há cenários com erro.")
+
+    regressoes = finalizar_relatorio(relatorio, caminho_saida, caminho_baseline, METRICAS_BASELINE,
+                                     args.tolerancia, salvar_baseline)
+    if regressoes or relatorio["orcamentos_excedidos"] or relatorio["cenarios_com_erro"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+import argparse
+import math
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+import osmnx as ox
+
+from ambiente_teste.benchmarks.comum import DIRETORIO_RESULTADOS, TOLERANCIA, descrever_ambiente, finalizar_relatorio
+from ambiente_teste.carga.gerador_carga import HistogramaLatencia
+from ambiente_teste.corridas.solicitar_corridas import CIDADE
+from ambiente_teste.em_processo import DIRETORIO_API
+
+CAMINHO_RESULTADO = DIRETORIO_RESULTADOS / "benchmark_rotas.json"
+CAMINHO_BASELINE = DIRETORIO_RESULTADOS / "benchmark_rotas_baseline.json"
+
+SEMENTE = 42
+LADOS_PADRAO = [25, 50, 100, 200]
+
+# Pares origem/destino sorteados do CSV de endereços; as rotas usam só os primeiros PARES_ROTAS (cada algoritmo
+# roda todas elas em cada grafo) e o nearest_nodes do OSMnx, que reconstrói a árvore a cada chamada, os
+# primeiros PARES_OSMNX pontos
+PARES = 2000
+PARES_ROTAS = 300
+PARES_OSMNX = 50
+
+# Cargas frias (registro novo, GraphML lido do disco) e quentes (grafo já em memória) de cada grafo
+CARGAS_FRIAS = 3
+CARGAS_QUENTES = 1000
+
+# Diferença relativa aceita entre as distâncias calculadas por cada método e pelo Dijkstra
+TOLERANCIA_DISTANCIA = 1e-9
+
+# Raio da Terra usado pelo OSMnx (ox.distance.great_circle), para a heurística do A* ser compatível com "length"
+RAIO_TERRA_M = 6_371_009
+
+# As medições ficam na casa dos microssegundos, abaixo da faixa padrão do histograma do gerador de carga
+LATENCIA_MINIMA_S = 1e-6
+
+METRICAS_BASELINE = {"p50_ms": True, "p99_ms": True}
+
+
+# Torna os módulos da API importáveis (a partir de api/, como no uvicorn) sem importar a aplicação.
+def preparar_api():
+    if str(DIRETORIO_API) not in sys.path:
+        sys.path.insert(0, str(DIRETORIO_API))
+
+
+# Executa a função uma vez para cada conjunto de argumentos e retorna o histograma das durações.
+def medir(funcao, argumentos) -> HistogramaLatencia:
+    histograma = HistogramaLatencia(minimo_s=LATENCIA_MINIMA_S)
+    for args in argumentos:
+        inicio = time.perf_counter()
+        funcao(*args)
+        histograma.registrar(time.perf_counter() - inicio)
+    return histograma
+
+
+# Heurística do A*: distância em linha reta (haversine) entre dois nós, que nunca supera o comprimento da rota.
+def distancia_reta(grafo):
+    nos = grafo.nodes
+
+    def heuristica(u, v):
+        lat1, lon1, lat2, lon2 = map(math.radians, (nos[u]["y"], nos[u]["x"], nos[v]["y"], nos[v]["x"]))
+        a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        return 2 * RAIO_TERRA_M * math.asin(min(1.0, math.sqrt(a)))
+
+    return heuristica
+
+
+# Algoritmos de caminho mínimo comparados; "dijkstra" é o que o rota_service usa (nx.shortest_path).
+def montar_algoritmos(grafo) -> dict:
+    heuristica = distancia_reta(grafo)
+    return {
+        "dijkstra": lambda o, d: nx.shortest_path(grafo, o, d, weight="length"),
+        "dijkstra bidirecional": lambda o, d: nx.bidirectional_dijkstra(grafo, o, d, weight="length")[1],
+        "a*": lambda o, d: nx.astar_path(grafo, o, d, heuristic=heuristica, weight="length"),
+    }
+
+
+# Mede a carga do GraphML: fria (registro novo, como na primeira chamada de carregar_grafo, com leitura do disco e
+# construção do índice espacial) e quente (grafo já em memória, servido pelo registro).
+def medir_carga(caminho: Path, frias: int, quentes: int) -> tuple:
+    from corridas.services.rota_service import RegistroGrafos
+
+    histograma_frio = HistogramaLatencia(minimo_s=LATENCIA_MINIMA_S)
+    for _ in range(frias):
+        registro = RegistroGrafos(caminho.parent)
+        inicio = time.perf_counter()
+        registro.obter(caminho.stem)
+        histograma_frio.registrar(time.perf_counter() - inicio)
+
+    histograma_quente = medir(registro.obter, [(caminho.stem,)] * quentes)
+    return histograma_frio, histograma_quente, registro
+
+
+# Compara o índice espacial (BallTree construído uma vez) com o ox.distance.nearest_nodes. Empates (pontos à mesma
+# distância de dois nós) não contam como divergência.
+def medir_vizinhos(grafo, indice, latitudes: np.ndarray, longitudes: np.ndarray, pares_osmnx: int) -> tuple:
+    from corridas.services.rota_service import IndiceEspacial
+
+    resultados = {
+        "indice espacial (construção)": medir(IndiceEspacial, [(grafo,)]),
+        "indice espacial (por ponto)": medir(indice.no_mais_proximo, zip(latitudes.tolist(), longitudes.tolist())),
+    }
+
+    inicio = time.perf_counter()
+    nos_indice = indice.no_mais_proximo(latitudes, longitudes)
+    lote = HistogramaLatencia(minimo_s=LATENCIA_MINIMA_S)
+    lote.registrar((time.perf_counter() - inicio) / len(latitudes))
+    resultados["indice espacial (lote, por ponto)"] = lote
+
+    latitudes_osmnx, longitudes_osmnx = latitudes[:pares_osmnx], longitudes[:pares_osmnx]
+    resultados["osmnx nearest_nodes (por ponto)"] = medir(
+        lambda lat, lon: ox.distance.nearest_nodes(grafo, lon, lat),
+        zip(latitudes_osmnx.tolist(), longitudes_osmnx.tolist()),
+    )
+    nos_osmnx = ox.distance.nearest_nodes(grafo, longitudes_osmnx, latitudes_osmnx)
+
+    divergencias = 0
+    for lat, lon, no_indice, no_osmnx in zip(latitudes_osmnx, longitudes_osmnx, nos_indice, nos_osmnx):
+        if no_indice == no_osmnx:
+            continue
+        distancias = [
+            ox.distance.great_circle(lat, lon, grafo.nodes[no]["y"], grafo.nodes[no]["x"])
+            for no in (no_indice, no_osmnx)
+        ]
+        divergencias += abs(distancias[0] - distancias[1]) > 0.01
+
+    return resultados, {"pontos": len(latitudes_osmnx), "divergencias": int(divergencias)}, nos_indice
+
+
+# Mede cada algoritmo nos mesmos pares de nós e confere se as distâncias (soma do menor "length" entre nós
+# consecutivos) coincidem com as do Dijkstra.
+def medir_rotas(grafo, pares_nos: list) -> tuple:
+    resultados = {}
+    distancias = {}
+    for nome, algoritmo in montar_algoritmos(grafo).items():
+        histograma = HistogramaLatencia(minimo_s=LATENCIA_MINIMA_S)
+        distancias[nome] = []
+        for origem, destino in pares_nos:
+            inicio = time.perf_counter()
+            try:
+                rota = algoritmo(origem, destino)
+            except nx.NetworkXNoPath:
+                distancias[nome].append(None)
+                continue
+            histograma.registrar(time.perf_counter() - inicio)
+            distancias[nome].append(nx.path_weight(grafo, rota, "length"))
+        resultados[f"rota {nome}"] = histograma
+
+    concordancia = {}
+    referencias = distancias.pop("dijkstra")
+    for nome, valores in distancias.items():
+        diferencas = [
+            abs(valor - referencia) / max(referencia, 1.0)
+            for valor, referencia in zip(valores, referencias)
+            if valor is not None and referencia is not None
+        ]
+        concordancia[nome] = {
+            "comparadas": len(diferencas),
+            "sem_caminho": sum(valor is None or referencia is None for valor, referencia in zip(valores, referencias)),
+            "maior_diferenca_relativa": max(diferencas, default=0.0),
+            "divergencias": sum(diferenca > TOLERANCIA_DISTANCIA for diferenca in diferencas),
+        }
+    return resultados, concordancia, referencias
+
+
+# Mede o calcular_rota_mais_curta de ponta a ponta (índice espacial + Dijkstra + soma das arestas) com o grafo
+# registrado no registro global, e confere a distância que ele devolve com a do Dijkstra nos mesmos pares.
+def medir_servico(nome_grafo: str, grafo, pares: list, referencias: list) -> tuple:
+    from corridas.services.rota_service import calcular_rota_mais_curta, registro_grafos
+
+    registro_grafos.registrar(nome_grafo, grafo)
+    histograma = HistogramaLatencia(minimo_s=LATENCIA_MINIMA_S)
+    divergencias = comparadas = 0
+    for par, referencia in zip(pares, referencias):
+        origem, destino = par["origem"], par["destino"]
+        inicio = time.perf_counter()
+        try:
+            _, _, distancia_km = calcular_rota_mais_curta(origem["latitude"], origem["longitude"],
+                                                          destino["latitude"], destino["longitude"], nome_grafo)
+        except ValueError:
+            continue
+        histograma.registrar(time.perf_counter() - inicio)
+        if referencia is not None:
+            comparadas += 1
+            divergencias += abs(distancia_km * 1000 - referencia) / max(referencia, 1.0) > TOLERANCIA_DISTANCIA
+    return histograma, {"comparadas": comparadas, "divergencias": int(divergencias)}
+
+
+# Roda todas as medições de um grafo salvo em GraphML e acrescenta os resultados ao relatório.
+def medir_grafo(caminho: Path, pares: list, relatorio: dict, pares_rotas: int, pares_osmnx: int):
+    nome = caminho.stem
+    print(f"\nGrafo '{nome}':")
+
+    histograma_frio, histograma_quente, registro = medir_carga(caminho, CARGAS_FRIAS, CARGAS_QUENTES)
+    grafo, indice = registro.obter_com_indice(nome)
+    medicoes = {"carga fria": histograma_frio, "carga quente": histograma_quente}
+
+    latitudes = np.array([par[ponto]["latitude"] for par in pares for ponto in ("origem", "destino")])
+    longitudes = np.array([par[ponto]["longitude"] for par in pares for ponto in ("origem", "destino")])
+    vizinhos, concordancia_vizinhos, nos = medir_vizinhos(grafo, indice, latitudes, longitudes, pares_osmnx)
+    medicoes.update(vizinhos)
+
+    pares_nos = [(nos[2 * i].item(), nos[2 * i + 1].item()) for i in range(min(pares_rotas, len(pares)))]
+    rotas, concordancia_rotas, referencias = medir_rotas(grafo, pares_nos)
+    medicoes.update(rotas)
+
+    medicoes["calcular_rota_mais_curta"], concordancia_servico = medir_servico(
+        nome, grafo, pares[:len(pares_nos)], referencias)
+
+    for medicao, histograma in medicoes.items():
+        resumo = histograma.resumo()
+        relatorio["resultados"][f"{nome}/{medicao}"] = resumo
+        print(f"  {medicao:<36} n {resumo['amostras']:>6}  p50 {resumo['p50_ms']:>10.3f} ms  "
+              f"p99 {resumo['p99_ms']:>10.3f} ms")
+
+    relatorio["grafos"][nome] = {
+        "nos": grafo.number_of_nodes(),
+        "arestas": grafo.number_of_edges(),
+        **registro.estatisticas()["cidades"][nome],
+    }
+    relatorio["concordancia"][nome] = {
+        "nearest_nodes": concordancia_vizinhos,
+        "rotas": concordancia_rotas,
+        "calcular_rota_mais_curta": concordancia_servico,
+    }
+
+
+# Gera as grades sintéticas (lado x lado nós) sobre o retângulo dos endereços da cidade e as salva em GraphML,
+# para que a carga fria também seja medida a partir do disco.
+def gerar_grades(lados: list, pares: list, diretorio: Path, relatorio: dict) -> list:
+    from corridas.services.rota_service import gerar_grafo_grade
+
+    pontos = [par[ponto] for par in pares for ponto in ("origem", "destino")]
+    bbox = (
+        min(p["latitude"] for p in pontos), min(p["longitude"] for p in pontos),
+        max(p["latitude"] for p in pontos), max(p["longitude"] for p in pontos),
+    )
+
+    caminhos = []
+    for lado in lados:
+        inicio = time.perf_counter()
+        grafo = gerar_grafo_grade(bbox, lado)
+        tempo_geracao = time.perf_counter() - inicio
+        caminho = diretorio / f"grade-{lado}.graphml"
+        ox.save_graphml(grafo, caminho)
+        relatorio["geracao_grades"][caminho.stem] = {"lado": lado, "tempo_geracao_s": round(tempo_geracao, 3)}
+        caminhos.append(caminho)
+    return caminhos
+
+
+# Curva de escala: p50 de cada medição por tamanho de grade.
+def exibir_escala(relatorio: dict):
+    grades = [nome for nome in relatorio["grafos"] if nome in relatorio["geracao_grades"]]
+    if not grades:
+        return
+    medicoes = ["carga fria", "indice espacial (por ponto)", "osmnx nearest_nodes (por ponto)", "rota dijkstra",
+                "rota dijkstra bidirecional", "rota a*", "calcular_rota_mais_curta"]
+
+    print("\n📈 ESCALA DAS GRADES SINTÉTICAS (p50 em ms):\n")
+    print(f"{'medição':<36}" + "".join(f"{nome:>14}" for nome in grades))
+    print(f"{'nós':<36}" + "".join(f"{relatorio['grafos'][nome]['nos']:>14}" for nome in grades))
+    for medicao in medicoes:
+        print(f"{medicao:<36}" + "".join(
+            f"{relatorio['resultados'][f'{nome}/{medicao}']['p50_ms']:>14.3f}" for nome in grades))
+
+
+# Lista as verificações de distância que divergiram.
+def listar_divergencias(relatorio: dict) -> list:
+    divergencias = []
+    for grafo, concordancia in relatorio["concordancia"].items():
+        verificacoes = {
+            "nearest_nodes": concordancia["nearest_nodes"],
+            "calcular_rota_mais_curta": concordancia["calcular_rota_mais_curta"],
+            **{f"rota {nome}": valores for nome, valores in concordancia["rotas"].items()},
+        }
+        divergencias += [
+            {"grafo": grafo, "verificacao": nome, "divergencias": valores["divergencias"]}
+            for nome, valores in verificacoes.items() if valores["divergencias"]
+        ]
+    return divergencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do cálculo de rotas (carga de grafos, nó mais "
+                                                 "próximo e caminho mínimo) em grafos reais e grades sintéticas")
+    parser.add_argument("--graphml", type=Path, nargs="*", default=None,
+                        help="Arquivos GraphML a medir (padrão: os .graphml de api/resources)")
+    parser.add_argument("--lados", default=",".join(map(str, LADOS_PADRAO)),
+                        help="Nós por lado das grades sintéticas, separados por vírgula (vazio: nenhuma)")
+    parser.add_argument("--pares", type=int, default=PARES, help="Pares origem/destino sorteados do CSV")
+    parser.add_argument("--pares-rotas", type=int, default=PARES_ROTAS, help="Pares usados nas rotas")
+    parser.add_argument("--pares-osmnx", type=int, default=PARES_OSMNX, help="Pontos do nearest_nodes do OSMnx")
+    parser.add_argument("--semente", type=int, default=SEMENTE, help="Semente do sorteio dos pares")
+    parser.add_argument("--saida", type=Path, default=CAMINHO_RESULTADO, help="Arquivo JSON com o resultado")
+    parser.add_argument("--baseline", type=Path, default=CAMINHO_BASELINE, help="Arquivo JSON da baseline")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA, help="Piora aceita (0.20 = 20%%)")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Gravar este resultado como nova baseline")
+    args = parser.parse_args()
+
+    preparar_api()
+    from corridas.services.rota_service import RESOURCES_DIR
+    from mapas_rotas.services.amostrador_enderecos import amostrador_enderecos
+
+    pares = amostrador_enderecos.sortear_pares(CIDADE, args.pares, args.semente)
+    lados = [int(valor) for valor in args.lados.split(",") if valor.strip()]
+    caminhos = sorted(RESOURCES_DIR.glob("*.graphml")) if args.graphml is None else args.graphml
+
+    relatorio = {
+        "ambiente": descrever_ambiente(networkx=nx.__version__, osmnx=ox.__version__),
+        "parametros": {"pares": args.pares, "pares_rotas": args.pares_rotas, "pares_osmnx": args.pares_osmnx,
+                       "semente": args.semente, "cargas_frias": CARGAS_FRIAS, "cargas_quentes": CARGAS_QUENTES},
+        "grafos": {},
+        "geracao_grades": {},
+        "concordancia": {},
+        "resultados": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="benchmark_rotas_") as diretorio:
+        caminhos += gerar_grades(lados, pares, Path(diretorio), relatorio)
+        if not caminhos:
+            parser.error("Nenhum GraphML em api/resources e nenhuma grade sintética solicitada.")
+        for caminho in caminhos:
+            medir_grafo(caminho, pares, relatorio, args.pares_rotas, args.pares_osmnx)
+
+    exibir_escala(relatorio)
+
+    relatorio["divergencias"] = listar_divergencias(relatorio)
+    for divergencia in relatorio["divergencias"]:
+        print(f" [✘] {divergencia['grafo']}/{divergencia['verificacao']}: {divergencia['divergencias']} "
+              f"distância(s) diferente(s) da referência")
+
+    regressoes = finalizar_relatorio(relatorio, args.saida, args.baseline, METRICAS_BASELINE, args.tolerancia,
+                                     args.salvar_baseline)
+    if regressoes or relatorio["divergencias"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
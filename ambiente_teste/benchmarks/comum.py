@@ -0,0 +1,80 @@
+import json
+import platform
+from pathlib import Path
+
+DIRETORIO_RESULTADOS = Path(__file__).resolve().parent / "resultados"
+
+TOLERANCIA = 0.20
+
+
+# Versões e máquina em que o benchmark rodou (com as versões extras informadas, ex.: {"networkx": "3.4.2"}).
+def descrever_ambiente(**versoes) -> dict:
+    return {
+        "python": platform.python_version(),
+        **versoes,
+        "plataforma": platform.platform(),
+        "processador": platform.processor() or platform.machine(),
+    }
+
+
+# Compara as medições com a baseline. "metricas" indica, para cada métrica, se o valor maior é pior (True, ex.:
+# latência) ou melhor (False, ex.: vazão); é regressão o que piorou além da tolerância.
+def comparar_com_baseline(atual: dict, baseline: dict, metricas: dict, tolerancia: float = TOLERANCIA) -> list:
+    regressoes = []
+    for nome, valores in atual["resultados"].items():
+        referencia = baseline["resultados"].get(nome)
+        if not referencia:
+            continue
+        for metrica, maior_e_pior in metricas.items():
+            if not referencia.get(metrica) or metrica not in valores:
+                continue
+            valor = valores[metrica]
+            if maior_e_pior:
+                piorou = valor > referencia[metrica] * (1 + tolerancia)
+            else:
+                piorou = valor < referencia[metrica] * (1 - tolerancia)
+            if piorou:
+                regressoes.append({
+                    "medicao": nome,
+                    "metrica": metrica,
+                    "baseline": referencia[metrica],
+                    "atual": valor,
+                    "variacao": round(valor / referencia[metrica] - 1, 4),
+                })
+    return regressoes
+
+
+def salvar_json(dados: dict, caminho: Path):
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(dados, f, indent=4, ensure_ascii=False)
+
+
+def ler_json(caminho: Path) -> dict:
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Compara o relatório com a baseline (ou grava a baseline, com "salvar_baseline"), salva o resultado e lista as
+# regressões. Retorna a lista de regressões para o chamador decidir o código de saída.
+def finalizar_relatorio(relatorio: dict, caminho_saida: Path, caminho_baseline: Path, metricas: dict,
+                        tolerancia: float = TOLERANCIA, salvar_baseline: bool = False) -> list:
+    if salvar_baseline:
+        salvar_json(relatorio, caminho_baseline)
+        print(f"\n Baseline salva em: {caminho_baseline}")
+    elif caminho_baseline.exists():
+        relatorio["tolerancia"] = tolerancia
+        relatorio["regressoes"] = comparar_com_baseline(relatorio, ler_json(caminho_baseline), metricas, tolerancia)
+    else:
+        print(f"\n Baseline não encontrada em {caminho_baseline} (use --salvar-baseline).")
+
+    salvar_json(relatorio, caminho_saida)
+    print(f" Resultado salvo em: {caminho_saida}")
+
+    regressoes = relatorio.get("regressoes", [])
+    for regressao in regressoes:
+        print(f" [✘] {regressao['medicao']}.{regressao['metrica']}: {regressao['baseline']} -> {regressao['atual']} "
+              f"({regressao['variacao']:+.1%})")
+    if "regressoes" in relatorio and not regressoes:
+        print(" [✔] Nenhuma regressão em relação à baseline.")
+    return regressoes
@@ -7,6 +7,7 @@ import requests
 
 # Importações diretas dos scripts de geração de dados
 from data.carros import extrair_tabelas_pbev, tratar_dados
+from ambiente_teste.rastros import gravador
 
 # URL base da API
 API_URL = "http://127.0.0.1:8000"
@@ -14,6 +15,12 @@ API_URL = "http://127.0.0.1:8000"
 # Caminho para o CSV contendo os dados dos carros
 ARQUIVO_CSV = "data/carros/dados_tratados_filtrado.csv"
 
+# Campos obrigatórios no cadastro de carros (linhas sem eles seriam recusadas pela API)
+CAMPOS_OBRIGATORIOS = ["categoria", "marca", "modelo", "motor", "versao", "transmissao", "ar_condicionado", "direcao"]
+
+# Carros enviados por requisição ao endpoint de cadastro em lote
+TAMANHO_LOTE = 2000
+
 
 # Verifica se o arquivo CSV de carros existe ou gera os dados necessários.
 def verificar_ou_gerar_csv():
@@ -28,13 +35,12 @@ def verificar_ou_gerar_csv():
             exit(1)
 
 
-# Converte uma linha do DataFrame em um dicionário, substituindo valores NaN por None.
-def gerar_dados_carro(row: pd.Series) -> dict:
-    row = row.where(pd.notna(row), None)
-    return row.to_dict()
+# Converte o DataFrame em uma lista de dicionários, substituindo valores NaN por None.
+def gerar_dados_carros(df: pd.DataFrame) -> list:
+    return df.astype(object).where(pd.notna(df), None).to_dict("records")
 
 
-# Processa linhas do CSV e envia os dados para a API, retornando o número de carros cadastrados.
+# Lê o CSV e envia os carros à API em lotes, retornando o número de carros cadastrados.
 def cadastrar_carros(quantidade: int = None) -> int:
     try:
         df_carros = pd.read_csv(ARQUIVO_CSV)
@@ -45,16 +51,23 @@ def cadastrar_carros(quantidade: int = None) -> int:
                 return 0
             df_carros = df_carros.head(quantidade)
 
+        validos = df_carros.dropna(subset=CAMPOS_OBRIGATORIOS)
+        if len(validos) < len(df_carros):
+            print(f"⚠️ {len(df_carros) - len(validos)} carros ignorados por falta de campos obrigatórios.")
+
+        carros = gerar_dados_carros(validos)
         total_criados = 0
 
-        for _, row in df_carros.iterrows():
-            carro = gerar_dados_carro(row)
-            response = requests.post(f"{API_URL}/carros/", json=carro)
+        with requests.Session() as sessao:
+            for inicio in range(0, len(carros), TAMANHO_LOTE):
+                lote = carros[inicio:inicio + TAMANHO_LOTE]
+                gravador.registrar("carros", "POST", "/carros/lote", lote)
+                response = sessao.post(f"{API_URL}/carros/lote", json=lote)
 
-            if response.status_code == 201:
-                total_criados += 1
-            elif response.status_code == 422:
-                pass
+                if response.status_code == 200:
+                    total_criados += response.json()["inseridos"]
+                else:
+                    print(f"❌ Erro ao cadastrar lote de carros: {response.status_code} - {response.text}")
 
         return total_criados
 
@@ -5,9 +5,14 @@ import time
 import requests
 from faker import Faker
 
+from ambiente_teste.rastros import gravador
+
 API_URL = "http://127.0.0.1:8000"
 fake = Faker("pt_BR")
 
+# Clientes enviados por requisição ao endpoint de cadastro em lote
+TAMANHO_LOTE = 5000
+
 
 # Formata o número de CPF removendo caracteres especiais.
 def formatar_cpf(cpf: str) -> str:
@@ -25,19 +30,25 @@ def gerar_dados_cliente(status: str = "disponivel") -> dict:
     }
 
 
-# Realiza a criação de clientes na API até atingir o total desejado.
+# Realiza a criação de clientes na API em lotes até atingir o total desejado; as linhas recusadas
+# (ex.: email repetido) são geradas de novo no lote seguinte.
 def criar_clientes(total: int, status: str = "disponivel") -> int:
-
     criados = 0
 
-    while criados < total:
-        cliente = gerar_dados_cliente(status)
-        response = requests.post(f"{API_URL}/clientes/", json=cliente)
-
-        if response.status_code == 201:
-            criados += 1
-        elif response.status_code == 422:
-            continue
+    with requests.Session() as sessao:
+        while criados < total:
+            clientes = [gerar_dados_cliente(status) for _ in range(min(TAMANHO_LOTE, total - criados))]
+            gravador.registrar("clientes", "POST", "/clientes/lote", clientes)
+            response = sessao.post(f"{API_URL}/clientes/lote", json=clientes)
+
+            if response.status_code != 200:
+                print(f"❌ Erro ao cadastrar lote de clientes: {response.status_code} - {response.text}")
+                break
+            inseridos = response.json()["inseridos"]
+            if not inseridos:
+                print("⚠️ Nenhum cliente do lote foi aceito pela API.")
+                break
+            criados += inseridos
 
     return criados
 
@@ -5,9 +5,14 @@ import time
 import requests
 from faker import Faker
 
+from ambiente_teste.rastros import gravador
+
 API_URL = "http://127.0.0.1:8000"
 fake = Faker("pt_BR")
 
+# Motoristas enviados por requisição ao endpoint de cadastro em lote
+TAMANHO_LOTE = 5000
+
 
 # Formata o número de CPF removendo caracteres especiais.
 def formatar_cpf(cpf: str) -> str:
@@ -25,34 +30,38 @@ def gerar_dados_motorista(status: str = "disponivel") -> dict:
     }
 
 
-# Realiza a criação dos motoristas na API com validações.
+# Realiza a criação dos motoristas na API em lotes; as linhas recusadas (ex.: CPF repetido) são geradas de novo.
 def criar_motoristas(total: int, status: str = "disponivel") -> int:
     criados = 0
     tentativas = 0
     MAX_TENTATIVAS = total * 5
 
-    resposta = requests.get(f"{API_URL}/carros/listar/")
-    if resposta.status_code != 200:
-        print(f"❌ Erro ao obter carros. Status: {resposta.status_code}")
-        return criados
-
-    carros = resposta.json()
-    if not carros:
-        print("❌ Nenhum carro cadastrado. Cadastre carros antes.")
-        return criados
-
-    ids_carros = [carro["id"] for carro in carros]
-
-    while criados < total and tentativas < MAX_TENTATIVAS:
-        tentativas += 1
-        motorista = gerar_dados_motorista(status)
-        motorista["id_carro"] = random.choice(ids_carros)
-        response = requests.post(f"{API_URL}/motoristas/", json=motorista)
-
-        if response.status_code == 201:
-            criados += 1
-        elif response.status_code == 422:
-            continue
+    with requests.Session() as sessao:
+        resposta = sessao.get(f"{API_URL}/carros/listar/")
+        if resposta.status_code != 200:
+            print(f"❌ Erro ao obter carros. Status: {resposta.status_code}")
+            return criados
+
+        carros = resposta.json()
+        if not carros or not isinstance(carros, list):
+            print("❌ Nenhum carro cadastrado. Cadastre carros antes.")
+            return criados
+
+        ids_carros = [carro["id"] for carro in carros]
+
+        while criados < total and tentativas < MAX_TENTATIVAS:
+            quantidade = min(TAMANHO_LOTE, total - criados)
+            tentativas += quantidade
+            motoristas = [gerar_dados_motorista(status) for _ in range(quantidade)]
+            for motorista in motoristas:
+                motorista["id_carro"] = random.choice(ids_carros)
+
+            gravador.registrar("motoristas", "POST", "/motoristas/lote", motoristas)
+            response = sessao.post(f"{API_URL}/motoristas/lote", json=motoristas)
+            if response.status_code != 200:
+                print(f"❌ Erro ao cadastrar lote de motoristas: {response.status_code} - {response.text}")
+                break
+            criados += response.json()["inseridos"]
 
     if tentativas >= MAX_TENTATIVAS and criados < total:
         print("⚠️ Limite de tentativas atingido para motoristas.")
@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import time
+from pathlib import Path
+
+import aiohttp
+import numpy as np
+
+from ambiente_teste.corridas.solicitar_corridas import API_URL, TIMEOUT, gerar_horario, obter_pares_coordenadas
+from ambiente_teste.rastros import gravador
+
+RPS_PADRAO = 5.0
+DURACAO_PADRAO_S = 60.0
+CONCORRENCIA_PADRAO = 100
+
+# Faixa e precisão dos histogramas de latência (1 ms a 2 min, ~1% de erro relativo por faixa)
+LATENCIA_MINIMA_S = 0.001
+LATENCIA_MAXIMA_S = 120.0
+PRECISAO_RELATIVA = 0.01
+
+PERCENTIS = [50, 90, 95, 99, 99.9]
+
+
+# Histograma de latências em faixas logarítmicas (no estilo do HdrHistogram): memória fixa e erro relativo
+# limitado pela precisão, sem guardar cada medição. Valores fora da faixa vão para a primeira/última faixa.
+class HistogramaLatencia:
+    def __init__(self, minimo_s: float = LATENCIA_MINIMA_S, maximo_s: float = LATENCIA_MAXIMA_S,
+                 precisao: float = PRECISAO_RELATIVA):
+        self.minimo_s = minimo_s
+        self.razao = math.log1p(precisao)
+        self.contagens = np.zeros(int(math.log(maximo_s / minimo_s) / self.razao) + 2, dtype=np.int64)
+        self.total = 0
+        self.soma_s = 0.0
+        self.menor_s = math.inf
+        self.maior_s = 0.0
+
+    def registrar(self, latencia_s: float):
+        indice = 0 if latencia_s <= self.minimo_s else int(math.log(latencia_s / self.minimo_s) / self.razao) + 1
+        self.contagens[min(indice, len(self.contagens) - 1)] += 1
+        self.total += 1
+        self.soma_s += latencia_s
+        self.menor_s = min(self.menor_s, latencia_s)
+        self.maior_s = max(self.maior_s, latencia_s)
+
+    # Latência do percentil (0-100), pelo limite superior da faixa em que ele cai.
+    def percentil(self, p: float) -> float:
+        if not self.total:
+            return 0.0
+        posicao = max(1, math.ceil(self.total * p / 100))
+        indice = int(np.searchsorted(np.cumsum(self.contagens), posicao))
+        return min(self.minimo_s * math.exp(self.razao * indice), self.maior_s)
+
+    def resumo(self) -> dict:
+        return {
+            "amostras": self.total,
+            "media_ms": round(self.soma_s / self.total * 1000, 3) if self.total else 0.0,
+            "min_ms": round(self.menor_s * 1000, 3) if self.total else 0.0,
+            "max_ms": round(self.maior_s * 1000, 3),
+            **{f"p{p:g}_ms": round(self.percentil(p) * 1000, 3) for p in PERCENTIS},
+        }
+
+
+# Latências e erros por endpoint.
+class Estatisticas:
+    def __init__(self):
+        self.histogramas = {}
+        self.erros = {}
+        self.status = {}
+
+    def registrar(self, endpoint: str, latencia_s: float, status):
+        self.histogramas.setdefault(endpoint, HistogramaLatencia()).registrar(latencia_s)
+        contagem = self.status.setdefault(endpoint, {})
+        contagem[str(status)] = contagem.get(str(status), 0) + 1
+        if not isinstance(status, int) or status >= 400:
+            self.erros[endpoint] = self.erros.get(endpoint, 0) + 1
+
+    def resumo(self) -> dict:
+        return {
+            endpoint: {
+                **histograma.resumo(),
+                "erros": self.erros.get(endpoint, 0),
+                "taxa_erro": round(self.erros.get(endpoint, 0) / histograma.total, 4),
+                "status": self.status[endpoint],
+            }
+            for endpoint, histograma in self.histogramas.items()
+        }
+
+
+# Lê um perfil de taxa de chegada "segundo:rps,segundo:rps,..." (interpolado linearmente entre os pontos).
+def ler_perfil(texto: str) -> list:
+    pontos = sorted((float(t), float(rps)) for t, rps in (item.split(":") for item in texto.split(",") if item))
+    if not pontos:
+        raise ValueError("Perfil de carga vazio.")
+    return pontos
+
+
+# Taxa de chegada (rps) no instante t do perfil.
+def taxa_no_instante(perfil: list, t: float) -> float:
+    tempos, taxas = zip(*perfil)
+    return float(np.interp(t, tempos, taxas))
+
+
+# Gera os instantes de chegada (s desde o início) de um processo de Poisson com taxa variável no tempo,
+# por afinamento (Lewis-Shedler): sorteia chegadas na taxa máxima e aceita cada uma com probabilidade taxa(t)/máxima.
+def gerar_chegadas(perfil: list, duracao_s: float, gerador: random.Random):
+    taxa_maxima = max(rps for _, rps in perfil)
+    if taxa_maxima <= 0:
+        return
+    t = 0.0
+    while True:
+        t += gerador.expovariate(taxa_maxima)
+        if t >= duracao_s:
+            return
+        if gerador.random() * taxa_maxima <= taxa_no_instante(perfil, t):
+            yield t
+
+
+# Executa uma requisição e registra a latência medida a partir de "inicio" (o envio ou o instante agendado da
+# chegada, para que atrasos do próprio gerador ou da fila de conexões apareçam na latência).
+async def requisitar(session: aiohttp.ClientSession, estatisticas: Estatisticas, endpoint: str, metodo: str,
+                     url: str, inicio: float, **kwargs):
+    try:
+        async with session.request(metodo, url, **kwargs) as response:
+            corpo = await response.json(content_type=None) if response.status < 400 else await response.text()
+            estatisticas.registrar(endpoint, time.perf_counter() - inicio, response.status)
+            return response.status, corpo
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        estatisticas.registrar(endpoint, time.perf_counter() - inicio, type(e).__name__)
+        return None, None
+
+
+# Fluxo de uma chegada: solicita a corrida com o próximo par de coordenadas e o próximo cliente da fila.
+async def fluxo_solicitar_corrida(session: aiohttp.ClientSession, estatisticas: Estatisticas, id_cliente: int,
+                                  par: dict, inicio_agendado: float):
+    corrida = {
+        "cliente": {"id_cliente": id_cliente},
+        "origem": par["origem"],
+        "destino": par["destino"],
+        "horario_pedido": gerar_horario(),
+    }
+    gravador.registrar("corridas", "POST", "/corridas/solicitar", corrida)
+    status, _ = await requisitar(
+        session, estatisticas, "POST /corridas/solicitar", "POST", f"{API_URL}/corridas/solicitar",
+        time.perf_counter(), json=corrida
+    )
+    estatisticas.registrar("fluxo solicitar_corrida", time.perf_counter() - inicio_agendado, status)
+
+
+# Gera carga em malha aberta: as chegadas seguem o agendamento (Poisson na taxa do perfil) independentemente do
+# tempo de resposta da API. Quando já há "concorrencia" fluxos em andamento, a chegada é descartada e contada.
+async def executar_carga(perfil: list, duracao_s: float, concorrencia: int = CONCORRENCIA_PADRAO,
+                         semente: int = None) -> dict:
+    gerador = random.Random(semente)
+    estatisticas = Estatisticas()
+    conector = aiohttp.TCPConnector(limit=concorrencia, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+
+    async with aiohttp.ClientSession(connector=conector, timeout=timeout) as session:
+        async with session.get(f"{API_URL}/clientes/listar_sem_corrida/") as response:
+            dados = await response.json(content_type=None) if response.status == 200 else []
+        ids_clientes = [cliente["id"] for cliente in dados] if isinstance(dados, list) else []
+        if not ids_clientes:
+            print("Nenhum cliente disponível. Abortando...")
+            return {}
+        gerador.shuffle(ids_clientes)
+        clientes = itertools.cycle(ids_clientes)
+
+        # Agenda todas as chegadas e busca antes os pares de coordenadas, para que a carga meça só a solicitação
+        chegadas = list(gerar_chegadas(perfil, duracao_s, gerador))
+        pares = await obter_pares_coordenadas(session, len(chegadas), semente)
+        if len(pares) < len(chegadas):
+            print("Coordenadas insuficientes para as chegadas agendadas. Abortando...")
+            return {}
+
+        em_andamento = set()
+        agendadas = descartadas = 0
+        maior_atraso_s = 0.0
+        inicio = time.perf_counter()
+
+        for instante, par in zip(chegadas, pares):
+            espera = inicio + instante - time.perf_counter()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            maior_atraso_s = max(maior_atraso_s, -espera)
+            agendadas += 1
+
+            if len(em_andamento) >= concorrencia:
+                descartadas += 1
+                continue
+            tarefa = asyncio.create_task(fluxo_solicitar_corrida(
+                session, estatisticas, next(clientes), par, inicio + instante
+            ))
+            em_andamento.add(tarefa)
+            tarefa.add_done_callback(em_andamento.discard)
+
+        if em_andamento:
+            await asyncio.gather(*em_andamento)
+        duracao_real = time.perf_counter() - inicio
+
+    return {
+        "parametros": {"perfil": perfil, "duracao_s": duracao_s, "concorrencia": concorrencia, "semente": semente},
+        "chegadas_agendadas": agendadas,
+        "chegadas_descartadas": descartadas,
+        "rps_agendado": round(agendadas / duracao_s, 3),
+        "duracao_real_s": round(duracao_real, 3),
+        "maior_atraso_agendamento_ms": round(maior_atraso_s * 1000, 3),
+        "endpoints": estatisticas.resumo(),
+    }
+
+
+def exibir_relatorio(relatorio: dict):
+    print("\n📈 RELATÓRIO DE CARGA:\n")
+    print(f"Chegadas: {relatorio['chegadas_agendadas']} ({relatorio['rps_agendado']} rps), "
+          f"descartadas por concorrência: {relatorio['chegadas_descartadas']}, "
+          f"maior atraso do agendador: {relatorio['maior_atraso_agendamento_ms']} ms\n")
+    print(f"{'endpoint':<42}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'erros':>8}")
+    for endpoint, r in relatorio["endpoints"].items():
+        print(f"{endpoint:<42}{r['amostras']:>7}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+              f"{r['max_ms']:>10.1f}{r['taxa_erro']:>8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de carga em malha aberta para a solicitação de corridas")
+    parser.add_argument("--rps", type=float, default=RPS_PADRAO, help="Taxa média de chegadas (requisições/s)")
+    parser.add_argument("--perfil", default=None,
+                        help="Taxa variável no tempo: 'segundo:rps,...' (ex.: '0:2,30:20,90:20,120:2')")
+    parser.add_argument("--duracao", type=float, default=DURACAO_PADRAO_S, help="Duração da carga em segundos")
+    parser.add_argument("--concorrencia", type=int, default=CONCORRENCIA_PADRAO,
+                        help="Máximo de fluxos em andamento (e de conexões abertas)")
+    parser.add_argument("--semente", type=int, default=None, help="Semente das chegadas e da ordem dos clientes")
+    parser.add_argument("--saida", type=Path, default=None, help="Arquivo JSON para salvar o relatório")
+    args = parser.parse_args()
+
+    perfil = ler_perfil(args.perfil) if args.perfil else [(0.0, args.rps)]
+    relatorio = asyncio.run(executar_carga(perfil, args.duracao, args.concorrencia, args.semente))
+    if not relatorio:
+        return
+
+    exibir_relatorio(relatorio)
+    if args.saida:
+        args.saida.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=4, ensure_ascii=False)
+        print(f"\n Relatório salvo em: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
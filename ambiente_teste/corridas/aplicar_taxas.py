@@ -1,199 +1,216 @@
 import argparse
 import asyncio
-import json
 import random
 import time
 from datetime import datetime
-from decimal import Decimal
-from pathlib import Path
 
 import aiohttp
 
+from ambiente_teste.carga.gerador_carga import HistogramaLatencia
+from ambiente_teste.rastros import gravador
+
 API_URL = "http://0.0.0.0:8000"
 TIMEOUT = 120
-MAX_CONCORRENTES = 5
-
-# Semáforo para limitar concorrência de requisições simultâneas
-semaforo = asyncio.Semaphore(MAX_CONCORRENTES)
-corridas_disponiveis_global = []
-
-
-# Carrega os níveis de taxas otimizadas a partir de um arquivo JSON
-def carregar_niveis_taxas_otimizadas(caminho: str = None) -> dict:
-    if caminho is None:
-        caminho = Path(__file__).resolve().parent.parent / "data/ml/resultados/niveis_taxas_otimizadas.json"
-    else:
-        caminho = Path(caminho).resolve()
-
-    if not caminho.exists():
-        raise FileNotFoundError(f"Arquivo não encontrado: {caminho}")
-
-    with open(caminho, "r", encoding="utf-8") as f:
-        niveis = json.load(f)
-
-    # Adiciona nível 6 (personalizado) com apenas taxa de manutenção e cancelamento
-    niveis["6"] = {
-        "taxa_manutencao": 1.0,
-        "taxa_limpeza": 0.0,
-        "taxa_pico": 0.0,
-        "taxa_noturna": 0.0,
-        "taxa_excesso_corridas": 0.0,
-        "taxa_cancelamento": 4.0
-    }
-    return niveis
-
-
-NIVEIS_TAXAS_OTIMIZADAS = carregar_niveis_taxas_otimizadas()
-
-
-# Retorna as taxas para um dado nível de taxa
-def obter_taxas_por_nivel_continuo(nivel: int) -> dict:
-    return NIVEIS_TAXAS_OTIMIZADAS.get(str(nivel), NIVEIS_TAXAS_OTIMIZADAS["5"])
-
 
-# Verifica se o horário está dentro de faixas de horário de pico
-def horario_pico(horario: str) -> bool:
-    try:
-        data_hora = datetime.strptime(horario, "%Y-%m-%dT%H:%M:%S.%f%z")
-    except ValueError:
-        data_hora = datetime.strptime(horario, "%Y-%m-%dT%H:%M:%S")
-    hora = data_hora.time()
-    intervalos = [("07:00:00", "08:00:00"), ("12:00:00", "13:00:00"), ("17:30:00", "18:30:00")]
-    return any(
-        datetime.strptime(inicio, "%H:%M:%S").time() <= hora <= datetime.strptime(fim, "%H:%M:%S").time()
-        for inicio, fim in intervalos
-    )
-
-
-# Verifica se é horário noturno (entre 22h e 6h)
-def eh_horario_noturno(horario: str) -> bool:
-    data_hora = datetime.strptime(horario, "%Y-%m-%dT%H:%M:%S")
-    hora = data_hora.time()
-    return hora >= datetime.strptime("22:00:00", "%H:%M:%S").time() or hora <= datetime.strptime("06:00:00",
-                                                                                                 "%H:%M:%S").time()
-
-
-# Verifica se há excesso de corridas em um mesmo horário
-def excesso_de_corridas(horario: str, corridas) -> bool:
-    return sum(1 for corrida in corridas if corrida["horario_pedido"] == horario) > 10
+# Requisições de finalização em andamento ao mesmo tempo (uma por consumidor)
+MAX_CONCORRENTES = 5
+# Corridas por página lida de /corridas/listar_disponiveis e por chamada de /corridas/finalizar_lote
+TAMANHO_PAGINA = 500
+TAMANHO_LOTE = 100
+# Corridas aguardando na fila entre o leitor e os consumidores (o leitor espera quando a fila enche)
+TAMANHO_FILA = 2000
+# Intervalo entre consultas quando não há corridas novas e entre relatórios de atraso (modo contínuo)
+INTERVALO_CONSULTA_S = 1.0
+INTERVALO_RELATORIO_S = 10.0
+# Tentativas de um lote que falhou por inteiro (erro de rede ou status diferente de 200) e espera inicial entre
+# elas, dobrada a cada nova tentativa
+MAX_TENTATIVAS = 3
+ESPERA_TENTATIVA_S = 1.0
+
+# Idade das corridas ao serem finalizadas (até 1 dia)
+IDADE_MAXIMA_S = 24 * 3600
+
+
+# Sorteia o nível de taxa de uma corrida: 10% no nível 6 (cancelamento), o restante entre 1 e 5.
+def sortear_nivel_taxa(gerador: random.Random = random) -> int:
+    return 6 if gerador.random() < 0.10 else gerador.randint(1, 5)
+
+
+# Estado compartilhado pelo leitor e pelos consumidores: contagens, cursor e histogramas de atraso.
+class EstadoConsumo:
+    def __init__(self):
+        self.lidas = 0
+        self.finalizadas = 0
+        self.falhas = 0
+        self.ultimo_id = 0
+        # Idade da corrida (desde a criação na API) e espera local (desde a leitura) ao ser finalizada
+        self.idade = HistogramaLatencia(maximo_s=IDADE_MAXIMA_S)
+        self.espera = HistogramaLatencia(maximo_s=IDADE_MAXIMA_S)
+        self.inicio = time.perf_counter()
+
+    def resumo(self, fila: asyncio.Queue) -> dict:
+        duracao = time.perf_counter() - self.inicio
+        return {
+            "lidas": self.lidas,
+            "finalizadas": self.finalizadas,
+            "falhas": self.falhas,
+            "na_fila": fila.qsize(),
+            "corridas_por_s": round(self.finalizadas / duracao, 2) if duracao else 0.0,
+            "idade_p50_s": round(self.idade.percentil(50), 3),
+            "idade_p99_s": round(self.idade.percentil(99), 3),
+            "espera_p50_s": round(self.espera.percentil(50), 3),
+            "espera_p99_s": round(self.espera.percentil(99), 3),
+        }
 
 
-# Obtém a lista de corridas disponíveis via API
-async def listar_corridas_disponiveis(session):
+# Lê uma página de corridas disponíveis com id maior que "apos_id".
+async def listar_pagina(session: aiohttp.ClientSession, apos_id: int, limite: int = TAMANHO_PAGINA) -> list:
     url = f"{API_URL}/corridas/listar_disponiveis"
-    async with session.get(url, timeout=TIMEOUT) as resposta:
+    async with session.get(url, params={"apos_id": apos_id, "limite": limite}, timeout=TIMEOUT) as resposta:
         if resposta.status == 200:
             dados = await resposta.json()
             return dados.get("corridas_disponiveis", [])
+        print(f"Erro ao listar corridas: {resposta.status} - {await resposta.text()}")
         return []
 
 
-# Calcula o valor da tarifa base por km com base no consumo do veículo
-async def calcular_tarifa_base_por_km(consumo) -> Decimal:
-    preco_combustivel = Decimal("6")  # valor fixo do combustível
-    return preco_combustivel / Decimal(str(consumo)) + Decimal("0.60")
-
-
-# Aplica as taxas a uma corrida específica e envia o resultado via API
-async def aplicar_taxas_corrida(session, todas_corridas):
-    async with semaforo:
-        if not corridas_disponiveis_global:
-            return 0
-
-        corrida = corridas_disponiveis_global.pop(0)
-        id_corrida = corrida["id"]
-        distancia = Decimal(str(corrida["distancia_km"]))
-        horario_pedido = corrida["horario_pedido"]
-        nivel_taxa = 6 if random.random() < 0.10 else random.randint(1, 5)
-        taxas = obter_taxas_por_nivel_continuo(nivel_taxa)
-
-        combustivel = (corrida.get("combustivel") or "").lower()
-        consumo = corrida.get("km_gasolina_cidade", 10) if combustivel in ["gasolina", "flex"] else corrida.get(
-            "km_etanol_cidade", 10)
-
-        taxas_aplicadas = {}
-        taxa_manutencao_fixa = Decimal(str(taxas["taxa_manutencao"]))
-        taxas_aplicadas["taxa_manutencao"] = taxa_manutencao_fixa
-        preco_total = Decimal("0.0")
-
-        if nivel_taxa == 6:
-            # Somente manutenção e cancelamento para o nível 6
-            taxa_cancelamento = Decimal(str(taxas.get("taxa_cancelamento", 0)))
-            taxas_aplicadas["taxa_cancelamento"] = taxa_cancelamento
-            preco_total = taxa_manutencao_fixa + taxa_cancelamento
-        else:
-            tarifa_base = await calcular_tarifa_base_por_km(consumo)
-            if "taxa_limpeza" in taxas:
-                taxas_aplicadas["taxa_limpeza"] = Decimal(str(taxas["taxa_limpeza"]))
-            if horario_pico(horario_pedido):
-                taxas_aplicadas["taxa_pico"] = Decimal(str(taxas["taxa_pico"]))
-            if eh_horario_noturno(horario_pedido):
-                taxas_aplicadas["taxa_noturna"] = Decimal(str(taxas["taxa_noturna"]))
-            if excesso_de_corridas(horario_pedido, todas_corridas):
-                taxas_aplicadas["taxa_excesso_corridas"] = Decimal(str(taxas["taxa_excesso_corridas"]))
-
-            taxas_percentuais = sum([
-                taxas_aplicadas.get("taxa_limpeza", Decimal(0)),
-                taxas_aplicadas.get("taxa_pico", Decimal(0)),
-                taxas_aplicadas.get("taxa_noturna", Decimal(0)),
-                taxas_aplicadas.get("taxa_excesso_corridas", Decimal(0))
-            ])
-
-            preco_por_km = tarifa_base * (1 + taxas_percentuais) + taxa_manutencao_fixa
-            preco_total = preco_por_km * distancia
-
-        # Valor do motorista corresponde a 78% do valor total da corrida
-        valor_motorista = round(preco_total * Decimal("0.78"), 2)
-
-        payload = {
-            **{k: float(v) for k, v in taxas_aplicadas.items()},
-            "valor_motorista": float(valor_motorista),
-            "preco_total": float(preco_total),
-            "preco_km": float(preco_total / distancia) if distancia > 0 else 0,
-            "nivel_taxa": nivel_taxa
-        }
-
-        url = f"{API_URL}/corridas/finalizar_corrida/{id_corrida}"
-        async with session.put(url, json=payload, timeout=TIMEOUT) as resposta:
-            status = resposta.status
-            texto = await resposta.text()
-            if status == 200:
-                print(f"Corrida {id_corrida} finalizada: R$ {preco_total:.2f} (Nível {nivel_taxa})")
-                return 1
-            else:
-                print(f"Corrida {id_corrida} falhou: {status} - {texto}")
-                return 0
-
-
-# Executa a simulação para múltiplas corridas
-async def executar_simulacao_taxas(qtd_corridas: int):
+# Leitor: percorre as corridas disponíveis por cursor (id crescente) e as coloca na fila.
+# Para ao atingir "limite" corridas ou, fora do modo contínuo, quando não há mais páginas; no modo contínuo
+# continua consultando corridas novas até "parar" ser sinalizado.
+async def ler_corridas(session: aiohttp.ClientSession, fila: asyncio.Queue, estado: EstadoConsumo,
+                       parar: asyncio.Event, limite: int = None, continuo: bool = False):
+    while not parar.is_set() and (limite is None or estado.lidas < limite):
+        tamanho = TAMANHO_PAGINA if limite is None else min(TAMANHO_PAGINA, limite - estado.lidas)
+        pagina = await listar_pagina(session, estado.ultimo_id, tamanho)
+
+        for corrida in pagina:
+            corrida["lida_em"] = time.perf_counter()
+            await fila.put(corrida)
+            estado.lidas += 1
+            estado.ultimo_id = corrida["id"]
+
+        if len(pagina) < tamanho:
+            if not continuo:
+                break
+            try:
+                await asyncio.wait_for(parar.wait(), INTERVALO_CONSULTA_S)
+            except asyncio.TimeoutError:
+                pass
+
+
+# Envia um lote a /corridas/finalizar_lote, repetindo com espera crescente enquanto o lote falhar por inteiro.
+# Retorna a resposta da API ou None depois de MAX_TENTATIVAS falhas. Só as chamadas aceitas (status 200) entram no
+# rastro, para que a reprodução envie apenas as finalizações que de fato aconteceram.
+async def finalizar_lote(session: aiohttp.ClientSession, itens: list) -> dict:
+    espera = ESPERA_TENTATIVA_S
+    for tentativa in range(1, MAX_TENTATIVAS + 1):
+        try:
+            async with session.put(f"{API_URL}/corridas/finalizar_lote", json=itens, timeout=TIMEOUT) as resposta:
+                if resposta.status == 200:
+                    dados = await resposta.json()
+                    gravador.registrar("taxas", "PUT", "/corridas/finalizar_lote", itens)
+                    return dados
+                erro = f"{resposta.status} - {await resposta.text()}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            erro = str(e) or type(e).__name__
+        print(f"Lote de {len(itens)} corridas falhou (tentativa {tentativa}/{MAX_TENTATIVAS}): {erro}")
+        if tentativa < MAX_TENTATIVAS:
+            await asyncio.sleep(espera)
+            espera *= 2
+    return None
+
+
+# Consumidor: retira da fila até TAMANHO_LOTE corridas, sorteia o nível de cada uma e as finaliza em uma única
+# chamada a /corridas/finalizar_lote (a API calcula as tarifas). Um lote que falha é repetido pelo próprio consumidor
+# (o cursor do leitor já passou dessas corridas); só contam como falha as corridas que a API não encontrou e as de
+# lotes que esgotaram as tentativas. Um None na fila encerra o consumidor.
+async def consumir_corridas(session: aiohttp.ClientSession, fila: asyncio.Queue, estado: EstadoConsumo):
+    encerrar = False
+    while not encerrar:
+        lote = [await fila.get()]
+        while lote[-1] is not None and len(lote) < TAMANHO_LOTE and not fila.empty():
+            lote.append(fila.get_nowait())
+        if lote[-1] is None:
+            encerrar = True
+            lote.pop()
+
+        if lote:
+            itens = [{"corrida_id": corrida["id"], "nivel_taxa": sortear_nivel_taxa()} for corrida in lote]
+            dados = await finalizar_lote(session, itens)
+
+            finalizadas = {item["corrida_id"] for item in dados["corridas"]} if dados else set()
+            agora, agora_local = datetime.now(), time.perf_counter()
+            for corrida in lote:
+                if corrida["id"] not in finalizadas:
+                    estado.falhas += 1
+                    continue
+                estado.finalizadas += 1
+                estado.espera.registrar(agora_local - corrida["lida_em"])
+                if corrida.get("atualizado_em"):
+                    estado.idade.registrar(max(0.0, (agora - datetime.fromisoformat(corrida["atualizado_em"]))
+                                               .total_seconds()))
+
+
+# Mostra periodicamente a vazão e o atraso do consumo.
+async def relatar_atraso(fila: asyncio.Queue, estado: EstadoConsumo, intervalo_s: float = INTERVALO_RELATORIO_S):
+    while True:
+        await asyncio.sleep(intervalo_s)
+        r = estado.resumo(fila)
+        print(f"[taxas] {r['finalizadas']} finalizadas ({r['corridas_por_s']}/s), {r['na_fila']} na fila, "
+              f"idade p50 {r['idade_p50_s']} s / p99 {r['idade_p99_s']} s")
+
+
+# Aplica as taxas às corridas disponíveis como um consumidor contínuo: um leitor pagina as corridas para uma fila
+# e MAX_CONCORRENTES consumidores as finalizam em lotes. Sem "continuo", processa o que estiver disponível
+# (até qtd_corridas) e termina; com "continuo", acompanha as corridas criadas durante a execução até "duracao_s".
+async def executar_simulacao_taxas(qtd_corridas: int = None, continuo: bool = False, duracao_s: float = None,
+                                   consumidores: int = MAX_CONCORRENTES):
     print("Aplicando taxas nas corridas:")
     inicio = time.time()
-    async with aiohttp.ClientSession() as session:
-        global corridas_disponiveis_global
-        corridas_disponiveis_global = await listar_corridas_disponiveis(session)
-        if not corridas_disponiveis_global:
-            print("Nenhuma corrida disponível.")
-            return
-
-        qtd_alvo = min(qtd_corridas, len(corridas_disponiveis_global))
-        tarefas = [aplicar_taxas_corrida(session, corridas_disponiveis_global) for _ in range(qtd_alvo)]
-        resultados = await asyncio.gather(*tarefas)
-        taxas_aplicadas = sum(resultados)
-
-        tempo_total = time.time() - inicio
-        minutos, segundos = divmod(tempo_total, 60)
-
-        print("\nResumo da aplicação de taxas:")
-        print(f"{taxas_aplicadas}/{qtd_alvo} corridas com taxas aplicadas.")
-        print(f"Tempo total: {int(minutos)} min {segundos:.2f} seg.")
-        print("\nFinalizado!")
-        return taxas_aplicadas
+    fila = asyncio.Queue(maxsize=TAMANHO_FILA)
+    estado = EstadoConsumo()
+    parar = asyncio.Event()
+
+    conector = aiohttp.TCPConnector(limit=consumidores + 1)
+    async with aiohttp.ClientSession(connector=conector) as session:
+        tarefas = [asyncio.create_task(consumir_corridas(session, fila, estado)) for _ in range(consumidores)]
+        relatorio = asyncio.create_task(relatar_atraso(fila, estado)) if continuo else None
+        if duracao_s:
+            asyncio.get_running_loop().call_later(duracao_s, parar.set)
+
+        try:
+            await ler_corridas(session, fila, estado, parar, qtd_corridas, continuo)
+        finally:
+            for _ in tarefas:
+                await fila.put(None)
+            await asyncio.gather(*tarefas)
+            if relatorio:
+                relatorio.cancel()
+
+    if not estado.lidas:
+        print("Nenhuma corrida disponível.")
+        return 0
+
+    tempo_total = time.time() - inicio
+    minutos, segundos = divmod(tempo_total, 60)
+    resumo = estado.resumo(fila)
+
+    print("\nResumo da aplicação de taxas:")
+    print(f"{estado.finalizadas}/{estado.lidas} corridas com taxas aplicadas ({resumo['corridas_por_s']} por segundo).")
+    print(f"Idade das corridas ao finalizar: p50 {resumo['idade_p50_s']} s, p99 {resumo['idade_p99_s']} s "
+          f"(espera local p99 {resumo['espera_p99_s']} s).")
+    print(f"Tempo total: {int(minutos)} min {segundos:.2f} seg.")
+    print("\nFinalizado!")
+    return estado.finalizadas
 
 
 # Ponto de entrada principal para execução via linha de comando
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Aplicar taxas em corridas disponíveis")
-    parser.add_argument("--corridas", type=int, default=1, help="Quantidade de corridas a processar")
+    parser.add_argument("--corridas", type=int, default=None, help="Quantidade máxima de corridas a processar")
+    parser.add_argument("--continuo", action="store_true", help="Continuar consumindo as corridas criadas depois")
+    parser.add_argument("--duracao", type=float, default=None, help="Duração do modo contínuo em segundos")
+    parser.add_argument("--consumidores", type=int, default=MAX_CONCORRENTES, help="Finalizações em paralelo")
     argumentos = parser.parse_args()
-    asyncio.run(executar_simulacao_taxas(argumentos.corridas))
+    asyncio.run(executar_simulacao_taxas(argumentos.corridas, argumentos.continuo, argumentos.duracao,
+                                         argumentos.consumidores))
@@ -1,5 +1,6 @@
 import argparse
 import asyncio
+import itertools
 import random
 import time
 import urllib.parse
@@ -7,26 +8,18 @@ from datetime import datetime, timedelta
 
 import aiohttp
 
+from ambiente_teste.rastros import gravador
+
 API_URL = "http://127.0.0.1:8000"
 CIDADE = "Vitória da Conquista, Bahia"
 TIMEOUT = 120
 MAX_CONCORRENTES = 5
+# Pares de coordenadas por chamada de /mapas_rotas/coordenadas_aleatorias_lote (máximo aceito pela API)
+MAX_PARES_LOTE = 10000
 
 semaforo = asyncio.Semaphore(MAX_CONCORRENTES)
 
 
-# Obtém motoristas disponíveis através da API.
-async def obter_motoristas(session: aiohttp.ClientSession):
-    url = f"{API_URL}/motoristas/listar_disponiveis/"
-    async with session.get(url, timeout=TIMEOUT) as response:
-        if response.status == 200:
-            dados = await response.json()
-            return dados if isinstance(dados, list) else []
-        else:
-            print(f"⚠️ Erro ao buscar motoristas: {response.status} - {await response.text()}")
-            return []
-
-
 # Obtém clientes que ainda não têm corridas vinculadas.
 async def obter_clientes(session: aiohttp.ClientSession):
     url = f"{API_URL}/clientes/listar_sem_corrida/"
@@ -39,14 +32,21 @@ async def obter_clientes(session: aiohttp.ClientSession):
             return []
 
 
-# Obtém coordenadas aleatórias para origem e destino.
-async def obter_coordenadas(session: aiohttp.ClientSession):
-    url = f"{API_URL}/mapas_rotas/coordenadas_aleatorias?cidade={urllib.parse.quote(CIDADE)}"
-    async with session.get(url, timeout=TIMEOUT) as response:
-        if response.status == 200:
-            return await response.json()
-        else:
-            return None
+# Obtém "quantidade" pares de origem e destino aleatórios com chamadas ao endpoint em lote.
+async def obter_pares_coordenadas(session: aiohttp.ClientSession, quantidade: int, semente: int = None) -> list:
+    pares = []
+    while len(pares) < quantidade:
+        parametros = {"cidade": CIDADE, "quantidade": min(MAX_PARES_LOTE, quantidade - len(pares))}
+        if semente is not None:
+            # Uma semente diferente por bloco para não repetir os mesmos pares
+            parametros["semente"] = semente + len(pares)
+        url = f"{API_URL}/mapas_rotas/coordenadas_aleatorias_lote?{urllib.parse.urlencode(parametros)}"
+        async with session.get(url, timeout=TIMEOUT) as response:
+            if response.status != 200:
+                print(f"⚠️ Erro ao buscar coordenadas: {response.status} - {await response.text()}")
+                break
+            pares.extend((await response.json())["pares"])
+    return pares
 
 
 # Gera um horário aleatório entre os intervalos de pico ou horários gerais.
@@ -65,36 +65,18 @@ def gerar_horario():
     return (dt_inicio + timedelta(seconds=segundos)).isoformat()
 
 
-# Envia uma solicitação de corrida para a API com os dados gerados.
-async def solicitar_corrida(session: aiohttp.ClientSession, id_cliente: int):
+# Envia uma solicitação de corrida para a API com um par de coordenadas já sorteado.
+# O motorista é escolhido pela própria API, então não é preciso consultar os motoristas disponíveis.
+async def solicitar_corrida(session: aiohttp.ClientSession, id_cliente: int, par: dict):
     async with semaforo:
-        coordenadas = await obter_coordenadas(session)
-        if not coordenadas:
-            return False
-
-        origem, destino = coordenadas.get("origem"), coordenadas.get("destino")
-        if not origem or not destino:
-            return False
-
-        motoristas = await obter_motoristas(session)
-        if not motoristas:
-            print("⚠️ Nenhum motorista disponível.")
-            return False
-
-        try:
-            id_motorista = random.choice(motoristas)["id"]
-        except Exception as e:
-            print(f"⚠️ Erro ao escolher motorista: {e}")
-            return False
-
         corrida = {
             "cliente": {"id_cliente": id_cliente},
-            "motorista": {"id_motorista": id_motorista},
-            "origem": origem,
-            "destino": destino,
+            "origem": par["origem"],
+            "destino": par["destino"],
             "horario_pedido": gerar_horario()
         }
 
+        gravador.registrar("corridas", "POST", "/corridas/solicitar", corrida)
         url = f"{API_URL}/corridas/solicitar"
         async with session.post(url, json=corrida, timeout=TIMEOUT) as response:
             if response.status != 201:
@@ -114,16 +96,33 @@ async def executar_solicitacoes_corrida(num_corridas: int):
             print("Nenhum cliente disponível. Abortando...")
             return 0
 
+        # Busca de uma vez os pares de coordenadas de todas as tentativas possíveis; a semente dos pares vem do
+        # gerador global, então se repete quando a simulação é semeada
+        MAX_TENTATIVAS = num_corridas * 10
+        pares = await obter_pares_coordenadas(session, min(MAX_TENTATIVAS, num_corridas * 2), random.getrandbits(32))
+        if not pares:
+            print("Nenhuma coordenada disponível. Abortando...")
+            return 0
+
+        # Percorre os clientes em ordem aleatória, sem repetir enquanto houver clientes não usados
+        ids_clientes = [cliente["id"] for cliente in clientes]
+        random.shuffle(ids_clientes)
+        proximos_clientes = itertools.cycle(ids_clientes)
+
         total = 0
         tentativas = 0
-        MAX_TENTATIVAS = num_corridas * 10
 
         while total < num_corridas and tentativas < MAX_TENTATIVAS:
             pendentes = num_corridas - total
-            tarefas = [solicitar_corrida(session, random.choice(clientes)["id"]) for _ in range(pendentes)]
+            if len(pares) < pendentes:
+                pares.extend(await obter_pares_coordenadas(session, pendentes - len(pares), random.getrandbits(32)))
+            lote, pares = pares[:pendentes], pares[pendentes:]
+            tarefas = [solicitar_corrida(session, next(proximos_clientes), par) for par in lote]
             resultados = await asyncio.gather(*tarefas)
             total += sum(resultados)
-            tentativas += pendentes
+            tentativas += len(lote)
+            if not lote:
+                break
 
         fim = time.time() - inicio
         minutos, segundos = divmod(fim, 60)
@@ -1,8 +1,27 @@
+import argparse
+import hashlib
+import json
 import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
+import fitz
 import pandas as pd
 import pdfplumber
 
+DIRETORIO_CACHE = Path(__file__).resolve().parent / "cache_extracao"
+
+# Versão de cada extrator: altere ao mudar a forma de extrair as páginas para invalidar só o cache daquele modo
+VERSOES_EXTRATOR = {"padrao": 1, "2021": 1}
+
+PAGINAS_POR_TAREFA = 4
+
+# Valores decimais (ex.: "10,7" ou "32.6"), presentes em todas as páginas com tabela de consumo
+PADRAO_NUMERO_DECIMAL = re.compile(r"^\d+[.,]\d+$")
+MIN_NUMEROS_TABELA = 1
+
 
 # Remove duplicatas nos nomes das colunas de uma tabela.
 def remover_duplicatas_colunas(colunas):
@@ -21,23 +40,130 @@ def remover_duplicatas_colunas(colunas):
     return resultado
 
 
-# Extrai tabelas padrão do PDF, ajustando colunas e inserindo metadados adicionais.
-def extrair_tabelas_padrão(caminho_pdf: str, ano: int) -> pd.DataFrame:
-    tabelas = []
+# Calcula o hash SHA-256 do PDF (identifica o conteúdo no cache, independentemente do nome do arquivo).
+def calcular_hash_pdf(caminho_pdf) -> str:
+    sha = hashlib.sha256()
+    with open(caminho_pdf, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+# Varredura rápida do texto com o PyMuPDF: retorna as páginas (1..n) que podem conter tabela.
+def paginas_com_tabela(caminho_pdf) -> list:
+    with fitz.open(caminho_pdf) as documento:
+        return [
+            indice + 1
+            for indice, pagina in enumerate(documento)
+            if sum(1 for palavra in pagina.get_text("words") if PADRAO_NUMERO_DECIMAL.match(palavra[4]))
+            >= MIN_NUMEROS_TABELA
+        ]
+
 
+def caminho_cache(hash_pdf: str, modo: str, pagina: int) -> Path:
+    return DIRETORIO_CACHE / hash_pdf[:16] / f"{modo}-v{VERSOES_EXTRATOR[modo]}" / f"{pagina:04d}.json"
+
+
+def ler_cache(hash_pdf: str, modo: str, pagina: int):
+    caminho = caminho_cache(hash_pdf, modo, pagina)
+    if not caminho.exists():
+        return False, None
+    with open(caminho, "r", encoding="utf-8") as f:
+        return True, json.load(f)
+
+
+def salvar_cache(hash_pdf: str, modo: str, pagina: int, resultado):
+    caminho = caminho_cache(hash_pdf, modo, pagina)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_suffix(".tmp")
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+# Tarefa executada no pool: extrai as páginas informadas de um PDF com o pdfplumber.
+# No modo "padrao" guarda a tabela principal da página; no modo "2021", todas as tabelas da página.
+def _extrair_paginas(caminho_pdf: str, modo: str, paginas: list) -> dict:
+    resultados = {}
     with pdfplumber.open(caminho_pdf) as pdf:
-        for indice, pagina in enumerate(pdf.pages):
-            tabela = pagina.extract_table()
-            if tabela:
-                cabecalho = remover_duplicatas_colunas(tabela[0])
-                df = pd.DataFrame(tabela[1:], columns=cabecalho)
-                df["Página"] = indice + 1
-                df["Ano"] = ano
-                tabelas.append(df)
+        for numero in paginas:
+            pagina = pdf.pages[numero - 1]
+            resultados[numero] = pagina.extract_table() if modo == "padrao" else pagina.extract_tables()
+            pagina.close()
+    return resultados
+
+
+# Extrai as páginas de vários PDFs de uma vez, dividindo-as em intervalos distribuídos em um pool de processos.
+# Páginas já extraídas (mesmo hash do PDF, mesma página e mesma versão do extrator) vêm do cache e páginas
+# descartadas pela varredura de texto não são abertas no pdfplumber.
+# Recebe uma lista de (caminho_pdf, modo) e retorna {caminho_pdf: {pagina: resultado}}.
+def extrair_pdfs(pdfs: list, processos: int = None, usar_cache: bool = True) -> dict:
+    resultados = {}
+    tarefas = []
+    hashes = {}
+
+    for caminho_pdf, modo in pdfs:
+        hash_pdf = hashes[caminho_pdf] = calcular_hash_pdf(caminho_pdf)
+        resultados[caminho_pdf] = {}
+        pendentes = []
+        for pagina in paginas_com_tabela(caminho_pdf):
+            encontrado, resultado = ler_cache(hash_pdf, modo, pagina) if usar_cache else (False, None)
+            if encontrado:
+                resultados[caminho_pdf][pagina] = resultado
+            else:
+                pendentes.append(pagina)
+
+        print(f"[+] {os.path.basename(caminho_pdf)}: {len(resultados[caminho_pdf])} páginas em cache, "
+              f"{len(pendentes)} a extrair")
+        for inicio in range(0, len(pendentes), PAGINAS_POR_TAREFA):
+            tarefas.append((caminho_pdf, modo, pendentes[inicio:inicio + PAGINAS_POR_TAREFA]))
+
+    if not tarefas:
+        return resultados
+
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        futuros = {pool.submit(_extrair_paginas, *tarefa): tarefa for tarefa in tarefas}
+        for futuro, (caminho_pdf, modo, _) in futuros.items():
+            for pagina, resultado in futuro.result().items():
+                salvar_cache(hashes[caminho_pdf], modo, pagina, resultado)
+                resultados[caminho_pdf][pagina] = resultado
+
+    return resultados
+
+
+# Monta a tabela padrão de um PDF a partir das páginas extraídas, inserindo página e ano.
+def montar_tabela_padrao(paginas: dict, ano: int) -> pd.DataFrame:
+    tabelas = []
+    for numero in sorted(paginas):
+        tabela = paginas[numero]
+        if tabela:
+            cabecalho = remover_duplicatas_colunas(tabela[0])
+            df = pd.DataFrame(tabela[1:], columns=cabecalho)
+            df["Página"] = numero
+            df["Ano"] = ano
+            tabelas.append(df)
 
     return pd.concat(tabelas, ignore_index=True) if tabelas else pd.DataFrame()
 
 
+# Monta a tabela do PDF de 2021 (estrutura diferente): todas as linhas não vazias, limitadas a 23 colunas.
+def montar_tabela_2021(paginas: dict) -> pd.DataFrame:
+    dados = [
+        linha
+        for numero in sorted(paginas)
+        for tabela in paginas[numero]
+        for linha in tabela
+        if linha and not all(c is None or str(c).strip() == '' for c in linha)
+    ]
+    df = pd.DataFrame(dados)
+    return df[df.columns[:23]]  # Limita ao número esperado de colunas
+
+
+# Extrai tabelas padrão do PDF, ajustando colunas e inserindo metadados adicionais.
+def extrair_tabelas_padrão(caminho_pdf: str, ano: int, processos: int = None) -> pd.DataFrame:
+    return montar_tabela_padrao(extrair_pdfs([(caminho_pdf, "padrao")], processos)[caminho_pdf], ano)
+
+
 # Salva um DataFrame em um arquivo CSV.
 def salvar_como_csv(df: pd.DataFrame, caminho_csv: str):
     df.to_csv(caminho_csv, index=False)
@@ -45,48 +171,53 @@ def salvar_como_csv(df: pd.DataFrame, caminho_csv: str):
 
 
 # Processa PDFs em um diretório para diferentes anos e extrai tabelas padrão.
-def processar_pdfs(caminho_diretorio: str = "./", anos: range = range(2015, 2026)):
+# Todos os anos (incluindo 2021, com o extrator próprio) são extraídos em um único pool de processos.
+def processar_pdfs(caminho_diretorio: str = "./", anos: range = range(2015, 2026), processos: int = None,
+                   usar_cache: bool = True):
+    pdfs = {}
     for ano in anos:
-        if ano == 2021:
-            continue
-
         nome_pdf = f"PBEV-{ano}.pdf"
         caminho_pdf = os.path.join(caminho_diretorio, nome_pdf)
 
         if not os.path.exists(caminho_pdf):
             print(f"[!] Arquivo não encontrado: {nome_pdf}")
             continue
+        pdfs[ano] = caminho_pdf
 
-        print(f"[+] Processando: {nome_pdf}")
-        df = extrair_tabelas_padrão(caminho_pdf, ano)
+    extraidos = extrair_pdfs(
+        [(caminho_pdf, "2021" if ano == 2021 else "padrao") for ano, caminho_pdf in pdfs.items()],
+        processos, usar_cache,
+    )
 
+    for ano, caminho_pdf in pdfs.items():
+        caminho_csv = os.path.join(caminho_diretorio, f"tabela_pbev_{ano}.csv")
+        if ano == 2021:
+            salvar_como_csv(montar_tabela_2021(extraidos[caminho_pdf]), caminho_csv)
+            continue
+
+        df = montar_tabela_padrao(extraidos[caminho_pdf], ano)
         if not df.empty:
-            caminho_csv = os.path.join(caminho_diretorio, f"tabela_pbev_{ano}.csv")
             salvar_como_csv(df, caminho_csv)
         else:
-            print(f"[!] Nenhuma tabela encontrada em {nome_pdf}")
+            print(f"[!] Nenhuma tabela encontrada em {os.path.basename(caminho_pdf)}")
 
 
 # Extrai e salva a tabela específica do PDF de 2021, com uma estrutura diferente.
-def extrair_tabela_2021(caminho_pdf: str, caminho_csv: str = "data/carros/tabela_pbev_2021.csv") -> pd.DataFrame:
-    dados = []
-
-    with pdfplumber.open(caminho_pdf) as pdf:
-        for pagina in pdf.pages:
-            tabelas = pagina.extract_tables()
-            for tabela in tabelas:
-                for linha in tabela:
-                    if linha and not all(c is None or str(c).strip() == '' for c in linha):
-                        dados.append(linha)
-
-    df = pd.DataFrame(dados)
-    df = df[df.columns[:23]]  # Limita ao número esperado de colunas
-
+def extrair_tabela_2021(caminho_pdf: str, caminho_csv: str = "tabela_pbev_2021.csv",
+                        processos: int = None) -> pd.DataFrame:
+    df = montar_tabela_2021(extrair_pdfs([(caminho_pdf, "2021")], processos)[caminho_pdf])
     salvar_como_csv(df, caminho_csv)
     return df
 
 
-# Ponto de entrada principal para processamento dos PDFs e extração específica para 2021.
+# Ponto de entrada principal para processamento dos PDFs (incluindo a extração específica para 2021).
 if __name__ == "__main__":
-    processar_pdfs()
-    extrair_tabela_2021("PBEV-2021.pdf")
+    parser = argparse.ArgumentParser(description="Extrair as tabelas dos PDFs do PBEV")
+    parser.add_argument("--diretorio", default="./", help="Diretório com os PDFs PBEV-<ano>.pdf")
+    parser.add_argument("--processos", type=int, default=None, help="Processos do pool (padrão: CPUs)")
+    parser.add_argument("--sem-cache", action="store_true", help="Extrair todas as páginas novamente")
+    argumentos = parser.parse_args()
+
+    inicio = time.time()
+    processar_pdfs(argumentos.diretorio, processos=argumentos.processos, usar_cache=not argumentos.sem_cache)
+    print(f"\nTempo total: {time.time() - inicio:.2f} segundos")
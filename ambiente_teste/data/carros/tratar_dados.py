@@ -1,7 +1,29 @@
+import argparse
+import hashlib
+import json
 import os
+import time
+from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
+DIRETORIO_CARROS = Path(__file__).resolve().parent
+DIRETORIO_ETAPAS = DIRETORIO_CARROS / "etapas"
+CAMINHO_MANIFESTO = DIRETORIO_ETAPAS / "manifesto.json"
+
+# Versão do tratamento: altere ao mudar alguma etapa para que todas sejam refeitas
+VERSAO_TRATAMENTO = 1
+
+COLUNAS_TEXTO = [
+    'categoria', 'marca', 'modelo', 'motor', 'versao',
+    'transmissao', 'ar_condicionado', 'direcao', 'combustivel'
+]
+COLUNAS_KM = [
+    'km_etanol_cidade', 'km_etanol_estrada',
+    'km_gasolina_cidade', 'km_gasolina_estrada'
+]
+
 
 # Trata dados de acordo com o modelo 1, selecionando e ajustando colunas específicas.
 def tratar_modelo_1(caminho_entrada: str, caminho_saida: str = None) -> pd.DataFrame:
@@ -87,92 +109,112 @@ def tratar_modelo_5(caminho_entrada: str, caminho_saida: str = None) -> pd.DataF
         df.to_csv(caminho_saida, index=False)
     return df
 
-# Une múltiplos arquivos CSV em um único DataFrame.
-def unir_tabelas(arquivos: list, caminho_saida: str = "dados_tratados.csv") -> pd.DataFrame:
+
+# Aplica uma transformação aos valores distintos de uma coluna (e ao valor ausente) em vez de linha a linha,
+# e remonta a coluna a partir dos códigos. Retorna uma Series de objetos com o mesmo índice.
+def transformar_categorias(serie: pd.Series, transformacao) -> pd.Series:
+    serie = serie.astype("category")
+    # O último elemento é o resultado para valores ausentes (código -1)
+    valores = pd.Series(list(serie.cat.categories) + [np.nan], dtype=object)
+    transformados = transformacao(valores).to_numpy(dtype=object)
+    return pd.Series(transformados[serie.cat.codes.to_numpy()], index=serie.index)
+
+
+# Normaliza um texto do PBEV: remove quebras de linha e hifens suaves, espaços nas pontas e caixa alta.
+# Valores ausentes viram "nan", como no tratamento original, para não alterar o CSV final.
+def limpar_texto(valores: pd.Series) -> pd.Series:
+    return (valores.astype(str).str.replace('\n', '', regex=False).str.replace('\xad', '', regex=False)
+            .str.strip().str.lower())
+
+
+# Converte consumos com vírgula decimal em números (inválidos ou ausentes viram 0).
+def converter_numero(valores: pd.Series) -> pd.Series:
+    return pd.to_numeric(valores.astype(str).str.replace(',', '.', regex=False), errors='coerce').fillna(0)
+
+
+# Une as tabelas tratadas (Parquet) em um único DataFrame, mantendo as colunas de texto como categorias.
+def unir_tabelas(arquivos: list, caminho_saida: str = None) -> pd.DataFrame:
     tabelas = []
     for caminho in arquivos:
         if os.path.exists(caminho):
-            print(f"[✔] Lendo: {caminho}")
-            tabela = pd.read_csv(caminho)
-            tabelas.append(tabela)
+            tabelas.append(pd.read_parquet(caminho))
         else:
             print(f"[⚠] Arquivo não encontrado: {caminho}")
 
     if not tabelas:
         raise ValueError("Nenhum arquivo válido foi encontrado.")
 
+    # Cada ano tem as próprias categorias; concatenadas viram objeto e são convertidas de novo
     tabela_final = pd.concat(tabelas, ignore_index=True)
-    tabela_final.to_csv(caminho_saida, index=False)
-    print(f"[✔] Arquivo unido salvo em: {caminho_saida} ({len(tabela_final)} linhas)")
+    for coluna in COLUNAS_TEXTO:
+        tabela_final[coluna] = tabela_final[coluna].astype("category")
+
+    if caminho_saida:
+        salvar_parquet(tabela_final, caminho_saida)
+        print(f"[✔] Arquivo unido salvo em: {caminho_saida} ({len(tabela_final)} linhas)")
     return tabela_final
 
-# Padroniza dados específicos, como combustível e transmissão.
-def padronizar_dados(df: pd.DataFrame, caminho_saida: str = "data/carros/dados_tratados.csv") -> pd.DataFrame:
-    df = df[~df['combustivel'].str.upper().isin(["E", "ELÉTRICO"])]
 
-    df.loc[:, 'ar_condicionado'] = df['ar_condicionado'].map({
-        'S': 'sim',
-        'N': 'não'
-    }).fillna(df['ar_condicionado'])
+# Padroniza dados específicos, como combustível e transmissão, mapeando só os valores distintos de cada coluna.
+def padronizar_dados(df: pd.DataFrame, caminho_saida: str = None) -> pd.DataFrame:
+    df = df[~transformar_categorias(df['combustivel'], lambda valores: valores.str.upper().isin(["E", "ELÉTRICO"]))
+            .astype(bool)].copy()
 
-    combustiveis = {
-        'E': 'elétrico',
-        'G': 'gasolina',
-        'F': 'flex',
-        'D': 'diesel'
+    mapeamentos = {
+        'ar_condicionado': {
+            'S': 'sim',
+            'N': 'não'
+        },
+        'combustivel': {
+            'E': 'elétrico',
+            'G': 'gasolina',
+            'F': 'flex',
+            'D': 'diesel'
+        },
+        'direcao': {
+            'H': 'hidráulica',
+            'M': 'mecânica',
+            'E': 'elétrica',
+            'E-H': 'eletro-hidráulica',
+            'E-h': 'eletro-hidráulica',
+            'E­H': 'eletro-hidráulica'
+        },
+        'transmissao': {
+            'M': 'manual',
+            'A': 'automática',
+            'DCT': 'automática dupla embreagem',
+            'MTA': 'automatizada',
+            'CVT': 'contínua'
+        },
     }
-    df.loc[:, 'combustivel'] = df['combustivel'].map(combustiveis).fillna(df['combustivel'])
-
-    direcoes = {
-        'H': 'hidráulica',
-        'M': 'mecânica',
-        'E': 'elétrica',
-        'E-H': 'eletro-hidráulica',
-        'E-h': 'eletro-hidráulica',
-        'E­H': 'eletro-hidráulica'
-    }
-    df.loc[:, 'direcao'] = df['direcao'].map(direcoes).fillna(df['direcao'])
-
-    transmissoes = {
-        'M': 'manual',
-        'A': 'automática',
-        'DCT': 'automática dupla embreagem',
-        'MTA': 'automatizada',
-        'CVT': 'contínua'
-    }
-    df.loc[:, 'transmissao'] = df['transmissao'].map(transmissoes).fillna(df['transmissao'])
+    for coluna, mapeamento in mapeamentos.items():
+        df[coluna] = transformar_categorias(
+            df[coluna], lambda valores: valores.map(mapeamento).fillna(valores)
+        ).astype("category")
 
-    df.to_csv(caminho_saida, index=False)
-    print(f"[✔] Arquivo padronizado salvo em: {caminho_saida} ({len(df)} linhas)")
+    if caminho_saida:
+        salvar_parquet(df, caminho_saida)
+        print(f"[✔] Arquivo padronizado salvo em: {caminho_saida} ({len(df)} linhas)")
     return df
 
-# Converte valores e ajusta campos textuais do DataFrame.
-def tratar_valores(df: pd.DataFrame) -> pd.DataFrame:
-    colunas_km = [
-        'km_etanol_cidade', 'km_etanol_estrada',
-        'km_gasolina_cidade', 'km_gasolina_estrada'
-    ]
-    for coluna in colunas_km:
-        df.loc[:, coluna] = df[coluna].astype(str).str.replace(',', '.')
-        df.loc[:, coluna] = pd.to_numeric(df[coluna], errors='coerce').fillna(0)
 
-    colunas_texto = [
-        'categoria', 'marca', 'modelo', 'motor', 'versao',
-        'transmissao', 'ar_condicionado', 'direcao', 'combustivel'
-    ]
-    for coluna in colunas_texto:
-        df.loc[:, coluna] = df[coluna].astype(str).str.replace(r'\n', '', regex=True)
-        df.loc[:, coluna] = df[coluna].str.replace(r'\xad', '', regex=True)
-        df.loc[:, coluna] = df[coluna].str.strip().str.lower()
+# Converte valores e ajusta campos textuais do DataFrame, gerando colunas tipadas (categorias e float32).
+def tratar_valores(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    for coluna in COLUNAS_KM:
+        df[coluna] = transformar_categorias(df[coluna], converter_numero).astype("float32")
 
-    df.loc[:, 'transmissao'] = df['transmissao'].fillna('n/d')
-    df.loc[:, 'ar_condicionado'] = df['ar_condicionado'].fillna('n/d')
-    df.loc[:, 'direcao'] = df['direcao'].fillna('não informado')
+    for coluna in COLUNAS_TEXTO:
+        df[coluna] = transformar_categorias(df[coluna], limpar_texto)
 
-    df.loc[:, 'marca'] = df['marca'].replace('vw', 'volkswagen')
+    df['marca'] = df['marca'].replace('vw', 'volkswagen')
+    for coluna in COLUNAS_TEXTO:
+        df[coluna] = df[coluna].astype("category")
+    df['ano'] = df['ano'].astype("int16")
 
     return df
 
+
 # Filtra modelos específicos e salva o resultado.
 def filtrar_modelos(df: pd.DataFrame, modelos: list,
                     caminho_saida: str = "data/carros/dados_tratados_filtrado.csv") -> pd.DataFrame:
@@ -182,7 +224,73 @@ def filtrar_modelos(df: pd.DataFrame, modelos: list,
     return df_filtrado
 
 
-def main():
+# Grava um DataFrame em Parquet por meio de um arquivo temporário, para nunca deixar uma etapa pela metade.
+def salvar_parquet(df: pd.DataFrame, caminho):
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_suffix(".tmp")
+    df.to_parquet(temporario, index=False)
+    os.replace(temporario, caminho)
+
+
+# Calcula a chave de uma etapa a partir das suas entradas (hashes de arquivos, chaves de etapas anteriores,
+# parâmetros) e da versão do tratamento.
+def calcular_chave(*entradas) -> str:
+    conteudo = json.dumps([VERSAO_TRATAMENTO, *entradas], ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def calcular_hash_arquivo(caminho) -> str:
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+# Executa uma etapa do pipeline só se a saída daquela chave ainda não existir.
+# A saída fica em "<nome>-<chave>.parquet"; saídas de chaves anteriores da mesma etapa são removidas.
+def executar_etapa(nome: str, chave: str, gerar, forcar: bool = False) -> Path:
+    caminho = DIRETORIO_ETAPAS / f"{nome}-{chave[:16]}.parquet"
+    if caminho.exists() and not forcar:
+        print(f"[=] {nome}: sem alterações")
+        return caminho
+
+    inicio = time.perf_counter()
+    df = gerar()
+    salvar_parquet(df, caminho)
+    for antigo in DIRETORIO_ETAPAS.glob(f"{nome}-*.parquet"):
+        if antigo != caminho:
+            antigo.unlink()
+    print(f"[✔] {nome}: {len(df)} linhas em {time.perf_counter() - inicio:.2f} s")
+    return caminho
+
+
+def ler_manifesto() -> dict:
+    if not CAMINHO_MANIFESTO.exists():
+        return {}
+    with open(CAMINHO_MANIFESTO, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def salvar_manifesto(manifesto: dict):
+    DIRETORIO_ETAPAS.mkdir(parents=True, exist_ok=True)
+    temporario = CAMINHO_MANIFESTO.with_suffix(".tmp")
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=4)
+    os.replace(temporario, CAMINHO_MANIFESTO)
+
+
+# Etapa de um ano: lê a tabela extraída do PDF, seleciona as colunas, padroniza e converte os valores.
+def tratar_ano(ano: int, funcao_tratar) -> pd.DataFrame:
+    df = funcao_tratar(str(DIRETORIO_CARROS / f"tabela_pbev_{ano}.csv"))
+    return tratar_valores(padronizar_dados(df))
+
+
+# Pipeline de tratamento em etapas: cada ano é tratado separadamente e a união e o filtro dependem só das
+# chaves das etapas anteriores, então alterar o PDF de um ano refaz apenas aquele ano, a união e o filtro.
+# Os intermediários ficam em Parquet tipado em data/carros/etapas; o resultado final continua sendo o CSV filtrado.
+def main(forcar: bool = False):
     tratadores = {
         2015: tratar_modelo_1,
         2016: tratar_modelo_1,
@@ -197,18 +305,6 @@ def main():
         2025: tratar_modelo_5
     }
 
-    arquivos_tratados = []
-
-    for ano, funcao_tratar in tratadores.items():
-        caminho_entrada = f"data/carros/tabela_pbev_{ano}.csv"
-        caminho_saida = f"data/carros/tabela_pbev_{ano}_tratada.csv"
-        funcao_tratar(caminho_entrada, caminho_saida)
-        arquivos_tratados.append(caminho_saida)
-
-    df_unido = unir_tabelas(arquivos_tratados, "data/carros/tabela_pbev_unida.csv")
-    df_padronizado = padronizar_dados(df_unido, "data/carros/tabela_pbev_padronizada.csv")
-    df_tratado = tratar_valores(df_padronizado)
-
     modelos_desejados = [
         'onix', 'argo', 'mobi', 'gol', 'uno', 'logan', 'kwid',
         'hb20', 'hb20s', 'voyage', 'siena', 'versa', 'chery', 'kicks',
@@ -216,9 +312,38 @@ def main():
         'civic', 'yaris', 'spin', 'picanto', 'corolla', 'doblò'
     ]
 
-    df_filtrado = filtrar_modelos(df_tratado, modelos_desejados)
-    print(df_tratado.head())
+    chaves_anos = {}
+    arquivos_tratados = []
+    for ano, funcao_tratar in tratadores.items():
+        caminho_entrada = DIRETORIO_CARROS / f"tabela_pbev_{ano}.csv"
+        chave = calcular_chave("ano", ano, funcao_tratar.__name__, calcular_hash_arquivo(caminho_entrada))
+        chaves_anos[ano] = chave
+        arquivos_tratados.append(executar_etapa(
+            f"tabela_pbev_{ano}_tratada", chave, lambda: tratar_ano(ano, funcao_tratar), forcar
+        ))
+
+    chave_padronizada = calcular_chave("padronizada", chaves_anos)
+    caminho_padronizada = executar_etapa(
+        "tabela_pbev_padronizada", chave_padronizada, lambda: unir_tabelas(arquivos_tratados), forcar
+    )
+
+    caminho_filtrado = DIRETORIO_CARROS / "dados_tratados_filtrado.csv"
+    chave_filtrado = calcular_chave("filtrado", chave_padronizada, modelos_desejados)
+    manifesto = ler_manifesto()
+    if not forcar and caminho_filtrado.exists() and manifesto.get(caminho_filtrado.name) == chave_filtrado:
+        print(f"[=] {caminho_filtrado.name}: sem alterações")
+        return
+
+    filtrar_modelos(pd.read_parquet(caminho_padronizada), modelos_desejados, str(caminho_filtrado))
+    manifesto[caminho_filtrado.name] = chave_filtrado
+    salvar_manifesto(manifesto)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Tratar as tabelas extraídas do PBEV")
+    parser.add_argument("--forcar", action="store_true", help="Refazer todas as etapas, mesmo sem alterações")
+    argumentos = parser.parse_args()
+
+    inicio = time.perf_counter()
+    main(forcar=argumentos.forcar)
+    print(f"\nTempo total: {time.perf_counter() - inicio:.2f} segundos")
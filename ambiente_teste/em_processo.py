@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import cProfile
+import itertools
+import json
+import os
+import pstats
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+import pandas as pd
+
+from ambiente_teste.cadastro.inserir_clientes import gerar_dados_cliente
+from ambiente_teste.cadastro.inserir_motoristas import gerar_dados_motorista
+from ambiente_teste.carga.gerador_carga import Estatisticas, exibir_relatorio
+from ambiente_teste.corridas.aplicar_taxas import TAMANHO_LOTE, sortear_nivel_taxa
+from ambiente_teste.corridas.solicitar_corridas import CIDADE, MAX_CONCORRENTES, gerar_horario
+from ambiente_teste.rastros import semear
+
+DIRETORIO_API = Path(__file__).resolve().parents[1] / "api"
+ARQUIVO_CARROS = Path(__file__).resolve().parent / "data" / "carros" / "dados_tratados_filtrado.csv"
+
+# Nós por lado da grade sintética registrada no lugar do grafo real da cidade
+LADO_GRADE = 60
+LINHAS_PERFIL = 30
+
+
+# Executor que roda o trabalho de asyncio.to_thread no próprio loop: usado com --perfil para que o cálculo de rotas
+# (enviado a threads pelos handlers) apareça no perfil do cProfile, que só observa a thread em que foi ativado.
+class ExecutorNoLoop(ThreadPoolExecutor):
+    def submit(self, fn, /, *args, **kwargs):
+        futuro = Future()
+        try:
+            futuro.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            futuro.set_exception(e)
+        return futuro
+
+
+# Aponta a API para o banco informado e importa a aplicação. Deve rodar antes de qualquer import da API, porque o
+# engine é criado na importação de core.database. A API é importada a partir de api/ (como no uvicorn).
+def importar_api(url_banco: str):
+    os.environ["SQLALCHEMY_ASYNC_DATABASE_URL"] = url_banco
+    os.chdir(DIRETORIO_API)
+    sys.path.insert(0, str(DIRETORIO_API))
+    import main
+    return main.app
+
+
+# Cria as tabelas no banco da simulação.
+async def criar_tabelas():
+    from core.database import Base, engine
+
+    async with engine.begin() as conexao:
+        await conexao.run_sync(Base.metadata.create_all)
+
+
+# Registra uma grade sintética cobrindo os endereços da cidade, para que as rotas sejam calculadas sem o GraphML
+# real. O registro passa a olhar um diretório vazio, então nenhum grafo do disco é carregado.
+def registrar_grafo_sintetico(lado: int, diretorio: Path):
+    from corridas.services.rota_service import gerar_grafo_grade, normalizar_nome_cidade, registro_grafos
+    from mapas_rotas.services.amostrador_enderecos import amostrador_enderecos
+
+    enderecos = amostrador_enderecos.carregar(CIDADE)
+    latitudes = [endereco["latitude"] for endereco in enderecos]
+    longitudes = [endereco["longitude"] for endereco in enderecos]
+    bbox = (min(latitudes), min(longitudes), max(latitudes), max(longitudes))
+
+    inicio = time.perf_counter()
+    grafo = gerar_grafo_grade(bbox, lado)
+    registro_grafos.diretorio = diretorio
+    registro_grafos.registrar(normalizar_nome_cidade(CIDADE), grafo, tempo_carga=time.perf_counter() - inicio)
+    print(f"Grade sintética {lado}x{lado} ({grafo.number_of_edges()} arestas) registrada para '{CIDADE}'.")
+
+
+# Lê os primeiros carros do CSV tratado no formato do cadastro em lote (NaN -> None).
+def carregar_carros(quantidade: int) -> list:
+    df = pd.read_csv(ARQUIVO_CARROS).dropna(subset=["categoria", "marca", "modelo", "motor", "versao"]).head(quantidade)
+    return df.astype(object).where(pd.notna(df), None).to_dict("records")
+
+
+# Envia uma requisição à aplicação e registra a latência por endpoint.
+async def requisitar(cliente: httpx.AsyncClient, estatisticas: Estatisticas, endpoint: str, metodo: str,
+                     caminho: str, **kwargs) -> httpx.Response:
+    inicio = time.perf_counter()
+    resposta = await cliente.request(metodo, caminho, **kwargs)
+    estatisticas.registrar(endpoint, time.perf_counter() - inicio, resposta.status_code)
+    return resposta
+
+
+# Cadastra carros, motoristas e clientes com os mesmos geradores do simulador HTTP.
+async def cadastrar(cliente: httpx.AsyncClient, estatisticas: Estatisticas, carros: int, motoristas: int,
+                    clientes: int) -> dict:
+    await requisitar(cliente, estatisticas, "POST /carros/lote", "POST", "/carros/lote", json=carregar_carros(carros))
+    resposta = await requisitar(cliente, estatisticas, "GET /carros/listar/", "GET", "/carros/listar/")
+    ids_carros = [carro["id"] for carro in resposta.json()] if resposta.status_code == 200 else []
+    if not ids_carros:
+        raise RuntimeError("Nenhum carro cadastrado na simulação.")
+
+    lote = [{**gerar_dados_motorista(), "id_carro": random.choice(ids_carros)} for _ in range(motoristas)]
+    resposta_motoristas = await requisitar(cliente, estatisticas, "POST /motoristas/lote", "POST",
+                                           "/motoristas/lote", json=lote)
+    lote = [gerar_dados_cliente() for _ in range(clientes)]
+    resposta_clientes = await requisitar(cliente, estatisticas, "POST /clientes/lote", "POST", "/clientes/lote",
+                                         json=lote)
+    return {
+        "carros": len(ids_carros),
+        "motoristas": resposta_motoristas.json().get("inseridos", 0),
+        "clientes": resposta_clientes.json().get("inseridos", 0),
+    }
+
+
+# Solicita as corridas com pares de coordenadas buscados de uma vez, até MAX_CONCORRENTES em paralelo.
+async def solicitar_corridas(cliente: httpx.AsyncClient, estatisticas: Estatisticas, quantidade: int) -> int:
+    resposta = await requisitar(cliente, estatisticas, "GET /clientes/listar_sem_corrida/", "GET",
+                                "/clientes/listar_sem_corrida/")
+    ids_clientes = [c["id"] for c in resposta.json()] if resposta.status_code == 200 else []
+    if not ids_clientes:
+        raise RuntimeError("Nenhum cliente disponível na simulação.")
+    random.shuffle(ids_clientes)
+    proximos_clientes = itertools.cycle(ids_clientes)
+
+    parametros = {"cidade": CIDADE, "quantidade": quantidade, "semente": random.getrandbits(32)}
+    resposta = await requisitar(cliente, estatisticas, "GET /mapas_rotas/coordenadas_aleatorias_lote", "GET",
+                                "/mapas_rotas/coordenadas_aleatorias_lote", params=parametros)
+    pares = resposta.json()["pares"]
+
+    semaforo = asyncio.Semaphore(MAX_CONCORRENTES)
+
+    async def solicitar(id_cliente: int, par: dict) -> bool:
+        corrida = {
+            "cliente": {"id_cliente": id_cliente},
+            "origem": par["origem"],
+            "destino": par["destino"],
+            "horario_pedido": gerar_horario(),
+        }
+        async with semaforo:
+            resposta = await requisitar(cliente, estatisticas, "POST /corridas/solicitar", "POST",
+                                        "/corridas/solicitar", json=corrida)
+        return resposta.status_code == 201
+
+    resultados = await asyncio.gather(*(solicitar(next(proximos_clientes), par) for par in pares))
+    return sum(resultados)
+
+
+# Finaliza as corridas disponíveis em lotes, como o consumidor de aplicar_taxas.
+async def aplicar_taxas(cliente: httpx.AsyncClient, estatisticas: Estatisticas) -> int:
+    finalizadas = 0
+    apos_id = 0
+    while True:
+        resposta = await requisitar(cliente, estatisticas, "GET /corridas/listar_disponiveis", "GET",
+                                    "/corridas/listar_disponiveis", params={"apos_id": apos_id, "limite": TAMANHO_LOTE})
+        corridas = resposta.json().get("corridas_disponiveis", []) if resposta.status_code == 200 else []
+        if not corridas:
+            return finalizadas
+        apos_id = corridas[-1]["id"]
+
+        itens = [{"corrida_id": corrida["id"], "nivel_taxa": sortear_nivel_taxa()} for corrida in corridas]
+        resposta = await requisitar(cliente, estatisticas, "PUT /corridas/finalizar_lote", "PUT",
+                                    "/corridas/finalizar_lote", json=itens)
+        if resposta.status_code == 200:
+            finalizadas += len(resposta.json()["corridas"])
+
+
+# Executa a simulação completa contra a aplicação em processo (httpx + ASGITransport, sem rede e sem uvicorn).
+# Com "perfil", as etapas (não a preparação) rodam sob o cProfile e o trabalho em threads roda no próprio loop.
+async def executar_em_processo(app, carros: int, motoristas: int, clientes: int, corridas: int,
+                               perfil: cProfile.Profile = None) -> dict:
+    estatisticas = Estatisticas()
+    # Exceções não tratadas viram respostas 500, como em um servidor real
+    transporte = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    if perfil:
+        asyncio.get_running_loop().set_default_executor(ExecutorNoLoop())
+
+    async with httpx.AsyncClient(transport=transporte, base_url="http://em-processo", timeout=None) as cliente:
+        inicio = time.perf_counter()
+        if perfil:
+            perfil.enable()
+        try:
+            cadastrados = await cadastrar(cliente, estatisticas, carros, motoristas, clientes)
+            solicitadas = await solicitar_corridas(cliente, estatisticas, corridas)
+            finalizadas = await aplicar_taxas(cliente, estatisticas)
+        finally:
+            if perfil:
+                perfil.disable()
+        duracao = time.perf_counter() - inicio
+
+    requisicoes = sum(h.total for h in estatisticas.histogramas.values())
+    return {
+        "parametros": {"carros": carros, "motoristas": motoristas, "clientes": clientes, "corridas": corridas},
+        **cadastrados,
+        "corridas_solicitadas": solicitadas,
+        "corridas_finalizadas": finalizadas,
+        "chegadas_agendadas": requisicoes,
+        "chegadas_descartadas": 0,
+        "rps_agendado": round(requisicoes / duracao, 3) if duracao else 0.0,
+        "duracao_real_s": round(duracao, 3),
+        "maior_atraso_agendamento_ms": 0.0,
+        "endpoints": estatisticas.resumo(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulação completa em processo (ASGI + SQLite, sem servidores)")
+    parser.add_argument("--carros", type=int, default=50, help="Carros cadastrados a partir do CSV tratado")
+    parser.add_argument("--motoristas", type=int, default=200, help="Quantidade de motoristas")
+    parser.add_argument("--clientes", type=int, default=200, help="Quantidade de clientes")
+    parser.add_argument("--corridas", type=int, default=200, help="Quantidade de corridas solicitadas")
+    parser.add_argument("--banco", default=None,
+                        help="URL assíncrona do banco (padrão: arquivo SQLite em um diretório temporário; um SQLite em "
+                             "memória não serve, pois cada conexão veria um banco vazio)")
+    parser.add_argument("--lado", type=int, default=LADO_GRADE, help="Nós por lado da grade sintética")
+    parser.add_argument("--grafo-real", action="store_true",
+                        help="Usar o GraphML da cidade em api/resources em vez da grade sintética")
+    parser.add_argument("--semente", "--seed", type=int, default=None, help="Semente dos geradores aleatórios")
+    parser.add_argument("--perfil", type=Path, default=None,
+                        help="Salvar o perfil do cProfile das etapas (.prof, para snakeviz ou flameprof)")
+    parser.add_argument("--saida", type=Path, default=None, help="Arquivo JSON para salvar o relatório")
+    args = parser.parse_args()
+
+    # Caminhos de saída resolvidos antes de importar a API (a importação muda o diretório de trabalho para api/)
+    caminho_perfil = args.perfil.resolve() if args.perfil else None
+    caminho_saida = args.saida.resolve() if args.saida else None
+    if args.semente is not None:
+        semear(args.semente)
+
+    with tempfile.TemporaryDirectory(prefix="simulacao_") as diretorio:
+        app = importar_api(args.banco or f"sqlite+aiosqlite:///{Path(diretorio) / 'simulacao.db'}")
+        if not args.grafo_real:
+            registrar_grafo_sintetico(args.lado, Path(diretorio))
+        perfil = cProfile.Profile() if caminho_perfil else None
+
+        async def executar():
+            await criar_tabelas()
+            return await executar_em_processo(app, args.carros, args.motoristas, args.clientes, args.corridas, perfil)
+
+        relatorio = asyncio.run(executar())
+
+    exibir_relatorio(relatorio)
+    print(f"\nCadastrados: {relatorio['carros']} carros, {relatorio['motoristas']} motoristas, "
+          f"{relatorio['clientes']} clientes. Corridas: {relatorio['corridas_solicitadas']} solicitadas, "
+          f"{relatorio['corridas_finalizadas']} finalizadas.")
+
+    if perfil:
+        caminho_perfil.parent.mkdir(parents=True, exist_ok=True)
+        perfil.dump_stats(caminho_perfil)
+        # Ordena pelo tempo próprio: em corrotinas o tempo acumulado inclui as suspensões e não indica o custo real
+        print(f"\nFunções com maior tempo próprio (perfil completo em {caminho_perfil}):")
+        pstats.Stats(perfil).strip_dirs().sort_stats("tottime").print_stats(LINHAS_PERFIL)
+    if caminho_saida:
+        caminho_saida.parent.mkdir(parents=True, exist_ok=True)
+        with open(caminho_saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=4, ensure_ascii=False)
+        print(f"\n Relatório salvo em: {caminho_saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,15 @@
 import argparse
 import asyncio
 import time
+from pathlib import Path
 
+from ambiente_teste.carga.gerador_carga import executar_carga, exibir_relatorio
 from ambiente_teste.cadastro.inserir_carros import run_inserir_carros
 from ambiente_teste.cadastro.inserir_clientes import run_inserir_clientes
 from ambiente_teste.cadastro.inserir_motoristas import run_inserir_motoristas
 from ambiente_teste.corridas.aplicar_taxas import executar_simulacao_taxas
 from ambiente_teste.corridas.solicitar_corridas import executar_solicitacoes_corrida
+from ambiente_teste.rastros import gravador, reproduzir_rastro, semear
 
 # Função principal para executar a simulação completa de forma sequencial.
 def main():
@@ -15,18 +18,49 @@ def main():
     parser.add_argument("--motoristas", type=int, default=10, help="Quantidade de motoristas a serem cadastrados")
     parser.add_argument("--clientes", type=int, default=10, help="Quantidade de clientes a serem cadastrados")
     parser.add_argument("--corridas", type=int, default=5, help="Quantidade de corridas a serem solicitadas")
+    parser.add_argument("--rps", type=float, default=None,
+                        help="Solicitar corridas em malha aberta nesta taxa (req/s) em vez de uma quantidade fixa")
+    parser.add_argument("--duracao", type=float, default=60.0, help="Duração da carga em segundos (com --rps)")
     parser.add_argument("--taxas", type=int, default=5, help="Quantidade de corridas a aplicar taxas")
+    parser.add_argument("--semente", "--seed", type=int, default=None,
+                        help="Semente dos geradores aleatórios (execuções com a mesma semente geram os mesmos dados)")
+    parser.add_argument("--gravar", type=Path, default=None,
+                        help="Gravar as requisições enviadas em um rastro .ndjson.gz para reprodução")
+    parser.add_argument("--reproduzir", type=Path, default=None,
+                        help="Reproduzir um rastro gravado em vez de gerar uma nova simulação")
+    parser.add_argument("--velocidade", type=float, default=1.0,
+                        help="Multiplicador da velocidade do rastro reproduzido (0 = o mais rápido possível)")
     args = parser.parse_args()
 
+    if args.reproduzir:
+        print(f"\n Reproduzindo o rastro {args.reproduzir} (velocidade {args.velocidade:g}x)...\n")
+        exibir_relatorio(asyncio.run(reproduzir_rastro(args.reproduzir, velocidade=args.velocidade)))
+        return
+
+    if args.semente is not None:
+        semear(args.semente)
+    if args.gravar:
+        gravador.abrir(args.gravar, args.semente)
+
     print("\n Iniciando simulação completa...\n")
     inicio_geral = time.time()
 
     # Executa cada etapa da simulação
-    carros_criados = run_inserir_carros(quantidade=args.carros)
-    motoristas_criados = run_inserir_motoristas(total=args.motoristas)
-    clientes_criados = run_inserir_clientes(total=args.clientes)
-    corridas_criadas = asyncio.run(executar_solicitacoes_corrida(args.corridas))
-    corridas_taxadas = asyncio.run(executar_simulacao_taxas(args.taxas))
+    try:
+        carros_criados = run_inserir_carros(quantidade=args.carros)
+        motoristas_criados = run_inserir_motoristas(total=args.motoristas)
+        clientes_criados = run_inserir_clientes(total=args.clientes)
+        if args.rps:
+            relatorio = asyncio.run(executar_carga([(0.0, args.rps)], args.duracao, semente=args.semente))
+            if relatorio:
+                exibir_relatorio(relatorio)
+            solicitacoes = relatorio.get("endpoints", {}).get("POST /corridas/solicitar", {})
+            corridas_criadas = solicitacoes.get("status", {}).get("201", 0)
+        else:
+            corridas_criadas = asyncio.run(executar_solicitacoes_corrida(args.corridas))
+        corridas_taxadas = asyncio.run(executar_simulacao_taxas(args.taxas))
+    finally:
+        gravador.fechar()
 
     # Calcula o tempo total da simulação
     duracao_total = time.time() - inicio_geral
@@ -37,6 +71,8 @@ def main():
     print(f"✔️ Carros: {carros_criados}, Clientes: {clientes_criados}, Motoristas: {motoristas_criados}")
     print(f"✔️ Corridas: {corridas_criadas}, Taxas aplicadas: {corridas_taxadas}")
     print(f"⏱️ Tempo total: {int(minutos)} min {segundos:.2f} seg.\n")
+    if args.gravar:
+        print(f"📼 Rastro com {gravador.eventos} requisições salvo em: {args.gravar}\n")
 
 
 if __name__ == "__main__":
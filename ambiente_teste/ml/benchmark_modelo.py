@@ -0,0 +1,154 @@
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from ambiente_teste.benchmarks.comum import TOLERANCIA, descrever_ambiente, finalizar_relatorio
+from ambiente_teste.ml.taxas_corrida_ml import (
+    CAMINHO_DATASET, DIRETORIO_FEATURES, DIRETORIO_ML, FEATURES, INTERVALOS_TAXAS, TARGET,
+    buscar_melhores_configuracoes, carregar_dataset, treinar_modelo
+)
+
+CAMINHO_RESULTADO = DIRETORIO_ML / "resultados" / "benchmark_modelo.json"
+CAMINHO_BASELINE = DIRETORIO_ML / "resultados" / "benchmark_modelo_baseline.json"
+
+TAMANHOS_LOTE = [1000, 10000, 100000]
+SIMULACOES_BUSCA = 200000
+REPETICOES = 5
+SEMENTE = 42
+
+# Métricas comparadas com a baseline (ficar mais lento ou usar mais memória é pior)
+METRICAS_BASELINE = {"tempo_s": True, "memoria_pico_mb": True}
+
+
+# Gera um dataset sintético reprodutível no formato do dataset_treino.csv (vírgula decimal), para que o benchmark
+# rode mesmo sem os dados simulados. O preço segue a fórmula da tarifa com ruído.
+def gerar_dataset_sintetico(caminho: Path, linhas: int = 20000, semente: int = SEMENTE):
+    gerador = np.random.default_rng(semente)
+    taxas = {
+        taxa: gerador.uniform(minimo, maximo, linhas)
+        for taxa, (minimo, maximo) in INTERVALOS_TAXAS.items()
+    }
+    distancia = gerador.uniform(1.0, 15.0, linhas)
+    aplicadas = {
+        "taxa_pico": taxas["taxa_pico"] * (gerador.random(linhas) < 0.25),
+        "taxa_noturna": taxas["taxa_noturna"] * (gerador.random(linhas) < 0.3),
+        "taxa_excesso_corridas": taxas["taxa_excesso_corridas"] * (gerador.random(linhas) < 0.1),
+    }
+    percentuais = taxas["taxa_limpeza"] + sum(aplicadas.values())
+    preco_total = ((6 / 10 + 0.6) * (1 + percentuais) + taxas["taxa_manutencao"]) * distancia
+    preco_total *= gerador.normal(1.0, 0.02, linhas)
+
+    df = pd.DataFrame({
+        **{taxa: np.round(valores, 4) for taxa, valores in taxas.items()},
+        **{taxa: np.round(valores, 4) for taxa, valores in aplicadas.items()},
+        "preco_total": np.round(preco_total, 2),
+        "valor_motorista": np.round(preco_total * 0.78, 2),
+    })
+    df.astype(str).apply(lambda coluna: coluna.str.replace(".", ",")).to_csv(caminho, index=False)
+
+
+# Executa a função uma vez com tracemalloc (pico de memória) e depois "repeticoes" vezes só cronometrando.
+# Retorna o resultado da última execução e as métricas.
+def medir(funcao, repeticoes: int = REPETICOES):
+    tracemalloc.start()
+    resultado = funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    return resultado, {
+        "tempo_s": round(statistics.median(tempos), 6),
+        "tempo_min_s": round(min(tempos), 6),
+        "repeticoes": repeticoes,
+        "memoria_pico_mb": round(pico / 1024 / 1024, 3),
+    }
+
+
+# Roda todas as medições: carga do dataset, treino, predict de uma linha, predict em lotes e busca de níveis.
+def executar_benchmark(caminho_dataset: Path, tamanhos_lote: list = TAMANHOS_LOTE,
+                       simulacoes: int = SIMULACOES_BUSCA, repeticoes: int = REPETICOES) -> dict:
+    resultados = {}
+
+    df, resultados["carregar_dataset"] = medir(lambda: carregar_dataset(caminho_dataset), repeticoes)
+    modelo, resultados["treinar_modelo"] = medir(lambda: treinar_modelo(df), max(1, repeticoes // 2))
+
+    gerador = np.random.default_rng(SEMENTE)
+    minimos = np.array([INTERVALOS_TAXAS[taxa][0] for taxa in FEATURES])
+    maximos = np.array([INTERVALOS_TAXAS[taxa][1] for taxa in FEATURES])
+
+    uma_linha = pd.DataFrame([gerador.uniform(minimos, maximos)], columns=FEATURES)
+    _, resultados["predict_1"] = medir(lambda: modelo.predict(uma_linha), repeticoes * 10)
+
+    for tamanho in tamanhos_lote:
+        lote = pd.DataFrame(gerador.uniform(minimos, maximos, (tamanho, len(FEATURES))), columns=FEATURES)
+        _, resultados[f"predict_{tamanho}"] = medir(lambda: modelo.predict(lote), repeticoes)
+
+    _, resultados["busca_niveis"] = medir(
+        lambda: buscar_melhores_configuracoes(modelo, simulacoes, semente=SEMENTE), max(1, repeticoes // 2)
+    )
+
+    return {
+        "ambiente": descrever_ambiente(numpy=np.__version__, pandas=pd.__version__, scikit_learn=sklearn.__version__),
+        "parametros": {
+            "dataset": str(caminho_dataset),
+            "linhas_dataset": len(df),
+            "tamanhos_lote": tamanhos_lote,
+            "simulacoes_busca": simulacoes,
+            "repeticoes": repeticoes,
+            "target": TARGET,
+        },
+        "resultados": resultados,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do modelo de taxas e da busca de níveis")
+    parser.add_argument("--dataset", type=Path, default=None, help="Dataset (CSV ou diretório Parquet)")
+    parser.add_argument("--sintetico", type=int, default=None, metavar="LINHAS",
+                        help="Usar um dataset sintético reprodutível com esta quantidade de linhas")
+    parser.add_argument("--simulacoes", type=int, default=SIMULACOES_BUSCA, help="Simulações da busca de níveis")
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES, help="Repetições cronometradas por medição")
+    parser.add_argument("--saida", type=Path, default=CAMINHO_RESULTADO, help="Arquivo JSON com o resultado")
+    parser.add_argument("--baseline", type=Path, default=CAMINHO_BASELINE, help="Arquivo JSON da baseline")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA, help="Piora aceita (0.20 = 20%%)")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Gravar este resultado como nova baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporario:
+        caminho_dataset = args.dataset
+        if caminho_dataset is None and args.sintetico is None:
+            if any(DIRETORIO_FEATURES.glob("*/*.parquet")):
+                caminho_dataset = DIRETORIO_FEATURES
+            elif CAMINHO_DATASET.exists():
+                caminho_dataset = CAMINHO_DATASET
+        if caminho_dataset is None:
+            caminho_dataset = Path(temporario) / "dataset_sintetico.csv"
+            gerar_dataset_sintetico(caminho_dataset, args.sintetico or 20000)
+            print(f"Usando dataset sintético com {args.sintetico or 20000} linhas.")
+
+        relatorio = executar_benchmark(caminho_dataset, simulacoes=args.simulacoes, repeticoes=args.repeticoes)
+
+    print("\n📊 BENCHMARK DO MODELO DE TAXAS:\n")
+    for nome, metricas in relatorio["resultados"].items():
+        print(f"{nome:<20} {metricas['tempo_s'] * 1000:>12.3f} ms   pico {metricas['memoria_pico_mb']:>9.3f} MB")
+
+    regressoes = finalizar_relatorio(relatorio, args.saida, args.baseline, METRICAS_BASELINE, args.tolerancia,
+                                     args.salvar_baseline)
+    if regressoes:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
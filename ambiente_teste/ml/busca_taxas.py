@@ -0,0 +1,179 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from ambiente_teste.ml.taxas_corrida_ml import (
+    FEATURES, INTERVALOS_TAXAS, QUANTIDADE_NIVEIS, TAMANHO_LOTE, CAMINHO_NIVEIS,
+    atualizar_top_k, buscar_melhores_configuracoes, carregar_dataset, montar_niveis, salvar_niveis, treinar_modelo
+)
+
+ESTRATEGIAS = ("aleatoria", "hipercubo", "evolutiva")
+
+MINIMOS = np.array([INTERVALOS_TAXAS[taxa][0] for taxa in FEATURES])
+MAXIMOS = np.array([INTERVALOS_TAXAS[taxa][1] for taxa in FEATURES])
+
+# Modelo carregado uma única vez em cada processo do pool (via initializer)
+_modelo_processo = None
+
+
+def _iniciar_processo(modelo):
+    global _modelo_processo
+    _modelo_processo = modelo
+
+
+# Avalia um lote de configurações e devolve o preço estimado arredondado a 2 casas.
+def avaliar(modelo, taxas: np.ndarray) -> np.ndarray:
+    return np.round(modelo.predict(pd.DataFrame(taxas, columns=FEATURES)), 2)
+
+
+# Sorteia um lote uniforme ou por hipercubo latino (cada taxa cobre todos os estratos do intervalo uma vez).
+def amostrar(gerador: np.random.Generator, quantidade: int, estrategia: str) -> np.ndarray:
+    if estrategia == "hipercubo":
+        estratos = np.argsort(gerador.random((len(FEATURES), quantidade)), axis=1).T
+        unitario = (estratos + gerador.random((quantidade, len(FEATURES)))) / quantidade
+    else:
+        unitario = gerador.random((quantidade, len(FEATURES)))
+    return np.round(MINIMOS + unitario * (MAXIMOS - MINIMOS), 4)
+
+
+# Tarefa executada no pool: sorteia e avalia um bloco e devolve apenas o top-k local.
+def _avaliar_bloco(semente, quantidade: int, deslocamento: int, estrategia: str, k: int) -> list:
+    gerador = np.random.default_rng(semente)
+    heap = []
+    for inicio in range(0, quantidade, TAMANHO_LOTE):
+        taxas = amostrar(gerador, min(TAMANHO_LOTE, quantidade - inicio), estrategia)
+        atualizar_top_k(heap, taxas, avaliar(_modelo_processo, taxas), deslocamento + inicio, k)
+    return heap
+
+
+# Une os top-k parciais, descartando configurações repetidas (a primeira ocorrência vence).
+def unir_top_k(parciais, k: int) -> list:
+    melhores = {}
+    for heap in parciais:
+        for preco, ordem, taxas in heap:
+            chave = tuple(taxas.tolist())
+            if chave not in melhores or (preco, ordem) > melhores[chave][:2]:
+                melhores[chave] = (preco, ordem, taxas)
+    return sorted(melhores.values(), key=lambda item: item[:2], reverse=True)[:k]
+
+
+# Busca por amostragem (uniforme ou hipercubo latino) dividida em blocos distribuídos em um pool de processos.
+# Cada bloco tem sua própria semente derivada da semente principal, então o resultado não depende do número de processos.
+def buscar_amostragem(modelo, avaliacoes: int, estrategia: str, processos: int, semente, k: int,
+                      tamanho_bloco: int) -> list:
+    blocos = [(inicio, min(tamanho_bloco, avaliacoes - inicio)) for inicio in range(0, avaliacoes, tamanho_bloco)]
+    sementes = np.random.SeedSequence(semente).spawn(len(blocos))
+
+    if processos <= 1:
+        _iniciar_processo(modelo)
+        parciais = [_avaliar_bloco(s, qtd, ini, estrategia, k) for s, (ini, qtd) in zip(sementes, blocos)]
+    else:
+        with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo, initargs=(modelo,)) as pool:
+            futuros = [
+                pool.submit(_avaliar_bloco, s, qtd, ini, estrategia, k) for s, (ini, qtd) in zip(sementes, blocos)
+            ]
+            parciais = [futuro.result() for futuro in futuros]
+
+    return unir_top_k(parciais, k)
+
+
+# Estratégia evolutiva no estilo CMA-ES com covariância diagonal: a cada geração sorteia uma população em torno
+# da média atual, avalia todos em um único predict e recentraliza a distribuição nos melhores (pesos logarítmicos).
+# Trabalha no espaço normalizado [0, 1] de cada taxa.
+def buscar_evolutiva(modelo, avaliacoes: int, semente, k: int, populacao: int = 256) -> list:
+    gerador = np.random.default_rng(semente)
+    dimensoes = len(FEATURES)
+    elite = populacao // 4
+    pesos = np.log(elite + 0.5) - np.log(np.arange(1, elite + 1))
+    pesos /= pesos.sum()
+
+    media = np.full(dimensoes, 0.5)
+    desvio = np.full(dimensoes, 0.3)
+    heap = []
+    avaliadas = 0
+
+    while avaliadas < avaliacoes:
+        quantidade = min(populacao, avaliacoes - avaliadas)
+        unitario = np.clip(media + desvio * gerador.standard_normal((quantidade, dimensoes)), 0.0, 1.0)
+        taxas = np.round(MINIMOS + unitario * (MAXIMOS - MINIMOS), 4)
+        precos = avaliar(modelo, taxas)
+        atualizar_top_k(heap, taxas, precos, avaliadas, k * 4)
+        avaliadas += quantidade
+
+        if quantidade < elite:
+            break
+
+        melhores = unitario[np.argsort(-precos, kind="stable")[:elite]]
+        nova_media = pesos @ melhores
+        nova_variancia = pesos @ (melhores - media) ** 2
+        media = nova_media
+        desvio = np.clip(0.7 * desvio + 0.3 * np.sqrt(nova_variancia), 1e-3, 0.5)
+
+    return unir_top_k([heap], k)
+
+
+# Executa a estratégia escolhida e devolve as melhores configurações com as métricas da busca.
+def buscar(modelo, estrategia: str = "aleatoria", avaliacoes: int = 1000000, processos: int = 1, semente=None,
+           k: int = QUANTIDADE_NIVEIS, tamanho_bloco: int = 250000) -> dict:
+    if estrategia not in ESTRATEGIAS:
+        raise ValueError(f"Estratégia inválida: {estrategia}. Use uma de {ESTRATEGIAS}.")
+
+    inicio = time.perf_counter()
+
+    if estrategia == "aleatoria" and processos <= 1:
+        # Mesmo fluxo (e mesmo resultado para uma semente) da busca sequencial original
+        configuracoes = buscar_melhores_configuracoes(modelo, avaliacoes, k=k, semente=semente)
+    else:
+        if estrategia == "evolutiva":
+            melhores = buscar_evolutiva(modelo, avaliacoes, semente, k)
+        else:
+            melhores = buscar_amostragem(modelo, avaliacoes, estrategia, processos, semente, k, tamanho_bloco)
+        configuracoes = [
+            {**dict(zip(FEATURES, taxas.tolist())), "preco_total": preco}
+            for preco, _, taxas in melhores
+        ]
+
+    duracao = time.perf_counter() - inicio
+    return {
+        "estrategia": estrategia,
+        "configuracoes": configuracoes,
+        "avaliacoes": avaliacoes,
+        "tempo_s": round(duracao, 3),
+        "avaliacoes_por_segundo": round(avaliacoes / duracao, 1) if duracao > 0 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Buscar níveis de taxas com estratégias paralelas")
+    parser.add_argument("--estrategia", choices=ESTRATEGIAS, default="aleatoria", help="Estratégia de busca")
+    parser.add_argument("--avaliacoes", type=int, default=1000000, help="Quantidade de avaliações do modelo")
+    parser.add_argument("--processos", type=int, default=1, help="Processos do pool de avaliação")
+    parser.add_argument("--n-jobs", type=int, default=None, help="Threads do predict da floresta (n_jobs)")
+    parser.add_argument("--semente", type=int, default=None, help="Semente do gerador (resultado reprodutível)")
+    parser.add_argument("--salvar", action="store_true", help="Salvar o resultado em niveis_taxas_otimizadas.json")
+    args = parser.parse_args()
+
+    modelo = treinar_modelo(carregar_dataset())
+    if args.n_jobs is not None:
+        modelo.set_params(n_jobs=args.n_jobs)
+
+    resultado = buscar(modelo, args.estrategia, args.avaliacoes, args.processos, args.semente)
+    niveis = montar_niveis(resultado["configuracoes"])
+
+    print(f"\n📊 TABELA DE NÍVEIS ({resultado['estrategia']}):\n")
+    for nivel, config in zip(niveis, resultado["configuracoes"]):
+        print(f"Nível {nivel}: {niveis[nivel]} -> R$ {config['preco_total']:.2f}")
+
+    print(f"\n Avaliações: {resultado['avaliacoes']} em {resultado['tempo_s']:.2f} s "
+          f"({resultado['avaliacoes_por_segundo']} avaliações/s)")
+
+    if args.salvar:
+        salvar_niveis(niveis)
+        print(f" Níveis salvos em: {CAMINHO_NIVEIS}")
+
+
+if __name__ == "__main__":
+    main()
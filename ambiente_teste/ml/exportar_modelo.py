@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import numpy as np
+import sklearn
+
+CAMINHO_MODELO = Path(__file__).resolve().parent.parent / "data" / "ml" / "resultados" / "modelo_taxas.npz"
+
+
+# Achata as árvores de uma RandomForestRegressor em matrizes (árvore x nó) preenchidas até o maior tamanho.
+# Nas folhas, os dois filhos apontam para o próprio nó, então percorrer a árvore mais vezes que a sua
+# profundidade não altera o resultado; isso permite avaliar todas as árvores e amostras em paralelo com NumPy.
+def achatar_floresta(modelo) -> dict:
+    arvores = [estimador.tree_ for estimador in modelo.estimators_]
+    max_nos = max(arvore.node_count for arvore in arvores)
+    quantidade = len(arvores)
+
+    esquerda = np.zeros((quantidade, max_nos), dtype=np.int32)
+    direita = np.zeros((quantidade, max_nos), dtype=np.int32)
+    feature = np.zeros((quantidade, max_nos), dtype=np.int32)
+    limiar = np.zeros((quantidade, max_nos), dtype=np.float64)
+    valor = np.zeros((quantidade, max_nos), dtype=np.float64)
+
+    for i, arvore in enumerate(arvores):
+        n = arvore.node_count
+        folhas = arvore.children_left[:n] == -1
+        proprio = np.arange(n, dtype=np.int32)
+
+        esquerda[i, :n] = np.where(folhas, proprio, arvore.children_left[:n])
+        direita[i, :n] = np.where(folhas, proprio, arvore.children_right[:n])
+        feature[i, :n] = np.where(folhas, 0, arvore.feature[:n])
+        limiar[i, :n] = np.where(folhas, 0.0, arvore.threshold[:n])
+        valor[i, :n] = arvore.value[:n, 0, 0]
+
+    return {
+        "esquerda": esquerda,
+        "direita": direita,
+        "feature": feature,
+        "limiar": limiar,
+        "valor": valor,
+        "profundidade": np.int32(max(arvore.max_depth for arvore in arvores)),
+    }
+
+
+# Exporta o modelo para um arquivo .npz compacto que a API carrega sem depender do scikit-learn.
+# A ordem das features é a mesma usada no treino (feature_names_in_).
+def exportar_floresta(modelo, caminho: Path = CAMINHO_MODELO) -> Path:
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(
+        caminho,
+        features=np.array(list(modelo.feature_names_in_)),
+        versao_sklearn=np.array(sklearn.__version__),
+        **achatar_floresta(modelo),
+    )
+    return caminho
+
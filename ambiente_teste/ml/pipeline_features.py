@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+DIRETORIO_ML = Path(__file__).resolve().parent.parent / "data" / "ml"
+DIRETORIO_FEATURES = DIRETORIO_ML / "features"
+CAMINHO_MARCA_DAGUA = DIRETORIO_FEATURES / "_marca_dagua.json"
+
+# Mesmo .env da API (SQLALCHEMY_DATABASE_URL é a URL síncrona usada também pelo Alembic)
+load_dotenv(Path(__file__).resolve().parents[2] / "api" / ".env")
+
+TAMANHO_LOTE = 50000
+COLUNAS_TAXAS = [
+    "taxa_manutencao", "taxa_limpeza", "taxa_pico", "taxa_noturna", "taxa_excesso_corridas", "taxa_cancelamento"
+]
+
+# Só entram na extração as corridas finalizadas há pelo menos esse tempo: uma finalização ainda não confirmada no
+# banco, com atualizado_em anterior ao da última corrida lida, não fica para trás da marca d'água
+MARGEM_FINALIZACAO = timedelta(minutes=1)
+
+# Formato das datas passadas ao banco (o mesmo em que o SQLite guarda os DateTime do SQLAlchemy)
+FORMATO_DATA = "%Y-%m-%d %H:%M:%S.%f"
+INICIO_MARCA_DAGUA = datetime(1970, 1, 1).strftime(FORMATO_DATA)
+
+# Corridas finalizadas com o consumo do carro do motorista (uma linha por corrida)
+SELECAO_CORRIDAS = """
+    SELECT c.id, c.horario_pedido, c.distancia_km, c.origem_bairro, c.destino_bairro,
+           c.taxa_manutencao, c.taxa_limpeza, c.taxa_pico, c.taxa_noturna, c.taxa_excesso_corridas,
+           c.taxa_cancelamento, c.nivel_taxa, c.preco_km, c.valor_motorista, c.preco_total,
+           ca.combustivel, ca.km_gasolina_cidade, ca.km_etanol_cidade, c.atualizado_em
+    FROM tb_corrida c
+    LEFT JOIN tb_motorista m ON m.id = c.id_motorista
+    LEFT JOIN tb_carro ca ON ca.id = m.id_carro
+"""
+
+# Finalizadas depois da marca d'água, na ordem de finalização
+CONSULTA_CORRIDAS = text(SELECAO_CORRIDAS + """
+    WHERE c.status = 'finalizada' AND c.atualizado_em <= :ate
+      AND (c.atualizado_em > :desde OR (c.atualizado_em = :desde AND c.id > :ultimo_id))
+    ORDER BY c.atualizado_em, c.id
+""")
+
+# Finalizadas sem data de atualização (anteriores à coluna), lidas só na primeira extração
+CONSULTA_CORRIDAS_SEM_DATA = text(SELECAO_CORRIDAS + """
+    WHERE c.status = 'finalizada' AND c.atualizado_em IS NULL
+    ORDER BY c.id
+""")
+
+# Esquema tipado das features gravadas (a coluna de partição "data" é adicionada pelo Parquet)
+ESQUEMA = pa.schema([
+    ("id", pa.int64()),
+    ("horario_pedido", pa.timestamp("s")),
+    ("hora", pa.int8()),
+    ("minuto_do_dia", pa.int16()),
+    ("dia_semana", pa.int8()),
+    ("fim_de_semana", pa.bool_()),
+    ("distancia_km", pa.float32()),
+    ("origem_bairro", pa.dictionary(pa.int32(), pa.string())),
+    ("destino_bairro", pa.dictionary(pa.int32(), pa.string())),
+    ("par_bairros", pa.dictionary(pa.int32(), pa.string())),
+    ("combustivel", pa.dictionary(pa.int8(), pa.string())),
+    ("km_por_litro_cidade", pa.float32()),
+    *[(taxa, pa.float32()) for taxa in COLUNAS_TAXAS],
+    ("nivel_taxa", pa.int8()),
+    ("preco_km", pa.float64()),
+    ("valor_motorista", pa.float64()),
+    ("preco_total", pa.float64()),
+    ("data", pa.string()),
+])
+
+
+# Lê a marca d'água da última extração: instante de finalização (atualizado_em) e id da última corrida lida.
+# Marcas do formato anterior (por id, com corridas pendentes) não dizem o que já foi finalizado e gravado.
+def ler_marca_dagua(caminho: Path = CAMINHO_MARCA_DAGUA) -> dict:
+    if not caminho.exists():
+        return {"ultima_finalizacao": None, "ultimo_id": 0, "ultimo_horario": None}
+    with open(caminho, "r", encoding="utf-8") as f:
+        marca = json.load(f)
+    if "ultima_finalizacao" not in marca:
+        raise ValueError(f"Marca d'água em formato antigo em {caminho}. Execute novamente com --recriar.")
+    return marca
+
+
+# Grava a marca d'água em um arquivo temporário e o renomeia, para nunca deixar um JSON pela metade.
+def salvar_marca_dagua(marca: dict, caminho: Path = CAMINHO_MARCA_DAGUA):
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_suffix(".tmp")
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(marca, f, indent=4)
+    os.replace(temporario, caminho)
+
+
+# Deriva as features de um lote de corridas vindas do banco.
+def gerar_features(df: pd.DataFrame) -> pd.DataFrame:
+    horario = pd.to_datetime(df["horario_pedido"])
+    combustivel = df["combustivel"].fillna("").str.lower()
+    km_cidade = np.where(
+        combustivel.isin(["gasolina", "flex"]), df["km_gasolina_cidade"], df["km_etanol_cidade"]
+    ).astype(float)
+
+    features = pd.DataFrame({
+        "id": df["id"].astype("int64"),
+        "horario_pedido": horario.astype("datetime64[s]"),
+        "hora": horario.dt.hour.astype("int8"),
+        "minuto_do_dia": (horario.dt.hour * 60 + horario.dt.minute).astype("int16"),
+        "dia_semana": horario.dt.dayofweek.astype("int8"),
+        "fim_de_semana": horario.dt.dayofweek >= 5,
+        "distancia_km": pd.to_numeric(df["distancia_km"]).astype("float32"),
+        "origem_bairro": df["origem_bairro"].astype("category"),
+        "destino_bairro": df["destino_bairro"].astype("category"),
+        "par_bairros": (df["origem_bairro"] + " -> " + df["destino_bairro"]).astype("category"),
+        "combustivel": combustivel.replace("", None).astype("category"),
+        "km_por_litro_cidade": pd.Series(km_cidade, index=df.index).astype("float32"),
+    })
+    for taxa in COLUNAS_TAXAS:
+        features[taxa] = pd.to_numeric(df[taxa], errors="coerce").fillna(0.0).astype("float32")
+    features["nivel_taxa"] = pd.to_numeric(df["nivel_taxa"], errors="coerce").fillna(0).astype("int8")
+    for coluna in ["preco_km", "valor_motorista", "preco_total"]:
+        features[coluna] = pd.to_numeric(df[coluna], errors="coerce").astype("float64")
+    features["data"] = horario.dt.strftime("%Y-%m-%d")
+    return features
+
+
+# Grava um lote no dataset particionado por dia do pedido; cada lote gera arquivos novos, sem reescrever os antigos.
+def gravar_lote(features: pd.DataFrame, diretorio: Path = DIRETORIO_FEATURES):
+    tabela = pa.Table.from_pandas(features, schema=ESQUEMA, preserve_index=False)
+    pq.write_to_dataset(
+        tabela,
+        root_path=str(diretorio),
+        partition_cols=["data"],
+        basename_template=f"lote-{features['id'].min()}-{features['id'].max()}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+# Extrai as corridas finalizadas desde a última execução e grava as features em Parquet.
+# A marca d'água segue a ordem de finalização (atualizado_em, id), e não a de criação: uma corrida criada antes da
+# última extração e finalizada depois dela entra na próxima, e cada execução lê só as finalizações novas, por mais
+# corridas que fiquem pendentes. Corridas finalizadas antes da coluna atualizado_em existir (sem data) só entram na
+# primeira extração.
+def extrair(url: str, diretorio: Path = DIRETORIO_FEATURES, tamanho_lote: int = TAMANHO_LOTE) -> dict:
+    caminho_marca = diretorio / CAMINHO_MARCA_DAGUA.name
+    marca = ler_marca_dagua(caminho_marca)
+    engine = create_engine(url)
+    inicio = time.perf_counter()
+    total = 0
+    ultimo_horario = marca["ultimo_horario"]
+    ultima_finalizacao, ultimo_id = marca["ultima_finalizacao"], marca["ultimo_id"]
+
+    with engine.connect() as conexao:
+        consultas = [CONSULTA_CORRIDAS]
+        if ultima_finalizacao is None:
+            consultas.insert(0, CONSULTA_CORRIDAS_SEM_DATA)
+        parametros = {
+            "ate": (datetime.now() - MARGEM_FINALIZACAO).strftime(FORMATO_DATA),
+            "desde": ultima_finalizacao or INICIO_MARCA_DAGUA,
+            "ultimo_id": ultimo_id,
+        }
+
+        lotes = (lote for consulta in consultas
+                 for lote in pd.read_sql(consulta, conexao, params=parametros, chunksize=tamanho_lote))
+        for lote in lotes:
+            if lote.empty:
+                continue
+            finalizacoes = pd.to_datetime(lote["atualizado_em"])
+            if finalizacoes.notna().iloc[-1]:
+                ultima_finalizacao = finalizacoes.iloc[-1].strftime(FORMATO_DATA)
+                ultimo_id = int(lote["id"].iloc[-1])
+            features = gerar_features(lote)
+            gravar_lote(features, diretorio)
+            total += len(features)
+            maior_horario = features["horario_pedido"].max().isoformat()
+            ultimo_horario = max(ultimo_horario or maior_horario, maior_horario)
+            print(f"Lote gravado: {len(features)} corridas (ids {features['id'].min()} a {features['id'].max()}).")
+
+    nova_marca = {
+        "ultima_finalizacao": ultima_finalizacao or INICIO_MARCA_DAGUA,
+        "ultimo_id": ultimo_id,
+        "ultimo_horario": ultimo_horario,
+    }
+    salvar_marca_dagua(nova_marca, caminho_marca)
+
+    return {
+        "corridas_extraidas": total,
+        "tempo_s": round(time.perf_counter() - inicio, 3),
+        **nova_marca,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extrair features das corridas finalizadas para Parquet")
+    parser.add_argument("--url", default=os.getenv("SQLALCHEMY_DATABASE_URL"), help="URL do banco (SQLAlchemy)")
+    parser.add_argument("--saida", type=Path, default=DIRETORIO_FEATURES, help="Diretório do dataset Parquet")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE, help="Corridas lidas do banco por lote")
+    parser.add_argument("--recriar", action="store_true", help="Descartar a marca d'água e extrair tudo novamente")
+    args = parser.parse_args()
+
+    if not args.url:
+        parser.error("Informe --url ou defina SQLALCHEMY_DATABASE_URL no .env da API.")
+
+    if args.recriar and args.saida.exists():
+        shutil.rmtree(args.saida)
+
+    try:
+        resultado = extrair(args.url, args.saida, args.lote)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"\n {resultado['corridas_extraidas']} corridas extraídas em {resultado['tempo_s']:.2f} s.")
+    print(f" Marca d'água: finalização {resultado['ultima_finalizacao']} (id {resultado['ultimo_id']}), "
+          f"pedido mais recente {resultado['ultimo_horario']}.")
+    print(f" Features em: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
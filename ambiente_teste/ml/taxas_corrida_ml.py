@@ -1,49 +1,36 @@
-import pandas as pd
-import numpy as np
+import argparse
+import heapq
 import json
 import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
-from pathlib import Path
 
-# Início da contagem de tempo
-inicio_execucao = time.time()
+from ambiente_teste.ml.exportar_modelo import exportar_floresta
 
-# Carregar os dados simulados
-df = pd.read_csv("../data/ml/brutos/dataset_treino.csv")
+DIRETORIO_ML = Path(__file__).resolve().parent.parent / "data" / "ml"
+CAMINHO_DATASET = DIRETORIO_ML / "brutos" / "dataset_treino.csv"
+DIRETORIO_FEATURES = DIRETORIO_ML / "features"
+CAMINHO_NIVEIS = DIRETORIO_ML / "resultados" / "niveis_taxas_otimizadas.json"
 
-# Corrigir vírgulas e converter colunas numéricas
-colunas = [
+# Colunas numéricas do dataset (gravadas com vírgula decimal)
+COLUNAS_NUMERICAS = [
     "preco_total", "valor_motorista", "taxa_manutencao",
     "taxa_limpeza", "taxa_pico", "taxa_noturna", "taxa_excesso_corridas"
 ]
-for col in colunas:
-    df[col] = df[col].astype(str).str.replace(",", ".")
-    df[col] = pd.to_numeric(df[col], errors="coerce")
-
-# Remover linhas com valores ausentes
-df = df.dropna(subset=colunas)
 
 # Features e target
-features = [
+FEATURES = [
     "taxa_manutencao", "taxa_limpeza", "taxa_pico",
     "taxa_noturna", "taxa_excesso_corridas"
 ]
-target = "preco_total"
-X = df[features]
-y = df[target]
-
-# Treinar modelo
-X_train, X_test, y_train, y_test = train_test_split(X, y, random_state=42)
-modelo = RandomForestRegressor(n_estimators=100, random_state=42)
-modelo.fit(X_train, y_train)
-
-# Função para gerar taxa aleatória
-def gerar_taxa(intervalo):
-    return round(np.random.uniform(intervalo[0], intervalo[1]), 4)
+TARGET = "preco_total"
 
 # Intervalos possíveis
-intervalos_taxas = {
+INTERVALOS_TAXAS = {
     "taxa_manutencao": (0.25, 0.35),
     "taxa_limpeza": (0.85, 1.0),
     "taxa_pico": (0.65, 0.70),
@@ -51,49 +38,131 @@ intervalos_taxas = {
     "taxa_excesso_corridas": (0.25, 0.35)
 }
 
-quantidade_simulacoes = 1000000
-top_configs = []
-
-for _ in range(quantidade_simulacoes):
-    config = {k: gerar_taxa(v) for k, v in intervalos_taxas.items()}
-    preco_estimado = modelo.predict(pd.DataFrame([config]))[0]
-    resultado = {
-        **config,
-        "preco_total": round(preco_estimado, 2),
-    }
-    top_configs.append(resultado)
-
-# Ordenar pelas melhores
-top_configs_ordenadas = sorted(top_configs, key=lambda x: x["preco_total"], reverse=True)[:5]
-
-# Converter para o formato com níveis
-niveis = {
-    i + 1: {
-        "taxa_manutencao": round(config["taxa_manutencao"], 4),
-        "taxa_limpeza": round(config["taxa_limpeza"], 4),
-        "taxa_pico": round(config["taxa_pico"], 4),
-        "taxa_noturna": round(config["taxa_noturna"], 4),
-        "taxa_excesso_corridas": round(config["taxa_excesso_corridas"], 4)
+QUANTIDADE_SIMULACOES = 1000000
+TAMANHO_LOTE = 100000
+QUANTIDADE_NIVEIS = 5
+
+
+# Carrega os dados simulados. Se houver features extraídas pelo pipeline_features.py, lê o Parquet (já tipado,
+# apenas as colunas usadas e, com "desde", apenas as partições a partir dessa data); senão, lê o CSV corrigindo
+# as vírgulas decimais. Linhas com valores ausentes são descartadas.
+def carregar_dataset(caminho: Path = None, desde: str = None) -> pd.DataFrame:
+    if caminho is None:
+        caminho = DIRETORIO_FEATURES if any(DIRETORIO_FEATURES.glob("*/*.parquet")) else CAMINHO_DATASET
+
+    if caminho.is_dir():
+        filtros = [("data", ">=", desde)] if desde else None
+        df = pd.read_parquet(caminho, columns=COLUNAS_NUMERICAS, filters=filtros)
+    else:
+        df = pd.read_csv(caminho)
+        for col in COLUNAS_NUMERICAS:
+            df[col] = df[col].astype(str).str.replace(",", ".")
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df.dropna(subset=COLUNAS_NUMERICAS)
+
+
+# Treina a floresta aleatória que estima o preço total a partir das taxas.
+def treinar_modelo(df: pd.DataFrame) -> RandomForestRegressor:
+    X_train, X_test, y_train, y_test = train_test_split(df[FEATURES], df[TARGET], random_state=42)
+    modelo = RandomForestRegressor(n_estimators=100, random_state=42)
+    modelo.fit(X_train, y_train)
+    return modelo
+
+
+# Sorteia um lote de configurações (uma linha por configuração, uma coluna por taxa), arredondadas a 4 casas.
+# A ordem dos sorteios é a mesma de um laço que sorteia taxa por taxa, configuração por configuração.
+def gerar_taxas_lote(gerador: np.random.RandomState, quantidade: int) -> np.ndarray:
+    minimos = np.array([INTERVALOS_TAXAS[taxa][0] for taxa in FEATURES])
+    maximos = np.array([INTERVALOS_TAXAS[taxa][1] for taxa in FEATURES])
+    return np.round(gerador.uniform(minimos, maximos, size=(quantidade, len(FEATURES))), 4)
+
+
+# Mantém as k melhores configurações vistas até agora em um heap mínimo.
+# Empates no preço são resolvidos pela ordem de sorteio (a configuração sorteada antes vence).
+def atualizar_top_k(heap: list, taxas: np.ndarray, precos: np.ndarray, deslocamento: int, k: int):
+    if len(precos) > k:
+        limite = np.partition(precos, len(precos) - k)[len(precos) - k]
+        candidatos = np.flatnonzero(precos >= limite)
+    else:
+        candidatos = np.arange(len(precos))
+
+    for posicao in candidatos:
+        item = (float(precos[posicao]), -(deslocamento + int(posicao)), taxas[posicao])
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+
+
+# Busca Monte Carlo das configurações de taxas com maior preço estimado.
+# Sorteia e avalia as configurações em lotes (um sorteio e um predict por lote) e guarda apenas o top-k.
+def buscar_melhores_configuracoes(modelo, quantidade_simulacoes: int = QUANTIDADE_SIMULACOES,
+                                  k: int = QUANTIDADE_NIVEIS, tamanho_lote: int = TAMANHO_LOTE,
+                                  semente: int = None) -> list:
+    gerador = np.random.RandomState(semente)
+    heap = []
+
+    for inicio in range(0, quantidade_simulacoes, tamanho_lote):
+        quantidade = min(tamanho_lote, quantidade_simulacoes - inicio)
+        taxas = gerar_taxas_lote(gerador, quantidade)
+        precos = np.round(modelo.predict(pd.DataFrame(taxas, columns=FEATURES)), 2)
+        atualizar_top_k(heap, taxas, precos, inicio, k)
+
+    melhores = sorted(heap, key=lambda item: item[:2], reverse=True)
+    return [
+        {**dict(zip(FEATURES, taxas.tolist())), "preco_total": preco}
+        for preco, _, taxas in melhores
+    ]
+
+
+# Converte as melhores configurações para o formato com níveis (1 = maior preço estimado).
+def montar_niveis(configuracoes: list) -> dict:
+    return {
+        i + 1: {taxa: round(config[taxa], 4) for taxa in FEATURES}
+        for i, config in enumerate(configuracoes)
     }
-    for i, config in enumerate(top_configs_ordenadas)
-}
 
-# Mostrar
-print("\n📊 TABELA DE NÍVEIS (1 a 5):\n")
-for nivel, config in niveis.items():
-    print(f"Nível {nivel}: {config}")
-
-# Salvar como JSON
-caminho_saida = Path("../data/ml/resultados/niveis_taxas_otimizadas.json")
-caminho_saida.parent.mkdir(parents=True, exist_ok=True)
-with open(caminho_saida, "w") as f:
-    json.dump(niveis, f, indent=4)
-
-# Fim da contagem de tempo
-fim_execucao = time.time()
-tempo_total = fim_execucao - inicio_execucao
-
-# Exibir informações finais
-print(f"\n Níveis salvos em: {caminho_saida}")
-print(f"\n Tempo total de execução: {tempo_total:.2f} segundos")
-print(f" Total de simulações realizadas: {quantidade_simulacoes}")
\ No newline at end of file
+
+# Salva a tabela de níveis como JSON.
+def salvar_niveis(niveis: dict, caminho_saida: Path = CAMINHO_NIVEIS):
+    caminho_saida.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho_saida, "w") as f:
+        json.dump(niveis, f, indent=4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Otimizar os níveis de taxas com base no modelo de preço")
+    parser.add_argument("--simulacoes", type=int, default=QUANTIDADE_SIMULACOES, help="Quantidade de simulações")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE, help="Configurações avaliadas por lote")
+    parser.add_argument("--semente", type=int, default=None, help="Semente do gerador (resultado reprodutível)")
+    parser.add_argument("--desde", default=None, help="Treinar só com corridas a partir desta data (AAAA-MM-DD)")
+    args = parser.parse_args()
+
+    # Início da contagem de tempo
+    inicio_execucao = time.time()
+
+    df = carregar_dataset(desde=args.desde)
+    modelo = treinar_modelo(df)
+
+    # Exporta o modelo em formato compacto para a API (sem pickle do scikit-learn)
+    print(f"[✔] Modelo exportado em: {exportar_floresta(modelo)}")
+
+    melhores = buscar_melhores_configuracoes(modelo, args.simulacoes, tamanho_lote=args.lote, semente=args.semente)
+    niveis = montar_niveis(melhores)
+
+    # Mostrar
+    print("\n📊 TABELA DE NÍVEIS (1 a 5):\n")
+    for nivel, config in niveis.items():
+        print(f"Nível {nivel}: {config}")
+
+    salvar_niveis(niveis)
+
+    # Exibir informações finais
+    tempo_total = time.time() - inicio_execucao
+    print(f"\n Níveis salvos em: {CAMINHO_NIVEIS}")
+    print(f"\n Tempo total de execução: {tempo_total:.2f} segundos")
+    print(f" Total de simulações realizadas: {args.simulacoes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import time
+from datetime import datetime
+from pathlib import Path
+
+import aiohttp
+import numpy as np
+from faker import Faker
+
+API_URL = "http://127.0.0.1:8000"
+TIMEOUT = 120
+VERSAO_RASTRO = 1
+
+# Requisições em andamento ao mesmo tempo durante a reprodução
+CONCORRENCIA_PADRAO = 100
+
+
+# Fixa as sementes de todos os geradores usados pelo simulador (random, Faker e numpy), para que duas execuções
+# com a mesma semente gerem os mesmos cadastros, horários, pares de coordenadas e níveis de taxa.
+def semear(semente: int):
+    random.seed(semente)
+    Faker.seed(semente)
+    np.random.seed(semente % 2 ** 32)
+
+
+# Grava as requisições de escrita do simulador (cadastros, solicitações e finalizações) em um arquivo NDJSON
+# compactado: uma linha de cabeçalho e uma linha por requisição com o instante (s desde o início), a etapa, o
+# método, o caminho e o corpo enviado. Enquanto não houver arquivo aberto, registrar() não faz nada.
+class GravadorRastro:
+    def __init__(self):
+        self._arquivo = None
+        self._inicio = 0.0
+        self.eventos = 0
+
+    @property
+    def ativo(self) -> bool:
+        return self._arquivo is not None
+
+    def abrir(self, caminho: Path, semente: int = None):
+        caminho = Path(caminho)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        self._arquivo = gzip.open(caminho, "wt", encoding="utf-8")
+        self._inicio = time.perf_counter()
+        self.eventos = 0
+        cabecalho = {"versao": VERSAO_RASTRO, "semente": semente, "gravado_em": datetime.now().isoformat()}
+        self._arquivo.write(json.dumps(cabecalho, ensure_ascii=False) + "\n")
+
+    def registrar(self, etapa: str, metodo: str, caminho: str, corpo=None):
+        if self._arquivo is None:
+            return
+        evento = {"t": round(time.perf_counter() - self._inicio, 6), "etapa": etapa, "metodo": metodo,
+                  "caminho": caminho, "corpo": corpo}
+        self._arquivo.write(json.dumps(evento, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.eventos += 1
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+
+gravador = GravadorRastro()
+
+
+# Lê um rastro gravado, retornando (cabecalho, eventos).
+def ler_rastro(caminho: Path) -> tuple:
+    with gzip.open(caminho, "rt", encoding="utf-8") as f:
+        cabecalho = json.loads(f.readline())
+        if cabecalho.get("versao") != VERSAO_RASTRO:
+            raise ValueError(f"Versão de rastro não suportada: {cabecalho.get('versao')}")
+        return cabecalho, [json.loads(linha) for linha in f if linha.strip()]
+
+
+# Envia uma requisição do rastro e registra a latência por endpoint.
+async def enviar_evento(session: aiohttp.ClientSession, estatisticas, api_url: str, evento: dict,
+                        semaforo: asyncio.Semaphore):
+    endpoint = f"{evento['metodo']} {evento['caminho']}"
+    async with semaforo:
+        inicio = time.perf_counter()
+        try:
+            async with session.request(evento["metodo"], f"{api_url}{evento['caminho']}",
+                                       json=evento["corpo"]) as response:
+                await response.read()
+                estatisticas.registrar(endpoint, time.perf_counter() - inicio, response.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            estatisticas.registrar(endpoint, time.perf_counter() - inicio, type(e).__name__)
+
+
+# Reproduz um rastro contra a API: cada requisição é enviada no seu instante original dividido por "velocidade"
+# (0 = o mais rápido possível). Uma etapa só começa depois que todas as requisições da anterior terminaram (ex.:
+# motoristas dependem dos carros), e o atraso dessa espera desloca o restante do agendamento.
+# Os corpos trazem os ids da gravação, então a API deve partir do mesmo estado do banco (ex.: banco vazio).
+async def reproduzir_rastro(caminho: Path, api_url: str = API_URL, velocidade: float = 1.0,
+                            concorrencia: int = CONCORRENCIA_PADRAO) -> dict:
+    # Importado aqui porque os scripts do simulador (importados pelo gerador de carga) importam este módulo
+    from ambiente_teste.carga.gerador_carga import Estatisticas
+
+    cabecalho, eventos = ler_rastro(caminho)
+    estatisticas = Estatisticas()
+    semaforo = asyncio.Semaphore(concorrencia)
+    conector = aiohttp.TCPConnector(limit=concorrencia)
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+
+    async with aiohttp.ClientSession(connector=conector, timeout=timeout) as session:
+        em_andamento = []
+        etapa_atual = None
+        deslocamento = 0.0
+        inicio = time.perf_counter()
+
+        for evento in eventos:
+            instante = evento["t"] / velocidade if velocidade > 0 else 0.0
+            if evento["etapa"] != etapa_atual:
+                if em_andamento:
+                    await asyncio.gather(*em_andamento)
+                    em_andamento.clear()
+                etapa_atual = evento["etapa"]
+                deslocamento = max(deslocamento, time.perf_counter() - inicio - instante)
+
+            espera = inicio + deslocamento + instante - time.perf_counter()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            em_andamento.append(asyncio.create_task(enviar_evento(session, estatisticas, api_url, evento, semaforo)))
+
+        if em_andamento:
+            await asyncio.gather(*em_andamento)
+        duracao = time.perf_counter() - inicio
+
+    return {
+        "parametros": {"rastro": str(caminho), "semente": cabecalho.get("semente"), "velocidade": velocidade,
+                       "concorrencia": concorrencia},
+        "chegadas_agendadas": len(eventos),
+        "chegadas_descartadas": 0,
+        "rps_agendado": round(len(eventos) / duracao, 3) if duracao else 0.0,
+        "duracao_real_s": round(duracao, 3),
+        "maior_atraso_agendamento_ms": round(deslocamento * 1000, 3),
+        "endpoints": estatisticas.resumo(),
+    }
+
+
+def main():
+    from ambiente_teste.carga.gerador_carga import exibir_relatorio
+
+    parser = argparse.ArgumentParser(description="Reproduzir um rastro de requisições gravado pelo simulador")
+    parser.add_argument("rastro", type=Path, help="Arquivo .ndjson.gz gravado com executar_simulacao --gravar")
+    parser.add_argument("--api", default=API_URL, help="URL base da API")
+    parser.add_argument("--velocidade", type=float, default=1.0,
+                        help="Multiplicador da velocidade original (0 = o mais rápido possível)")
+    parser.add_argument("--concorrencia", type=int, default=CONCORRENCIA_PADRAO, help="Requisições em paralelo")
+    parser.add_argument("--saida", type=Path, default=None, help="Arquivo JSON para salvar o relatório")
+    args = parser.parse_args()
+
+    relatorio = asyncio.run(reproduzir_rastro(args.rastro, args.api, args.velocidade, args.concorrencia))
+    exibir_relatorio(relatorio)
+    if args.saida:
+        args.saida.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=4, ensure_ascii=False)
+        print(f"\n Relatório salvo em: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
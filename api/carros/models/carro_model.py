@@ -21,6 +21,8 @@ class CarroModel(Base):
     km_gasolina_cidade = Column(Float, nullable=True)
     km_gasolina_estrada = Column(Float, nullable=True)
     ano = Column(Integer, nullable=True)
+    # SHA-1 dos campos acima normalizados (ver carros.services.chave_natural), usado para evitar duplicatas
+    chave_natural = Column(String(40), unique=True, index=True, nullable=True)
 
     # Relacionamento com MotoristaModel (carro tem motoristas)
     motoristas = relationship("MotoristaModel", back_populates="carro")
@@ -1,15 +1,26 @@
-from typing import Optional
+import asyncio
+from typing import List, Optional
 
 from carros.models.carro_model import CarroModel
+from carros.services.chave_natural import calcular_chave_natural
+from carros.services.custo_carro import tabela_custos
 from core.dependencies import get_db
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
-from sqlalchemy import and_, func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 router = APIRouter(prefix="/carros", tags=["Carros"])
 
+# Carros por INSERT no cadastro em lote (limita o tamanho de cada instrução enviada ao banco)
+TAMANHO_BLOCO_INSERCAO = 1000
+# Serializa os cadastros em lote: a contagem dos já cadastrados e o INSERT de um lote rodam sem outro lote no meio,
+# senão dois lotes com carros em comum contariam os mesmos carros como inseridos (a API roda em um único processo)
+lock_cadastro_lote = asyncio.Lock()
+
 
 # Modelo de entrada para criação e edição de carro
 class CarroCreate(BaseModel):
@@ -90,44 +101,11 @@ async def listar_carros(db: AsyncSession = Depends(get_db)):
 # Rota para criar um novo carro
 @router.post("/", status_code=status.HTTP_201_CREATED, summary="Criar Carro")
 async def criar_carro(carro: CarroCreate, db: AsyncSession = Depends(get_db)):
+    """Cria um carro, recusando carros com a mesma chave natural de um já cadastrado"""
+    chave = calcular_chave_natural(carro.model_dump())
 
-    filtros = [
-        CarroModel.categoria == carro.categoria,
-        CarroModel.marca == carro.marca,
-        CarroModel.modelo == carro.modelo,
-        CarroModel.motor == carro.motor,
-        CarroModel.versao == carro.versao,
-        CarroModel.transmissao == carro.transmissao,
-        CarroModel.ar_condicionado == carro.ar_condicionado,
-        CarroModel.direcao == carro.direcao,
-    ]
-
-    # String opcional
-    if carro.combustivel is not None:
-        filtros.append(CarroModel.combustivel == carro.combustivel)
-    else:
-        filtros.append(CarroModel.combustivel.is_(None))
-
-    # Floats opcionais (com arredondamento a 2 casas, se desejar)
-    def float_filter(column, value):
-        if value is not None:
-            # opcional: usar func.round para maior segurança no SQL
-            return func.round(column, 2) == round(value, 2)
-        return column.is_(None)
-
-    filtros.append(float_filter(CarroModel.km_etanol_cidade, carro.km_etanol_cidade))
-    filtros.append(float_filter(CarroModel.km_etanol_estrada, carro.km_etanol_estrada))
-    filtros.append(float_filter(CarroModel.km_gasolina_cidade, carro.km_gasolina_cidade))
-    filtros.append(float_filter(CarroModel.km_gasolina_estrada, carro.km_gasolina_estrada))
-
-    # Ano opcional
-    if carro.ano is not None:
-        filtros.append(CarroModel.ano == carro.ano)
-    else:
-        filtros.append(CarroModel.ano.is_(None))
-
-    # Executa a consulta de duplicata
-    query = select(CarroModel).where(and_(*filtros))
+    # Consulta de duplicata pela chave natural (coluna única e indexada)
+    query = select(CarroModel.id).where(CarroModel.chave_natural == chave)
     result = await db.execute(query)
     existente = result.scalars().first()
 
@@ -152,11 +130,21 @@ async def criar_carro(carro: CarroCreate, db: AsyncSession = Depends(get_db)):
         km_etanol_estrada=carro.km_etanol_estrada,
         km_gasolina_cidade=carro.km_gasolina_cidade,
         km_gasolina_estrada=carro.km_gasolina_estrada,
-        ano=carro.ano
+        ano=carro.ano,
+        chave_natural=chave
     )
     db.add(novo)
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Outro cadastro com a mesma chave foi gravado entre a consulta e o commit
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Já existe um carro cadastrado com estas mesmas especificações."
+        )
     await db.refresh(novo)
+    tabela_custos.atualizar_carro(novo)
 
     return {
         "status": "OK",
@@ -180,6 +168,61 @@ async def criar_carro(carro: CarroCreate, db: AsyncSession = Depends(get_db)):
     }
 
 
+# Rota para cadastrar vários carros de uma vez
+@router.post("/lote", status_code=status.HTTP_200_OK, summary="Criar Carros em Lote")
+async def criar_carros_lote(carros: List[CarroCreate], db: AsyncSession = Depends(get_db)):
+    """Cadastra vários carros em uma transação, ignorando os que já existem (mesma chave natural)"""
+
+    # Repetições dentro do próprio lote contam como duplicatas
+    linhas = {}
+    for carro in carros:
+        dados = carro.model_dump()
+        linhas.setdefault(calcular_chave_natural(dados), dados)
+    for chave, dados in linhas.items():
+        dados["chave_natural"] = chave
+
+    # Só colisões da chave natural são ignoradas (ON DUPLICATE KEY UPDATE sem efeito no MySQL, ON CONFLICT DO NOTHING
+    # no SQLite); ao contrário do INSERT IGNORE, os demais erros (ex.: valor truncado, NOT NULL) não viram avisos
+    valores = list(linhas.values())
+    inseridos = 0
+    async with lock_cadastro_lote:
+        try:
+            for inicio in range(0, len(valores), TAMANHO_BLOCO_INSERCAO):
+                bloco = valores[inicio:inicio + TAMANHO_BLOCO_INSERCAO]
+                # Os já cadastrados são contados antes, porque o rowcount do ON DUPLICATE KEY UPDATE no MySQL também
+                # conta as linhas encontradas
+                query = select(CarroModel.chave_natural).where(
+                    CarroModel.chave_natural.in_([dados["chave_natural"] for dados in bloco]))
+                existentes = len((await db.execute(query)).scalars().all())
+
+                if db.bind.dialect.name == "sqlite":
+                    stmt = sqlite_insert(CarroModel).values(bloco)
+                    stmt = stmt.on_conflict_do_nothing(index_elements=["chave_natural"])
+                else:
+                    stmt = mysql_insert(CarroModel).values(bloco)
+                    stmt = stmt.on_duplicate_key_update(id=CarroModel.id)
+                await db.execute(stmt)
+                inseridos += len(bloco) - existentes
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            raise HTTPException(status_code=500, detail=f"Erro ao cadastrar carros: {str(e)}")
+
+    # Atualiza a tabela de custos com os carros do lote (novos ou já existentes)
+    chaves = list(linhas)
+    for inicio in range(0, len(chaves), TAMANHO_BLOCO_INSERCAO):
+        query = select(CarroModel).where(CarroModel.chave_natural.in_(chaves[inicio:inicio + TAMANHO_BLOCO_INSERCAO]))
+        for carro in (await db.execute(query)).scalars().all():
+            tabela_custos.atualizar_carro(carro)
+
+    return {
+        "status": "OK",
+        "recebidos": len(carros),
+        "inseridos": inseridos,
+        "duplicados": len(carros) - inseridos,
+    }
+
+
 # Rota para editar os dados de um carro existente
 @router.put("/{carro_id}", status_code=status.HTTP_200_OK, summary="Editar Carro")
 async def editar_carro(carro_id: int, carro: CarroUpdate, db: AsyncSession = Depends(get_db)):
@@ -192,6 +235,14 @@ async def editar_carro(carro_id: int, carro: CarroUpdate, db: AsyncSession = Dep
     if not carro_existente:
         raise HTTPException(status_code=404, detail="Carro não encontrado.")
 
+    chave = calcular_chave_natural(carro.model_dump())
+    query = select(CarroModel.id).where(CarroModel.chave_natural == chave, CarroModel.id != carro_id)
+    if (await db.execute(query)).scalars().first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Já existe um carro cadastrado com estas mesmas especificações."
+        )
+
     try:
         # Atualiza os dados do carro
         carro_existente.categoria = carro.categoria
@@ -208,9 +259,11 @@ async def editar_carro(carro_id: int, carro: CarroUpdate, db: AsyncSession = Dep
         carro_existente.km_gasolina_cidade = carro.km_gasolina_cidade
         carro_existente.km_gasolina_estrada = carro.km_gasolina_estrada
         carro_existente.ano = carro.ano
+        carro_existente.chave_natural = chave
 
         await db.commit()  # 🔄 Agora é assíncrono
         await db.refresh(carro_existente)  # 🔄 Agora é assíncrono
+        tabela_custos.atualizar_carro(carro_existente)
 
         return {"status": "OK", "carro": {
             "id": carro_existente.id,
@@ -247,6 +300,7 @@ async def excluir_carro(carro_id: int, db: AsyncSession = Depends(get_db)):
     try:
         await db.delete(carro_existente)
         await db.commit()
+        tabela_custos.remover_carro(carro_id)
         return  # 👈 nada deve ser retornado
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao excluir carro: {str(e)}")
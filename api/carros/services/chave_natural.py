@@ -0,0 +1,65 @@
+import hashlib
+
+from carros.models.carro_model import CarroModel
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+# Campos que identificam um carro do catálogo (a mesma ficha do PBEV)
+CAMPOS_TEXTO = [
+    "categoria", "marca", "modelo", "motor", "versao", "transmissao", "ar_condicionado", "direcao", "combustivel"
+]
+CAMPOS_CONSUMO = ["km_etanol_cidade", "km_etanol_estrada", "km_gasolina_cidade", "km_gasolina_estrada"]
+CAMPOS_CHAVE = CAMPOS_TEXTO + CAMPOS_CONSUMO + ["ano"]
+
+# Chave dos carros antigos repetidos (não é um SHA-1, então nunca coincide com a chave de um carro novo)
+PREFIXO_DUPLICADO = "duplicado-"
+
+
+# Normaliza um valor da chave: textos sem diferença de caixa e espaços, consumos com 2 casas e ausentes vazios.
+def normalizar_valor(campo: str, valor) -> str:
+    if valor is None:
+        return ""
+    if campo in CAMPOS_CONSUMO:
+        return f"{round(float(valor), 2):.2f}"
+    if campo == "ano":
+        return str(int(valor))
+    return " ".join(str(valor).split()).lower()
+
+
+# Calcula a chave natural (SHA-1 dos campos normalizados) de um carro, a partir de um dict ou de um CarroModel.
+# Dois carros com a mesma chave são o mesmo carro do catálogo; a coluna tb_carro.chave_natural é única.
+def calcular_chave_natural(carro) -> str:
+    dados = carro if isinstance(carro, dict) else {campo: getattr(carro, campo) for campo in CAMPOS_CHAVE}
+    conteudo = "|".join(normalizar_valor(campo, dados.get(campo)) for campo in CAMPOS_CHAVE)
+    return hashlib.sha1(conteudo.encode("utf-8")).hexdigest()
+
+
+# Preenche a chave dos carros cadastrados antes da coluna existir. Executado uma vez, no aquecimento da API.
+# Como a coluna é única, só o primeiro carro de cada chave a recebe; os repetidos ficam marcados com
+# PREFIXO_DUPLICADO + id, para não voltarem à consulta nas próximas inicializações.
+async def preencher_chaves_pendentes(db: AsyncSession) -> int:
+    pendentes = (await db.execute(
+        select(CarroModel.id, *[getattr(CarroModel, campo) for campo in CAMPOS_CHAVE])
+        .where(CarroModel.chave_natural.is_(None))
+        .order_by(CarroModel.id)
+    )).all()
+    if not pendentes:
+        return 0
+
+    chaves = [(linha.id, calcular_chave_natural(dict(zip(CAMPOS_CHAVE, linha[1:])))) for linha in pendentes]
+    existentes = set((await db.execute(
+        select(CarroModel.chave_natural).where(CarroModel.chave_natural.in_({chave for _, chave in chaves}))
+    )).scalars().all())
+
+    atualizacoes = []
+    for id_carro, chave in chaves:
+        if chave in existentes:
+            chave = f"{PREFIXO_DUPLICADO}{id_carro}"
+        else:
+            existentes.add(chave)
+        atualizacoes.append({"id": id_carro, "chave_natural": chave})
+
+    await db.execute(update(CarroModel), atualizacoes)
+    await db.commit()
+    return len(atualizacoes)
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import threading
+
+from carros.models.carro_model import CarroModel
+from dotenv import load_dotenv
+from motoristas.models.motorista_model import MotoristaModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+load_dotenv()
+
+# Preço do litro de cada combustível (R$) e consumo usado quando o carro não informa o seu (km/l)
+PRECO_GASOLINA = float(os.getenv("PRECO_GASOLINA", "6.0"))
+PRECO_ETANOL = float(os.getenv("PRECO_ETANOL", "6.0"))
+CONSUMO_PADRAO = 10.0
+
+PRECOS_COMBUSTIVEL = {"gasolina": PRECO_GASOLINA, "etanol": PRECO_ETANOL}
+
+# Custo por km de um carro sem cadastro de consumo
+CUSTO_PADRAO = {
+    "combustivel": "gasolina",
+    "cidade": PRECO_GASOLINA / CONSUMO_PADRAO,
+    "estrada": PRECO_GASOLINA / CONSUMO_PADRAO,
+}
+
+
+# Calcula o custo de combustível por km (cidade e estrada) de um carro.
+# Carros a gasolina ou flex usam o consumo com gasolina; os demais, o consumo com etanol.
+def calcular_custo_carro(combustivel, km_gasolina_cidade, km_gasolina_estrada, km_etanol_cidade,
+                         km_etanol_estrada) -> dict:
+    if (combustivel or "").lower() in ["gasolina", "flex"]:
+        tipo, cidade, estrada = "gasolina", km_gasolina_cidade, km_gasolina_estrada
+    else:
+        tipo, cidade, estrada = "etanol", km_etanol_cidade, km_etanol_estrada
+
+    preco = PRECOS_COMBUSTIVEL[tipo]
+    cidade = float(cidade) if cidade else CONSUMO_PADRAO
+    estrada = float(estrada) if estrada else cidade
+    return {"combustivel": tipo, "cidade": preco / cidade, "estrada": preco / estrada}
+
+
+# Tabela em memória com o custo por km de cada carro e o carro de cada motorista.
+# É montada a partir de tb_carro e tb_motorista (duas consultas sem join) e atualizada pelas rotas de
+# carros e motoristas, de modo que a precificação obtém o custo do motorista sem consultar o banco.
+class TabelaCustoCarros:
+    def __init__(self):
+        self._custos = {}
+        self._carro_por_motorista = {}
+        self._lock = threading.Lock()
+        self._lock_carga = asyncio.Lock()
+        self.carregada = False
+
+    # Lê todos os carros e vínculos motorista -> carro do banco e substitui a tabela atual.
+    async def carregar(self, db: AsyncSession):
+        carros = (await db.execute(select(
+            CarroModel.id, CarroModel.combustivel, CarroModel.km_gasolina_cidade, CarroModel.km_gasolina_estrada,
+            CarroModel.km_etanol_cidade, CarroModel.km_etanol_estrada,
+        ))).all()
+        motoristas = (await db.execute(select(MotoristaModel.id, MotoristaModel.id_carro))).all()
+
+        custos = {carro.id: calcular_custo_carro(*carro[1:]) for carro in carros}
+        with self._lock:
+            self._custos = custos
+            self._carro_por_motorista = dict(motoristas)
+        self.carregada = True
+
+    # Carrega a tabela na primeira utilização (uma única vez, mesmo com requisições concorrentes).
+    async def garantir_carregada(self, db: AsyncSession):
+        if self.carregada:
+            return
+        async with self._lock_carga:
+            if not self.carregada:
+                await self.carregar(db)
+
+    def atualizar_carro(self, carro: CarroModel):
+        custo = calcular_custo_carro(carro.combustivel, carro.km_gasolina_cidade, carro.km_gasolina_estrada,
+                                     carro.km_etanol_cidade, carro.km_etanol_estrada)
+        with self._lock:
+            self._custos[carro.id] = custo
+
+    def remover_carro(self, id_carro: int):
+        with self._lock:
+            self._custos.pop(id_carro, None)
+
+    def atualizar_motorista(self, id_motorista: int, id_carro: int):
+        with self._lock:
+            self._carro_por_motorista[id_motorista] = id_carro
+
+    def remover_motorista(self, id_motorista: int):
+        with self._lock:
+            self._carro_por_motorista.pop(id_motorista, None)
+
+    # Custo por km do carro do motorista (trecho "cidade" ou "estrada"); sem motorista ou carro, usa o padrão.
+    def custo_por_km(self, id_motorista, trecho: str = "cidade") -> float:
+        with self._lock:
+            custo = self._custos.get(self._carro_por_motorista.get(id_motorista), CUSTO_PADRAO)
+        return custo[trecho]
+
+    # Tabela completa de custos por carro.
+    def custos(self) -> dict:
+        with self._lock:
+            return dict(self._custos)
+
+
+tabela_custos = TabelaCustoCarros()
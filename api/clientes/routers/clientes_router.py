@@ -1,10 +1,13 @@
 import re
+from typing import List
 
 from clientes.models.cliente_model import ClienteModel
 from core.dependencies import get_db
+from core.validacao import MENSAGEM_CONFLITO_LOTE, TAMANHO_BLOCO_CONSULTA, limpar_cpfs, verificar_unicidade
 from corridas.models.corrida_model import CorridaModel
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
+from sqlalchemy import insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -131,6 +134,55 @@ async def criar_cliente(cliente: ClienteCreate, db: AsyncSession = Depends(get_d
     }}
 
 
+# Rota para criar vários clientes de uma vez.
+@router.post("/lote", status_code=status.HTTP_200_OK, summary="Criar Clientes em Lote")
+async def criar_clientes_lote(clientes: List[ClienteCreate], db: AsyncSession = Depends(get_db)):
+    """Cria vários clientes em uma transação, retornando o id de cada cliente criado e os erros das linhas recusadas"""
+    linhas = [cliente.model_dump() for cliente in clientes]
+    erros = {}
+
+    cpfs, validos = limpar_cpfs([linha["cpf"] for linha in linhas])
+    for indice, (linha, cpf, valido) in enumerate(zip(linhas, cpfs, validos)):
+        linha["cpf"] = cpf
+        if not valido:
+            erros[indice] = "CPF inválido. Deve conter 11 dígitos numéricos."
+
+    # Uma consulta IN por coluna única para o lote inteiro
+    await verificar_unicidade(db, linhas, {
+        "email": ClienteModel.email,
+        "cpf": ClienteModel.cpf,
+        "telefone": ClienteModel.telefone,
+    }, erros)
+
+    novos = [linha for indice, linha in enumerate(linhas) if indice not in erros]
+    ids_por_cpf = {}
+    if novos:
+        try:
+            await db.execute(insert(ClienteModel), novos)
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(status_code=400, detail=MENSAGEM_CONFLITO_LOTE)
+        except Exception:
+            await db.rollback()
+            raise HTTPException(status_code=500, detail="Erro ao criar clientes.")
+
+        cpfs_novos = [linha["cpf"] for linha in novos]
+        for inicio in range(0, len(cpfs_novos), TAMANHO_BLOCO_CONSULTA):
+            query = select(ClienteModel.cpf, ClienteModel.id).where(
+                ClienteModel.cpf.in_(cpfs_novos[inicio:inicio + TAMANHO_BLOCO_CONSULTA])
+            )
+            ids_por_cpf.update((await db.execute(query)).all())
+
+    return {
+        "status": "OK",
+        "recebidos": len(linhas),
+        "inseridos": len(novos),
+        "ids": [None if indice in erros else ids_por_cpf.get(linha["cpf"]) for indice, linha in enumerate(linhas)],
+        "erros": [{"indice": indice, "erro": erro} for indice, erro in sorted(erros.items())],
+    }
+
+
 # Rota para editar os dados de um cliente existente.
 @router.put("/{cliente_id}", summary="Editar Cliente")
 async def editar_cliente(cliente_id: int, cliente: ClienteUpdate, db: AsyncSession = Depends(get_db)):
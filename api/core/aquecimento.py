@@ -0,0 +1,97 @@
+import asyncio
+import os
+import time
+
+from carros.services.chave_natural import preencher_chaves_pendentes
+from carros.services.custo_carro import tabela_custos
+from core.database import SessionLocal
+from corridas.services.contador_demanda import contador_demanda
+from corridas.services.rota_service import normalizar_nome_cidade, registro_grafos
+from dotenv import load_dotenv
+from mapas_rotas.services.amostrador_enderecos import amostrador_enderecos
+from mapas_rotas.services.densidade_rotas import atualizar_densidade, garantir_controle
+from precificacao.services.modelo_taxas import obter_modelo_taxas
+
+load_dotenv()
+
+# Cidades pré-carregadas na inicialização, separadas por ";" (vazio = todas as cidades com grafo disponível)
+CIDADES_PRECARREGADAS = os.getenv("CIDADES_PRECARREGADAS", "")
+
+# Estado do aquecimento consultado pelo endpoint de prontidão
+estado_aquecimento = {
+    "pronto": False,
+    "erro": None,
+    "duracao_s": None,
+    "cidades": {},
+}
+
+
+# Lista as cidades a aquecer a partir da configuração ou, na falta dela, do índice de grafos.
+def cidades_para_aquecer() -> list:
+    if CIDADES_PRECARREGADAS.strip():
+        return [normalizar_nome_cidade(cidade) for cidade in CIDADES_PRECARREGADAS.split(";") if cidade.strip()]
+    return registro_grafos.cidades_disponiveis()
+
+
+# Carrega o modelo de taxas e, para cada cidade, grafo, índice espacial e endereços, registrando os tempos.
+def aquecer(cidades: list):
+    inicio = time.perf_counter()
+    if obter_modelo_taxas() is not None:
+        estado_aquecimento["modelo_taxas_s"] = round(time.perf_counter() - inicio, 3)
+
+    for cidade in cidades:
+        inicio = time.perf_counter()
+        registro_grafos.obter_com_indice(cidade)
+
+        if amostrador_enderecos.caminho_csv(cidade).exists():
+            amostrador_enderecos.carregar(cidade)
+
+        duracao = time.perf_counter() - inicio
+        estado_aquecimento["cidades"][cidade] = round(duracao, 3)
+        print(f"Cidade '{cidade}' aquecida em {duracao:.2f} s.")
+
+
+# Preenche a chave natural dos carros antigos e carrega as tabelas em memória que dependem do banco (custos dos
+# carros e demanda por bairro). Uma falha aqui não impede a prontidão: as tabelas também são carregadas na
+# primeira requisição que as usa.
+async def aquecer_banco():
+    try:
+        async with SessionLocal() as db:
+            preenchidas = await preencher_chaves_pendentes(db)
+            if preenchidas:
+                print(f"Chave natural preenchida em {preenchidas} carros cadastrados antes da coluna.")
+            await tabela_custos.garantir_carregada(db)
+            await contador_demanda.garantir_hidratado(db)
+        print("Tabelas de custos dos carros e de demanda carregadas.")
+    except Exception as e:
+        print(f"Não foi possível carregar as tabelas do banco no aquecimento: {e}")
+
+
+# Cria a linha de controle da densidade de rotas e incorpora as corridas ainda não contadas, para que a primeira
+# requisição de densidade não precise percorrer o histórico inteiro. Roda depois da API ficar pronta.
+async def aquecer_densidade():
+    try:
+        async with SessionLocal() as db:
+            await garantir_controle(db)
+            inicio = time.perf_counter()
+            processadas = await atualizar_densidade(db)
+        estado_aquecimento["densidade_s"] = round(time.perf_counter() - inicio, 3)
+        print(f"Densidade de rotas atualizada com {processadas} corridas.")
+    except Exception as e:
+        print(f"Não foi possível atualizar a densidade de rotas no aquecimento: {e}")
+
+
+# Executa o aquecimento fora do loop de eventos; a API só fica pronta quando ele termina sem erros.
+async def executar_aquecimento():
+    inicio = time.perf_counter()
+    try:
+        cidades = await asyncio.to_thread(cidades_para_aquecer)
+        await asyncio.to_thread(aquecer, cidades)
+        await aquecer_banco()
+        estado_aquecimento["pronto"] = True
+        await aquecer_densidade()
+    except Exception as e:
+        estado_aquecimento["erro"] = str(e)
+        print(f"Erro no aquecimento da API: {e}")
+    finally:
+        estado_aquecimento["duracao_s"] = round(time.perf_counter() - inicio, 3)
@@ -14,8 +14,11 @@ password = os.getenv("SQLALCHEMY_PASSWORD")
 host = os.getenv("SQLALCHEMY_HOST")
 database = os.getenv("SQLALCHEMY_DATABASE")
 
-# Define a URL de conexão assíncrona com o banco de dados MySQL
-SQLALCHEMY_DATABASE_URL = f"mysql+aiomysql://{user}:{password}@{host}/{database}"
+# Define a URL de conexão assíncrona com o banco de dados MySQL; SQLALCHEMY_ASYNC_DATABASE_URL substitui a URL
+# montada acima (ex.: "sqlite+aiosqlite:///simulacao.db" na simulação em processo, sem servidor MySQL)
+SQLALCHEMY_DATABASE_URL = (
+    os.getenv("SQLALCHEMY_ASYNC_DATABASE_URL") or f"mysql+aiomysql://{user}:{password}@{host}/{database}"
+)
 
 # Cria o engine assíncrono para interagir com o banco de dados
 engine = create_async_engine(SQLALCHEMY_DATABASE_URL, echo=False)
@@ -0,0 +1,58 @@
+import pandas as pd
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+# Quantidade de valores por consulta IN na verificação de unicidade
+TAMANHO_BLOCO_CONSULTA = 5000
+
+# Resposta dos cadastros em lote quando o banco recusa o lote por uma coluna única (conflito não previsto na
+# verificação de unicidade, ex.: um cadastro concorrente)
+MENSAGEM_CONFLITO_LOTE = "Dados já cadastrados: um valor único do lote já existe no banco. Nenhuma linha foi gravada."
+
+
+# Remove a formatação de uma lista de CPFs de uma só vez e indica quais têm 11 dígitos numéricos.
+# Retorna (cpfs_limpos, validos), duas listas alinhadas com a entrada.
+def limpar_cpfs(cpfs: list) -> tuple:
+    limpos = pd.Series(cpfs, dtype=object).fillna("").astype(str).str.replace(r"\D", "", regex=True)
+    validos = limpos.str.len() == 11
+    return limpos.tolist(), validos.tolist()
+
+
+# Busca quais dos valores já existem em uma coluna única, com uma consulta IN por bloco de valores.
+async def buscar_existentes(db: AsyncSession, coluna, valores: list) -> set:
+    valores = list({valor for valor in valores if valor is not None})
+    existentes = set()
+    for inicio in range(0, len(valores), TAMANHO_BLOCO_CONSULTA):
+        bloco = valores[inicio:inicio + TAMANHO_BLOCO_CONSULTA]
+        existentes.update((await db.execute(select(coluna).where(coluna.in_(bloco)))).scalars().all())
+    return existentes
+
+
+# Normaliza um valor único para comparação: o MySQL compara textos sem diferenciar caixa, então "A@x.com" e
+# "a@x.com" colidem no índice único.
+def normalizar_unico(valor) -> str:
+    return str(valor).strip().casefold()
+
+
+# Verifica as colunas únicas de um lote de linhas, registrando em "erros" (índice -> mensagem) as linhas cujo valor
+# já está no banco ou se repete em uma linha anterior do lote. Linhas que já têm erro são ignoradas.
+# A consulta IN leva os valores originais e normalizados, e a comparação é feita sobre os normalizados.
+async def verificar_unicidade(db: AsyncSession, linhas: list, colunas: dict, erros: dict):
+    for campo, coluna in colunas.items():
+        valores = [linha[campo] for indice, linha in enumerate(linhas) if indice not in erros]
+        existentes = await buscar_existentes(
+            db, coluna, valores + [normalizar_unico(valor) for valor in valores if valor is not None]
+        )
+        existentes = {normalizar_unico(valor) for valor in existentes}
+        vistos = set()
+        for indice, linha in enumerate(linhas):
+            valor = linha[campo]
+            if indice in erros or valor is None:
+                continue
+            chave = normalizar_unico(valor)
+            if chave in existentes:
+                erros[indice] = f"{campo} já cadastrado: {valor}"
+            elif chave in vistos:
+                erros[indice] = f"{campo} repetido no lote: {valor}"
+            else:
+                vistos.add(chave)
@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from core.database import Base
 from sqlalchemy import Column, Integer, String, DateTime, Numeric, Text, ForeignKey
 from sqlalchemy.orm import relationship
@@ -29,6 +31,8 @@ class CorridaModel(Base):
     nivel_taxa = Column(Integer, nullable=True)
     preco_total = Column(Numeric(10, 2), nullable=True)
     status = Column(String(255), nullable=False)
+    versao_niveis = Column(String(64), nullable=True)
+    atualizado_em = Column(DateTime, nullable=True, default=datetime.now, onupdate=datetime.now)
 
     id_cliente = Column(Integer, ForeignKey("tb_cliente.id"), nullable=True)
     cliente = relationship("ClienteModel", back_populates="corridas")
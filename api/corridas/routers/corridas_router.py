@@ -1,12 +1,22 @@
+import asyncio
 import random
 from datetime import datetime
+from typing import List, Optional
 
+from carros.services.custo_carro import tabela_custos
 from core.dependencies import get_db
 from corridas.models.corrida_model import CorridaModel
+from corridas.services.contador_demanda import contador_demanda
 from corridas.services.rota_service import calcular_rota_mais_curta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from mapas_rotas.services.cache_mapas import cache_mapas
 from motoristas.models.motorista_model import MotoristaModel
-from pydantic import BaseModel
+from precificacao.routers.precificacao_router import CorridaPrecificacao
+from precificacao.services.modelo_taxas import obter_modelo_taxas
+from precificacao.services.motor_precificacao import precificar_corridas
+from precificacao.services.registro_niveis import registro_niveis
+from pydantic import BaseModel, Field
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
@@ -26,6 +36,7 @@ class TaxasAtualizadas(BaseModel):
     valor_motorista: float
     preco_total: float
     nivel_taxa: int
+    versao_niveis: Optional[str] = Field(None, max_length=64)
 
     class Config:
         json_schema_extra = {
@@ -164,19 +175,28 @@ async def listar_todas_corridas(db: AsyncSession = Depends(get_db)):
 
 # Rota para listar todas as corridas disponíveis no status 'solicitado'.
 @router.get("/listar_disponiveis", summary="Listar corridas disponíveis")
-async def listar_corridas_disponiveis(db: AsyncSession = Depends(get_db)):
-    """Lista todas as corridas disponíveis no status 'solicitado'"""
+async def listar_corridas_disponiveis(apos_id: Optional[int] = None, limite: Optional[int] = Query(None, ge=1, le=5000),
+                                      db: AsyncSession = Depends(get_db)):
+    """Lista as corridas no status 'solicitado' em ordem de id, paginadas por cursor (apos_id, limite) se informados"""
     query = (
         select(CorridaModel)
         .where(CorridaModel.status == "solicitado")
-        .options(joinedload(CorridaModel.cliente), joinedload(CorridaModel.motorista))
+        .options(joinedload(CorridaModel.cliente))
+        .order_by(CorridaModel.id)
     )
+    if apos_id is not None:
+        query = query.where(CorridaModel.id > apos_id)
+    if limite is not None:
+        query = query.limit(limite)
     result = await db.execute(query)
     corridas_disponiveis = result.scalars().all()
 
     if not corridas_disponiveis:
         return {"mensagem": "Sem corridas disponíveis no momento."}
 
+    # Custo de combustível por km do carro de cada motorista, direto da tabela em memória
+    await tabela_custos.garantir_carregada(db)
+
     return {
         "corridas_disponiveis": [
             {
@@ -186,12 +206,46 @@ async def listar_corridas_disponiveis(db: AsyncSession = Depends(get_db)):
                 "destino_rua": corrida.destino_rua,
                 "destino_bairro": corrida.destino_bairro,
                 "nome_cliente": corrida.cliente.nome if corrida.cliente else "Cliente Desconhecido",
-                "id_motorista": corrida.motorista.id if corrida.motorista else None,
+                "id_motorista": corrida.id_motorista,
+                "custo_km": round(tabela_custos.custo_por_km(corrida.id_motorista), 4),
                 "distancia_km": corrida.distancia_km,
                 "horario_pedido": corrida.horario_pedido,
+                "atualizado_em": corrida.atualizado_em,
             }
             for corrida in corridas_disponiveis
-        ]
+        ],
+        "proximo_apos_id": corridas_disponiveis[-1].id,
+    }
+
+
+# Rota para consultar a demanda de corridas na janela deslizante, por bairro.
+@router.get("/demanda", summary="Consultar demanda de corridas por bairro")
+async def consultar_demanda(horario: Optional[datetime] = None, bairro: Optional[str] = None,
+                            db: AsyncSession = Depends(get_db)):
+    """Retorna a quantidade de corridas pedidas na janela deslizante e se há excesso de corridas."""
+    await contador_demanda.garantir_hidratado(db)
+
+    horario = horario or contador_demanda.horario_mais_recente()
+    if horario is None:
+        return {"mensagem": "Nenhuma corrida registrada."}
+
+    resposta = {
+        "horario": horario,
+        "janela_min": contador_demanda.janela * contador_demanda.intervalo_s // 60,
+        "limite_excesso": contador_demanda.limite,
+    }
+    if bairro:
+        quantidade = contador_demanda.contar(horario, bairro)
+        return {**resposta, "bairro": bairro, "corridas": quantidade, "excesso": quantidade > contador_demanda.limite}
+
+    resumo = contador_demanda.resumo(horario)
+    return {
+        **resposta,
+        "corridas": resumo["total"],
+        "bairros": [
+            {"bairro": nome, "corridas": quantidade, "excesso": quantidade > contador_demanda.limite}
+            for nome, quantidade in resumo["bairros"].items()
+        ],
     }
 
 
@@ -216,10 +270,13 @@ async def solicitar_corrida(corrida_data: CorridaCreate, db: AsyncSession = Depe
                 detail="Já existe uma corrida solicitada ou aceita para este cliente."
             )
 
+        # Hidrata o contador de demanda antes de gravar a corrida, para que ela seja contada uma única vez
+        await contador_demanda.garantir_hidratado(db)
+
         # Calcular a rota mais curta
         try:
-            _, coordenadas_rota, distancia_km = calcular_rota_mais_curta(
-                cidade="Vitória da Conquista, Brasil",
+            _, coordenadas_rota, distancia_km = await asyncio.to_thread(
+                calcular_rota_mais_curta,
                 origem_longitude=origem.longitude,
                 origem_latitude=origem.latitude,
                 destino_longitude=destino.longitude,
@@ -271,6 +328,8 @@ async def solicitar_corrida(corrida_data: CorridaCreate, db: AsyncSession = Depe
         await db.commit()
         await db.refresh(nova_corrida)
 
+        contador_demanda.registrar(nova_corrida.origem_bairro, nova_corrida.horario_pedido)
+
         return nova_corrida
     except Exception as e:
         raise HTTPException(
@@ -302,7 +361,11 @@ async def finalizar_corrida(corrida_id: int, taxas: TaxasAtualizadas, db: AsyncS
     if taxas.nivel_taxa is not None:
         corrida.nivel_taxa = taxas.nivel_taxa
     corrida.preco_total = taxas.preco_total
+    # Versão da tabela de níveis usada pelo cliente ou, se não informada, a publicada na API
+    tabela_niveis = registro_niveis.tabela()
+    corrida.versao_niveis = taxas.versao_niveis or (tabela_niveis.versao if tabela_niveis else None)
     corrida.status = "finalizada"
+    corrida.atualizado_em = datetime.now()
 
     if corrida.id_motorista:
         motorista_query = select(MotoristaModel).where(MotoristaModel.id == corrida.id_motorista)
@@ -316,13 +379,72 @@ async def finalizar_corrida(corrida_id: int, taxas: TaxasAtualizadas, db: AsyncS
     await db.commit()
     await db.refresh(corrida)
 
+    # Os preços mudaram: descarta os mapas renderizados com os valores antigos
+    cache_mapas.invalidar(corrida.id)
+
+    # Estimativa do modelo de taxas para conferência do preço informado pelo cliente
+    modelo = obter_modelo_taxas()
+    preco_estimado = round(float(modelo.prever_configuracoes([taxas.model_dump()])[0]), 2) if modelo else None
+
     return {
         "mensagem": "Corrida finalizada com sucesso.",
         "corrida_id": corrida.id,
         "status": corrida.status,
         "preco_total": corrida.preco_total,
         "valor_motorista": corrida.valor_motorista,
-        "nivel_taxa": corrida.nivel_taxa
+        "nivel_taxa": corrida.nivel_taxa,
+        "versao_niveis": corrida.versao_niveis,
+        "preco_estimado_modelo": preco_estimado
+    }
+
+
+# Rota para calcular as tarifas no servidor e finalizar várias corridas em uma única transação.
+@router.put("/finalizar_lote", status_code=status.HTTP_200_OK, summary="Calcular taxas e finalizar corridas em lote")
+async def finalizar_corridas_lote(itens: List[CorridaPrecificacao], db: AsyncSession = Depends(get_db)):
+    """Calcula as tarifas de cada corrida com o motor de precificação e finaliza todas de uma vez."""
+    niveis_por_corrida = {item.corrida_id: item.nivel_taxa for item in itens}
+    try:
+        corridas, precos = await precificar_corridas(db, niveis_por_corrida)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    agora = datetime.now()
+    ids_motoristas = set()
+    for corrida, preco in zip(corridas, precos):
+        for campo, valor in preco.items():
+            setattr(corrida, campo, valor)
+        corrida.status = "finalizada"
+        corrida.atualizado_em = agora
+        if corrida.id_motorista:
+            ids_motoristas.add(corrida.id_motorista)
+
+    try:
+        if ids_motoristas:
+            await db.execute(
+                update(MotoristaModel).where(MotoristaModel.id.in_(ids_motoristas)).values(status="disponivel")
+            )
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao finalizar corridas: {str(e)}")
+
+    for corrida in corridas:
+        cache_mapas.invalidar(corrida.id)
+
+    encontradas = {corrida.id for corrida in corridas}
+    return {
+        "mensagem": f"{len(corridas)} corridas finalizadas com sucesso.",
+        "corridas": [
+            {
+                "corrida_id": corrida.id,
+                "preco_total": preco["preco_total"],
+                "valor_motorista": preco["valor_motorista"],
+                "nivel_taxa": preco["nivel_taxa"],
+                "versao_niveis": preco["versao_niveis"],
+            }
+            for corrida, preco in zip(corridas, precos)
+        ],
+        "nao_encontradas": [corrida_id for corrida_id in niveis_por_corrida if corrida_id not in encontradas],
     }
 
 
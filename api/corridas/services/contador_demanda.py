@@ -0,0 +1,156 @@
+import asyncio
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+from corridas.models.corrida_model import CorridaModel
+from dotenv import load_dotenv
+from sqlalchemy import func, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+load_dotenv()
+
+# Tamanho de cada intervalo de contagem, janela deslizante usada na detecção de excesso e histórico mantido
+DEMANDA_INTERVALO_S = int(os.getenv("DEMANDA_INTERVALO_S", "60"))
+DEMANDA_JANELA_MIN = int(os.getenv("DEMANDA_JANELA_MIN", "15"))
+DEMANDA_HISTORICO_H = int(os.getenv("DEMANDA_HISTORICO_H", "24"))
+LIMITE_EXCESSO_CORRIDAS = int(os.getenv("LIMITE_EXCESSO_CORRIDAS", "10"))
+
+# Chave das contagens de toda a cidade (soma de todos os bairros)
+TODOS_BAIRROS = "*"
+
+
+# Contador de demanda por bairro em janelas deslizantes de tempo.
+# Cada bairro tem um buffer circular com um contador por intervalo; a posição de um horário é o número do
+# intervalo módulo o tamanho do buffer, e o número do intervalo gravado em cada posição identifica contagens antigas.
+# Registrar uma corrida e consultar a janela não dependem da quantidade de corridas pendentes.
+class ContadorDemanda:
+    def __init__(self, intervalo_s: int = DEMANDA_INTERVALO_S, janela_min: int = DEMANDA_JANELA_MIN,
+                 historico_h: int = DEMANDA_HISTORICO_H, limite: int = LIMITE_EXCESSO_CORRIDAS):
+        self.intervalo_s = intervalo_s
+        self.janela = max(1, janela_min * 60 // intervalo_s)
+        self.capacidade = max(self.janela, historico_h * 3600 // intervalo_s)
+        self.limite = limite
+        self._contagens = {}
+        self._intervalos = {}
+        self._ultimo_intervalo = None
+        self._lock = threading.Lock()
+        self._lock_hidratacao = asyncio.Lock()
+        self.hidratado = False
+
+    # Número do intervalo (desde a época Unix) que contém o horário.
+    def intervalo(self, horario: datetime) -> int:
+        return int(horario.replace(tzinfo=None).timestamp()) // self.intervalo_s
+
+    def _buffer(self, bairro: str):
+        if bairro not in self._contagens:
+            self._contagens[bairro] = np.zeros(self.capacidade, dtype=np.int64)
+            self._intervalos[bairro] = np.full(self.capacidade, -1, dtype=np.int64)
+        return self._contagens[bairro], self._intervalos[bairro]
+
+    # Deve ser chamado com o lock adquirido. Contagens mais antigas que o histórico mantido são ignoradas.
+    def _somar(self, bairro: str, intervalo: int, quantidade: int):
+        contagens, intervalos = self._buffer(bairro)
+        posicao = intervalo % self.capacidade
+        if intervalos[posicao] > intervalo:
+            return
+        if intervalos[posicao] != intervalo:
+            intervalos[posicao] = intervalo
+            contagens[posicao] = 0
+        contagens[posicao] += quantidade
+
+    # Registra uma (ou mais) corridas pedidas no bairro e horário informados.
+    def registrar(self, bairro: str, horario: datetime, quantidade: int = 1):
+        self.registrar_intervalo(bairro, self.intervalo(horario), quantidade)
+
+    # Registra corridas já agrupadas pelo número do intervalo.
+    def registrar_intervalo(self, bairro: str, intervalo: int, quantidade: int):
+        with self._lock:
+            self._somar(bairro, intervalo, quantidade)
+            self._somar(TODOS_BAIRROS, intervalo, quantidade)
+            if self._ultimo_intervalo is None or intervalo > self._ultimo_intervalo:
+                self._ultimo_intervalo = intervalo
+
+    # Quantidade de corridas na janela que termina no intervalo do horário (bairro None = cidade inteira).
+    def contar(self, horario: datetime, bairro: str = None) -> int:
+        intervalo = self.intervalo(horario)
+        with self._lock:
+            chave = TODOS_BAIRROS if bairro is None else bairro
+            if chave not in self._contagens:
+                return 0
+            posicoes = np.arange(intervalo - self.janela + 1, intervalo + 1) % self.capacidade
+            validos = (self._intervalos[chave][posicoes] > intervalo - self.janela) & \
+                      (self._intervalos[chave][posicoes] <= intervalo)
+            return int(self._contagens[chave][posicoes][validos].sum())
+
+    # Indica se a demanda na janela passou do limite de excesso de corridas.
+    def excesso(self, horario: datetime, bairro: str = None) -> bool:
+        return self.contar(horario, bairro) > self.limite
+
+    # Horário de referência padrão das consultas: o intervalo mais recente com corridas registradas.
+    def horario_mais_recente(self):
+        with self._lock:
+            if self._ultimo_intervalo is None:
+                return None
+            return datetime.fromtimestamp(self._ultimo_intervalo * self.intervalo_s)
+
+    # Demanda de todos os bairros na janela que termina no horário, da maior para a menor.
+    def resumo(self, horario: datetime) -> dict:
+        with self._lock:
+            bairros = [bairro for bairro in self._contagens if bairro != TODOS_BAIRROS]
+        por_bairro = {bairro: self.contar(horario, bairro) for bairro in bairros}
+        return {
+            "total": self.contar(horario),
+            "bairros": dict(sorted(
+                ((bairro, total) for bairro, total in por_bairro.items() if total > 0),
+                key=lambda item: item[1], reverse=True,
+            )),
+        }
+
+    # Reconstrói as contagens a partir do banco com uma única consulta agregada por bairro e intervalo, limitada ao
+    # histórico mantido a partir do pedido mais recente. O intervalo é calculado no banco (segundos desde o início do
+    # histórico, alinhado a um intervalo, divididos pelo tamanho do intervalo), então a consulta devolve no máximo
+    # uma linha por bairro e intervalo, e não uma por corrida.
+    async def hidratar(self, db: AsyncSession):
+        mais_recente = (await db.execute(select(func.max(CorridaModel.horario_pedido)))).scalar()
+
+        linhas = []
+        if mais_recente is not None:
+            primeiro_intervalo = self.intervalo(mais_recente) - self.capacidade + 1
+            inicio = datetime.fromtimestamp(primeiro_intervalo * self.intervalo_s)
+            if db.bind.dialect.name == "sqlite":
+                segundos = (func.strftime("%s", CorridaModel.horario_pedido)
+                            - func.strftime("%s", inicio.strftime("%Y-%m-%d %H:%M:%S")))
+                numero = segundos / self.intervalo_s
+            else:
+                segundos = func.timestampdiff(literal_column("SECOND"), inicio, CorridaModel.horario_pedido)
+                numero = segundos.op("DIV")(self.intervalo_s)
+            numero = numero.label("numero")
+            query = (
+                select(CorridaModel.origem_bairro, numero, func.count(CorridaModel.id))
+                .where(CorridaModel.horario_pedido >= inicio)
+                # Agrupa pelo apelido: com o ONLY_FULL_GROUP_BY do MySQL, a expressão repetida com parâmetros não bate
+                .group_by(CorridaModel.origem_bairro, literal_column("numero"))
+            )
+            linhas = (await db.execute(query)).all()
+
+        with self._lock:
+            self._contagens = {}
+            self._intervalos = {}
+            self._ultimo_intervalo = None
+        for bairro, numero, quantidade in linhas:
+            self.registrar_intervalo(bairro, primeiro_intervalo + int(numero), quantidade)
+        self.hidratado = True
+
+    # Hidrata o contador na primeira utilização (uma única vez, mesmo com requisições concorrentes).
+    async def garantir_hidratado(self, db: AsyncSession):
+        if self.hidratado:
+            return
+        async with self._lock_hidratacao:
+            if not self.hidratado:
+                await self.hidratar(db)
+
+
+contador_demanda = ContadorDemanda()
@@ -1,35 +1,293 @@
+import json
 import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from pathlib import Path
 
 import networkx as nx
+import numpy as np
 import osmnx as ox
+from dotenv import load_dotenv
+from sklearn.neighbors import BallTree
 from unidecode import unidecode
 
-# Carregar grafo de cidade uma vez (armazenando no cache)
-grafo_cache = {}
+load_dotenv()
 
-# Função para carregar o grafo de uma cidade a partir de um arquivo GraphML.
-# Utiliza cache para evitar carregamentos repetidos.
-def carregar_grafo(cidade):
-    nome_cidade = unidecode(cidade.split(",")[0].strip().lower().replace(" ", "-"))
-    grafo_path = f"resources/{nome_cidade}.graphml"
+RESOURCES_DIR = Path(__file__).resolve().parents[2] / "resources"
+GRAFOS_MEMORIA_MAX_BYTES = int(float(os.getenv("GRAFOS_MEMORIA_MAX_MB", "1024")) * 1024 * 1024)
+
+# Estimativa de memória ocupada por nó e por aresta de um grafo do OSMnx carregado no NetworkX
+BYTES_POR_NO = 1200
+BYTES_POR_ARESTA = 1800
+
+
+# Normaliza o nome da cidade para o padrão usado nos arquivos (ex.: "Vitória da Conquista, Brasil" -> "vitoria-da-conquista").
+def normalizar_nome_cidade(cidade: str) -> str:
+    return unidecode(cidade.split(",")[0].strip().lower().replace(" ", "-"))
+
+
+# Lê apenas as coordenadas dos nós de um arquivo GraphML (sem montar o grafo) e calcula o retângulo envolvente.
+def calcular_bbox_graphml(caminho: Path):
+    chaves = {}
+    min_lat = min_lon = float("inf")
+    max_lat = max_lon = float("-inf")
+    lat = lon = None
+
+    for evento, elemento in ET.iterparse(caminho, events=("start", "end")):
+        tag = elemento.tag.rsplit("}", 1)[-1]
+        if evento == "start":
+            if tag == "node":
+                lat = lon = None
+            continue
+
+        if tag == "key" and elemento.get("for") == "node" and elemento.get("attr.name") in ("x", "y"):
+            chaves[elemento.get("id")] = elemento.get("attr.name")
+        elif tag == "data" and chaves.get(elemento.get("key")) == "y":
+            lat = float(elemento.text)
+        elif tag == "data" and chaves.get(elemento.get("key")) == "x":
+            lon = float(elemento.text)
+        elif tag == "node":
+            if lat is not None and lon is not None:
+                min_lat, max_lat = min(min_lat, lat), max(max_lat, lat)
+                min_lon, max_lon = min(min_lon, lon), max(max_lon, lon)
+            elemento.clear()
+        elif tag == "edge":
+            elemento.clear()
+
+    if min_lat == float("inf"):
+        raise ValueError(f"Nenhum nó com coordenadas encontrado em {caminho.name}.")
+
+    return min_lat, min_lon, max_lat, max_lon
+
+
+# Índice espacial dos nós de um grafo (BallTree com distância haversine), construído uma única vez por cidade.
+# Substitui ox.distance.nearest_nodes, que reconstrói a árvore a cada chamada em grafos não projetados.
+class IndiceEspacial:
+    def __init__(self, grafo):
+        nos, dados = zip(*grafo.nodes(data=True))
+        self.nos = np.asarray(nos)
+        coordenadas = np.array([[d["y"], d["x"]] for d in dados], dtype=float)
+        self.arvore = BallTree(np.radians(coordenadas), metric="haversine")
+
+    # Retorna o nó mais próximo de cada ponto (aceita escalares ou arrays).
+    def no_mais_proximo(self, latitude, longitude):
+        pontos = np.radians(np.column_stack([np.atleast_1d(latitude), np.atleast_1d(longitude)]).astype(float))
+        _, posicoes = self.arvore.query(pontos, k=1)
+        nos = self.nos[posicoes[:, 0]]
+        return nos[0].item() if np.ndim(latitude) == 0 else nos
+
+
+# Registro dos grafos das cidades disponíveis em resources/.
+# Resolve a cidade de uma corrida pelas coordenadas (índice de retângulos envolventes), carrega os grafos
+# sob demanda e descarta as cidades menos usadas quando a estimativa de memória passa do limite configurado.
+class RegistroGrafos:
+    def __init__(self, diretorio: Path = RESOURCES_DIR, memoria_max_bytes: int = GRAFOS_MEMORIA_MAX_BYTES):
+        self.diretorio = Path(diretorio)
+        self.memoria_max_bytes = memoria_max_bytes
+        self._bboxes = {}
+        self._grafos = OrderedDict()
+        self._indices = {}
+        self._estatisticas = {}
+        self._locks_carga = {}
+        self._lock = threading.RLock()
+        self._indice_carregado = False
+
+    # Varre o diretório em busca de arquivos .graphml e monta o índice de retângulos envolventes.
+    # O retângulo de cada cidade é salvo em "<cidade>.bbox.json" para não precisar reler o GraphML.
+    def atualizar_indice(self):
+        bboxes = {}
+        for caminho in sorted(self.diretorio.glob("*.graphml")):
+            nome = caminho.stem
+            caminho_bbox = caminho.with_suffix(".bbox.json")
+            bbox = None
+
+            if caminho_bbox.exists() and caminho_bbox.stat().st_mtime >= caminho.stat().st_mtime:
+                with open(caminho_bbox, "r", encoding="utf-8") as f:
+                    bbox = tuple(json.load(f))
+            else:
+                try:
+                    bbox = calcular_bbox_graphml(caminho)
+                except (ET.ParseError, ValueError) as e:
+                    print(f"Ignorando grafo '{caminho.name}': {e}")
+                    continue
+                with open(caminho_bbox, "w", encoding="utf-8") as f:
+                    json.dump(bbox, f)
+
+            bboxes[nome] = bbox
+
+        with self._lock:
+            # Mantém no índice os grafos registrados em memória que não têm arquivo (ex.: grafos sintéticos)
+            self._bboxes = {
+                **{nome: bbox for nome, bbox in self._bboxes.items() if nome in self._grafos},
+                **bboxes,
+            }
+            self._indice_carregado = True
+
+    def _garantir_indice(self):
+        if not self._indice_carregado:
+            self.atualizar_indice()
+
+    # Lista as cidades com grafo disponível.
+    def cidades_disponiveis(self) -> list:
+        self._garantir_indice()
+        return sorted(self._bboxes)
+
+    # Resolve a cidade que contém o ponto informado; havendo sobreposição, escolhe o menor retângulo.
+    def resolver_cidade(self, latitude: float, longitude: float) -> str:
+        self._garantir_indice()
+        candidatas = [
+            ((max_lat - min_lat) * (max_lon - min_lon), nome)
+            for nome, (min_lat, min_lon, max_lat, max_lon) in self._bboxes.items()
+            if min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon
+        ]
+        if not candidatas:
+            raise ValueError("As coordenadas informadas não pertencem a nenhuma cidade com grafo disponível.")
+        return min(candidatas)[1]
 
-    if not os.path.exists(grafo_path):
-        raise FileNotFoundError(f"Arquivo não encontrado. Execute a rota gerar_mapa primeiro.")
+    # Retorna o grafo da cidade, carregando-o do disco se necessário (uma única carga por cidade por vez).
+    def obter(self, nome_cidade: str):
+        with self._lock:
+            if nome_cidade in self._grafos:
+                self._grafos.move_to_end(nome_cidade)
+                self._estatisticas[nome_cidade]["acessos"] += 1
+                return self._grafos[nome_cidade]
+            lock_carga = self._locks_carga.setdefault(nome_cidade, threading.Lock())
 
-    # Usar cache
-    if nome_cidade not in grafo_cache:
-        grafo_cache[nome_cidade] = ox.load_graphml(grafo_path)
+        with lock_carga:
+            with self._lock:
+                if nome_cidade in self._grafos:
+                    self._grafos.move_to_end(nome_cidade)
+                    self._estatisticas[nome_cidade]["acessos"] += 1
+                    return self._grafos[nome_cidade]
 
-    return grafo_cache[nome_cidade]
+            grafo_path = self.diretorio / f"{nome_cidade}.graphml"
+            if not grafo_path.exists():
+                raise FileNotFoundError(f"Arquivo não encontrado. Execute a rota gerar_mapa primeiro.")
 
-# Função para calcular a rota mais curta entre dois pontos (latitude e longitude) em uma cidade.
+            inicio = time.perf_counter()
+            grafo = ox.load_graphml(grafo_path)
+            self.registrar(nome_cidade, grafo, tempo_carga=time.perf_counter() - inicio)
+            return grafo
+
+    # Retorna o grafo e o índice espacial da cidade, garantindo que ambos pertencem à mesma carga.
+    def obter_com_indice(self, nome_cidade: str):
+        while True:
+            grafo = self.obter(nome_cidade)
+            with self._lock:
+                if self._grafos.get(nome_cidade) is grafo:
+                    return grafo, self._indices[nome_cidade]
+
+    # Registra um grafo já carregado (ou gerado) para a cidade, aplicando a política de despejo LRU.
+    def registrar(self, nome_cidade: str, grafo, tempo_carga: float = 0.0):
+        memoria = grafo.number_of_nodes() * BYTES_POR_NO + grafo.number_of_edges() * BYTES_POR_ARESTA
+
+        inicio = time.perf_counter()
+        indice = IndiceEspacial(grafo)
+        tempo_indice = time.perf_counter() - inicio
+
+        with self._lock:
+            if nome_cidade not in self._bboxes:
+                latitudes = [dados["y"] for _, dados in grafo.nodes(data=True)]
+                longitudes = [dados["x"] for _, dados in grafo.nodes(data=True)]
+                self._bboxes[nome_cidade] = (min(latitudes), min(longitudes), max(latitudes), max(longitudes))
+
+            estatistica = self._estatisticas.setdefault(nome_cidade, {"acessos": 0, "carregamentos": 0})
+            estatistica.update({
+                "tempo_carga_s": round(tempo_carga, 3),
+                "tempo_indice_s": round(tempo_indice, 3),
+                "memoria_estimada_bytes": memoria,
+                "nos": grafo.number_of_nodes(),
+                "arestas": grafo.number_of_edges(),
+            })
+            estatistica["acessos"] += 1
+            estatistica["carregamentos"] += 1
+
+            self._grafos[nome_cidade] = grafo
+            self._indices[nome_cidade] = indice
+            self._grafos.move_to_end(nome_cidade)
+            self._despejar(manter=nome_cidade)
+
+    # Deve ser chamado com o lock adquirido. Nunca descarta a cidade recém-carregada.
+    def _despejar(self, manter: str):
+        while self.memoria_em_uso() > self.memoria_max_bytes and len(self._grafos) > 1:
+            nome = next(iter(self._grafos))
+            if nome == manter:
+                break
+            del self._grafos[nome]
+            del self._indices[nome]
+            print(f"Grafo '{nome}' descartado da memória (limite de {self.memoria_max_bytes} bytes).")
+
+    def memoria_em_uso(self) -> int:
+        with self._lock:
+            return sum(self._estatisticas[nome]["memoria_estimada_bytes"] for nome in self._grafos)
+
+    # Retorna tempos de carga, memória estimada e uso de cada cidade conhecida.
+    def estatisticas(self) -> dict:
+        self._garantir_indice()
+        with self._lock:
+            return {
+                "memoria_em_uso_bytes": self.memoria_em_uso(),
+                "memoria_max_bytes": self.memoria_max_bytes,
+                "cidades": {
+                    nome: {
+                        "carregado": nome in self._grafos,
+                        "bbox": self._bboxes.get(nome),
+                        **self._estatisticas.get(nome, {}),
+                    }
+                    for nome in sorted(set(self._bboxes) | set(self._estatisticas))
+                },
+            }
+
+
+registro_grafos = RegistroGrafos()
+
+
+# Gera um grafo sintético em grade (lado x lado nós) cobrindo o retângulo (min_lat, min_lon, max_lat, max_lon),
+# no formato dos grafos do OSMnx (MultiDiGraph com "y"/"x" nos nós e "length" em metros nas arestas, nos dois
+# sentidos). Usado para simular e medir as rotas sem baixar o mapa de uma cidade real.
+def gerar_grafo_grade(bbox: tuple, lado: int):
+    min_lat, min_lon, max_lat, max_lon = bbox
+    latitudes = np.linspace(min_lat, max_lat, lado)
+    longitudes = np.linspace(min_lon, max_lon, lado)
+
+    grafo = nx.MultiDiGraph(crs="epsg:4326")
+    for i, latitude in enumerate(latitudes):
+        for j, longitude in enumerate(longitudes):
+            grafo.add_node(i * lado + j, y=float(latitude), x=float(longitude))
+
+    for i in range(lado):
+        for j in range(lado):
+            no = i * lado + j
+            for vizinho in ([no + 1] if j + 1 < lado else []) + ([no + lado] if i + 1 < lado else []):
+                origem, destino = grafo.nodes[no], grafo.nodes[vizinho]
+                comprimento = float(ox.distance.great_circle(origem["y"], origem["x"], destino["y"], destino["x"]))
+                grafo.add_edge(no, vizinho, length=comprimento)
+                grafo.add_edge(vizinho, no, length=comprimento)
+
+    return grafo
+
+
+# Função para carregar o grafo de uma cidade a partir de um arquivo GraphML.
+# Utiliza o registro de grafos para evitar carregamentos repetidos.
+def carregar_grafo(cidade):
+    return registro_grafos.obter(normalizar_nome_cidade(cidade))
+
+
+# Função para calcular a rota mais curta entre dois pontos (latitude e longitude).
+# Se a cidade não for informada, ela é resolvida a partir das coordenadas de origem.
 # Retorna a rota, as coordenadas da rota e a distância total em quilômetros.
-def calcular_rota_mais_curta(cidade, origem_latitude, origem_longitude, destino_latitude, destino_longitude):
-    grafo = carregar_grafo(cidade)
+def calcular_rota_mais_curta(origem_latitude, origem_longitude, destino_latitude, destino_longitude, cidade=None):
+    nome_cidade = (
+        registro_grafos.resolver_cidade(origem_latitude, origem_longitude)
+        if cidade is None else normalizar_nome_cidade(cidade)
+    )
+    grafo, indice = registro_grafos.obter_com_indice(nome_cidade)
 
     # Encontrar os nós mais próximos da origem e destino
-    origem_no = ox.distance.nearest_nodes(grafo, origem_longitude, origem_latitude)
-    destino_no = ox.distance.nearest_nodes(grafo, destino_longitude, destino_latitude)
+    origem_no = indice.no_mais_proximo(origem_latitude, origem_longitude)
+    destino_no = indice.no_mais_proximo(destino_latitude, destino_longitude)
 
     # Calcular a rota mais curta
     try:
@@ -44,7 +302,7 @@ def calcular_rota_mais_curta(cidade, origem_latitude, origem_longitude, destino_
 
     # Calcular a distância total em metros
     distancia_metros = sum(
-        nx.get_edge_attributes(grafo, "length").get((rota[i], rota[i + 1], 0), 0)
+        grafo[rota[i]][rota[i + 1]].get(0, {}).get("length", 0)
         for i in range(len(rota) - 1)
     )
 
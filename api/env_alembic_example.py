@@ -26,6 +26,10 @@ from motoristas.models.motorista_model import MotoristaModel
 from clientes.models.cliente_model import ClienteModel
 # noinspection PyUnresolvedReferences
 from corridas.models.corrida_model import CorridaModel
+# noinspection PyUnresolvedReferences
+from mapas_rotas.models.densidade_model import DensidadeArestaModel, DensidadeControleModel
+# noinspection PyUnresolvedReferences
+from precificacao.models.nivel_taxa_model import NivelTaxaModel
 
 from core.database import Base
 
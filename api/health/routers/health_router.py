@@ -0,0 +1,18 @@
+from core.aquecimento import estado_aquecimento
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+router = APIRouter(prefix="/health", tags=["Saúde"])
+
+
+# Indica que o processo está no ar (não depende do aquecimento).
+@router.get("/live", status_code=status.HTTP_200_OK, summary="Verificar se a API está no ar")
+async def vivo():
+    return {"status": "OK"}
+
+
+# Retorna 200 apenas depois que grafos, índices espaciais e endereços foram pré-carregados.
+@router.get("/ready", summary="Verificar se a API está pronta para receber tráfego")
+async def pronto():
+    codigo = status.HTTP_200_OK if estado_aquecimento["pronto"] else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(status_code=codigo, content=estado_aquecimento)
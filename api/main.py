@@ -1,23 +1,46 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 
 from carros.routers import carros_router
 from clientes.routers import clientes_router
+from core.aquecimento import executar_aquecimento
 from corridas.routers import corridas_router
+from health.routers import health_router
 from mapas_rotas.routers import mapas_router
 from motoristas.routers import motoristas_router
+from precificacao.routers import precificacao_router
+from precificacao.services.registro_niveis import registro_niveis
+
+
+# Pré-carrega grafos, índices espaciais e endereços em segundo plano durante a inicialização.
+# Enquanto isso, /health/ready responde 503 para que o balanceador segure o tráfego.
+# A tabela de níveis de taxas é verificada periodicamente enquanto a API estiver no ar.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tarefa_aquecimento = asyncio.create_task(executar_aquecimento())
+    tarefa_niveis = asyncio.create_task(registro_niveis.monitorar())
+    yield
+    tarefa_aquecimento.cancel()
+    tarefa_niveis.cancel()
+
 
 app = FastAPI(
     title="API de Corridas",
     description="API para gerenciamento de corridas, motoristas, clientes e mapas.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+app.include_router(health_router.router)
 app.include_router(mapas_router.router)
 app.include_router(carros_router.router)
 app.include_router(motoristas_router.router)
 app.include_router(clientes_router.router)
 app.include_router(corridas_router.router)
+app.include_router(precificacao_router.router)
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=False)
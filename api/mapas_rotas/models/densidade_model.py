@@ -0,0 +1,27 @@
+from core.database import Base
+from sqlalchemy import Column, Integer, Date, Index, UniqueConstraint
+
+
+class DensidadeArestaModel(Base):
+    __tablename__ = 'tb_densidade_aresta'
+
+    id = Column(Integer, primary_key=True, autoincrement=True, unique=True, nullable=False)
+    data = Column(Date, nullable=False)
+    # Coordenadas das extremidades da aresta em graus * 1e5 (~1 m), com (a) <= (b)
+    lat_a = Column(Integer, nullable=False)
+    lon_a = Column(Integer, nullable=False)
+    lat_b = Column(Integer, nullable=False)
+    lon_b = Column(Integer, nullable=False)
+    total = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('data', 'lat_a', 'lon_a', 'lat_b', 'lon_b', name='uq_densidade_aresta'),
+        Index('ix_densidade_aresta_data', 'data'),
+    )
+
+
+class DensidadeControleModel(Base):
+    __tablename__ = 'tb_densidade_controle'
+
+    id = Column(Integer, primary_key=True, autoincrement=True, unique=True, nullable=False)
+    ultima_corrida_id = Column(Integer, nullable=False, default=0)
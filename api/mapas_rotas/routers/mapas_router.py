@@ -1,18 +1,26 @@
 import asyncio
-import io
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from pathlib import Path
+from typing import Optional
 
 import osmnx as ox
 import pandas as pd
 from core.dependencies import get_db
 from corridas.models.corrida_model import CorridaModel
-from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.responses import StreamingResponse
+from corridas.services.rota_service import registro_grafos
+from fastapi import APIRouter, HTTPException, status, Depends, Request
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from geopy.geocoders import Nominatim
-from mapas_rotas.services.visualizar_mapa import criar_mapa_interativo
+from mapas_rotas.services.amostrador_enderecos import amostrador_enderecos
+from mapas_rotas.services.cache_mapas import cache_mapas
+from mapas_rotas.services.densidade_rotas import (
+    LOTES_POR_REQUISICAO, atualizar_densidade, consultar_densidade, gerar_geojson_densidade
+)
+from mapas_rotas.services.visualizar_mapa import (
+    criar_mapa_densidade, criar_mapa_interativo, criar_mapa_leve, gerar_geojson_rota
+)
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session
 from unidecode import unidecode
@@ -22,6 +30,9 @@ router = APIRouter(prefix="/mapas_rotas", tags=["Mapas"])
 BASE_DIR = Path(__file__).resolve().parents[2] / "resources"
 BASE_DIR.mkdir(parents=True, exist_ok=True)
 
+# Máximo de pares de coordenadas por chamada de /coordenadas_aleatorias_lote
+MAX_PARES_LOTE = 10000
+
 
 # Carrega um grafo de um arquivo local se existir, ou baixa da internet e salva localmente.
 def carregar_ou_baixar_grafo(cidade: str, caminho: str):
@@ -98,6 +109,7 @@ async def gerar_mapa(cidade: str):
         inicio = datetime.now()
 
         grafo = await asyncio.to_thread(carregar_ou_baixar_grafo, cidade, graphml_path)
+        await asyncio.to_thread(registro_grafos.atualizar_indice)
         nodes = list(grafo.nodes)
         total_nodes = len(nodes)
         total_lotes = total_nodes // 2 + (1 if total_nodes % 2 != 0 else 0)
@@ -163,44 +175,52 @@ async def gerar_mapa(cidade: str):
         raise HTTPException(status_code=500, detail=f"Erro ao processar dados do mapa: {str(e)}")
 
 
+# Lista as cidades com grafo disponível, com tempo de carga, memória estimada e uso de cada uma.
+@router.get("/grafos", status_code=status.HTTP_200_OK, summary="Estatísticas dos grafos carregados")
+async def estatisticas_grafos():
+    return await asyncio.to_thread(registro_grafos.estatisticas)
+
+
 # Seleciona dois pontos aleatórios (origem e destino) de uma cidade para criar uma rota.
 @router.get("/coordenadas_aleatorias", status_code=status.HTTP_200_OK)
 async def coordenadas_aleatorias_para_rota(cidade: str):
-    nome_cidade = unidecode(cidade.split(",")[0].strip().lower().replace(" ", "-"))
-    csv_path = os.path.join(BASE_DIR, f"{nome_cidade}_enderecos_tratados.csv")
-
-    if not os.path.exists(csv_path):
-        raise HTTPException(status_code=404,
-                            detail="Arquivo de localizações não encontrado para a cidade especificada.")
-
-    df_nodes = await asyncio.to_thread(pd.read_csv, csv_path)
-    df_nodes_filtrado = df_nodes[df_nodes["bairro"] != "Desconhecido"]
-
-    if df_nodes_filtrado.empty:
-        raise HTTPException(status_code=400, detail="Não há locais com bairros válidos para selecionar.")
-
-    amostra = await asyncio.to_thread(lambda: df_nodes_filtrado.sample(n=2).to_dict(orient="records"))
-    origem, destino = amostra[0], amostra[1]
-
-    return {
-        "origem": {
-            "latitude": origem["latitude"],
-            "longitude": origem["longitude"],
-            "nome_rua": origem["rua"],
-            "bairro": origem["bairro"]
-        },
-        "destino": {
-            "latitude": destino["latitude"],
-            "longitude": destino["longitude"],
-            "nome_rua": destino["rua"],
-            "bairro": destino["bairro"]
-        }
-    }
+    try:
+        origem, destino = await asyncio.to_thread(amostrador_enderecos.sortear_par, cidade)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"origem": origem, "destino": destino}
+
+
+# Sorteia vários pares de origem e destino em uma única chamada (para simuladores e testes de carga).
+@router.get("/coordenadas_aleatorias_lote", status_code=status.HTTP_200_OK)
+async def coordenadas_aleatorias_lote(cidade: str, quantidade: int = 100, semente: Optional[int] = None):
+    if not 1 <= quantidade <= MAX_PARES_LOTE:
+        raise HTTPException(status_code=400, detail=f"Quantidade deve estar entre 1 e {MAX_PARES_LOTE}.")
+
+    try:
+        pares = await asyncio.to_thread(amostrador_enderecos.sortear_pares, cidade, quantidade, semente)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"pares": pares}
 
 
 # Gera e retorna um mapa interativo com a rota de uma corrida específica.
+# O resultado é cacheado por (corrida_id, última modificação, variante) e validado via ETag/If-None-Match.
 @router.get("/visualizar_corrida", status_code=status.HTTP_200_OK, summary="Visualizar mapa interativo de uma corrida")
-async def visualizar_mapa_de_corrida(corrida_id: int, db: Session = Depends(get_db)):
+async def visualizar_mapa_de_corrida(request: Request, corrida_id: int, modo: str = "completo", zoom: int = 14,
+                                     db: Session = Depends(get_db)):
+    if modo not in ("completo", "leve", "geojson"):
+        raise HTTPException(status_code=400, detail="Modo inválido. Use 'completo', 'leve' ou 'geojson'.")
+
+    if not 0 <= zoom <= 20:
+        raise HTTPException(status_code=400, detail="Zoom deve estar entre 0 e 20.")
+
     query = select(CorridaModel).filter(CorridaModel.id == corrida_id)
     result = await db.execute(query)
     corrida = result.scalars().first()
@@ -211,17 +231,69 @@ async def visualizar_mapa_de_corrida(corrida_id: int, db: Session = Depends(get_
     if not corrida.coordenadas_rota:
         raise HTTPException(status_code=400, detail="Nenhuma rota disponível para esta corrida")
 
+    ultima_modificacao = corrida.atualizado_em or corrida.horario_pedido
+    variante = modo if modo == "completo" else f"{modo}-{zoom}"
+    etag = cache_mapas.gerar_etag(corrida.id, ultima_modificacao, variante)
+
+    if modo == "geojson":
+        media_type = "application/geo+json"
+        headers = {}
+    else:
+        media_type = "text/html"
+        headers = {"Content-Disposition": f"attachment; filename=mapa-corrida-{corrida_id}.html"}
+    headers.update({"ETag": f'"{etag}"', "Cache-Control": "no-cache"})
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [valor.strip().removeprefix("W/").strip('"') for valor in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": headers["ETag"]})
+
+    conteudo = await asyncio.to_thread(cache_mapas.obter, corrida.id, etag)
+
+    if conteudo is None:
+        try:
+            coordenadas_rota = [
+                (float(lat), float(lon))
+                for point in corrida.coordenadas_rota.split("|")
+                for lat, lon in [point.split(",")]
+            ]
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao processar coordenadas da rota: {str(e)}")
+
+        if modo == "geojson":
+            geojson = gerar_geojson_rota(corrida, coordenadas_rota, zoom)
+            conteudo = json.dumps(geojson, ensure_ascii=False).encode("utf-8")
+        elif modo == "leve":
+            conteudo = criar_mapa_leve(corrida, coordenadas_rota, zoom).encode("utf-8")
+        else:
+            conteudo = criar_mapa_interativo(corrida, coordenadas_rota).encode("utf-8")
+
+        await asyncio.to_thread(cache_mapas.salvar, corrida.id, etag, conteudo)
+
+    return Response(content=conteudo, media_type=media_type, headers=headers)
+
+
+# Agrega o uso das ruas por várias corridas em uma janela de datas e retorna um mapa de densidade.
+# Antes da consulta, apenas as corridas novas são incorporadas à tabela de contagens por aresta (no máximo
+# LOTES_POR_REQUISICAO lotes; o histórico é incorporado em segundo plano no aquecimento).
+@router.get("/densidade_rotas", status_code=status.HTTP_200_OK, summary="Mapa de densidade de rotas")
+async def densidade_rotas(inicio: Optional[date] = None, fim: Optional[date] = None, formato: str = "html",
+                          limite: int = 5000, db: Session = Depends(get_db)):
+    if formato not in ("html", "geojson"):
+        raise HTTPException(status_code=400, detail="Formato inválido. Use 'html' ou 'geojson'.")
+
+    if limite <= 0:
+        raise HTTPException(status_code=400, detail="O limite deve ser maior que zero.")
+
     try:
-        coordenadas_rota = [
-            (float(lat), float(lon))
-            for point in corrida.coordenadas_rota.split("|")
-            for lat, lon in [point.split(",")]
-        ]
+        await atualizar_densidade(db, limite_lotes=LOTES_POR_REQUISICAO)
+        arestas = await consultar_densidade(db, inicio, fim, limite)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao processar coordenadas da rota: {str(e)}")
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Erro ao calcular densidade de rotas: {str(e)}")
+
+    geojson = gerar_geojson_densidade(arestas)
 
-    html_conteudo = criar_mapa_interativo(corrida, coordenadas_rota)
+    if formato == "geojson":
+        return JSONResponse(content=geojson, media_type="application/geo+json")
 
-    stream = io.StringIO(html_conteudo)
-    headers = {"Content-Disposition": f"attachment; filename=mapa-corrida-{corrida_id}.html"}
-    return StreamingResponse(stream, media_type="text/html", headers=headers)
\ No newline at end of file
+    return HTMLResponse(content=criar_mapa_densidade(geojson))
@@ -0,0 +1,75 @@
+import random
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from corridas.services.rota_service import normalizar_nome_cidade
+
+RESOURCES_DIR = Path(__file__).resolve().parents[2] / "resources"
+
+
+# Mantém em memória os endereços tratados de cada cidade (apenas os com bairro conhecido) para sortear
+# origens e destinos sem reler o CSV a cada requisição. O CSV é relido se o arquivo for alterado.
+class AmostradorEnderecos:
+    def __init__(self, diretorio: Path = RESOURCES_DIR):
+        self.diretorio = Path(diretorio)
+        self._enderecos = {}
+        self._lock = threading.Lock()
+
+    def caminho_csv(self, cidade: str) -> Path:
+        return self.diretorio / f"{normalizar_nome_cidade(cidade)}_enderecos_tratados.csv"
+
+    # Carrega (ou recarrega, se o CSV mudou) os endereços válidos da cidade.
+    def carregar(self, cidade: str) -> list:
+        caminho = self.caminho_csv(cidade)
+        if not caminho.exists():
+            raise FileNotFoundError("Arquivo de localizações não encontrado para a cidade especificada.")
+
+        modificado_em = caminho.stat().st_mtime
+        with self._lock:
+            em_cache = self._enderecos.get(caminho.name)
+            if em_cache and em_cache[0] == modificado_em:
+                return em_cache[1]
+
+        df_nodes = pd.read_csv(caminho)
+        df_nodes[["rua", "bairro"]] = df_nodes[["rua", "bairro"]].fillna("Desconhecido")
+        df_nodes_filtrado = df_nodes[df_nodes["bairro"] != "Desconhecido"]
+
+        enderecos = [
+            {
+                "latitude": float(linha.latitude),
+                "longitude": float(linha.longitude),
+                "nome_rua": linha.rua,
+                "bairro": linha.bairro,
+            }
+            for linha in df_nodes_filtrado.itertuples(index=False)
+        ]
+
+        with self._lock:
+            self._enderecos[caminho.name] = (modificado_em, enderecos)
+        return enderecos
+
+    # Sorteia um par (origem, destino) distinto de endereços da cidade.
+    def sortear_par(self, cidade: str, gerador: random.Random = random):
+        enderecos = self.carregar(cidade)
+        if len(enderecos) < 2:
+            raise ValueError("Não há locais com bairros válidos para selecionar.")
+        origem, destino = gerador.sample(enderecos, 2)
+        return origem, destino
+
+    # Sorteia vários pares (origem, destino) distintos de uma vez; com a mesma semente, os pares se repetem.
+    def sortear_pares(self, cidade: str, quantidade: int, semente: int = None) -> list:
+        enderecos = self.carregar(cidade)
+        if len(enderecos) < 2:
+            raise ValueError("Não há locais com bairros válidos para selecionar.")
+
+        gerador = np.random.default_rng(semente)
+        origens = gerador.integers(0, len(enderecos), quantidade)
+        # Sorteia o destino entre os demais endereços, pulando o índice da origem
+        destinos = gerador.integers(0, len(enderecos) - 1, quantidade)
+        destinos += destinos >= origens
+        return [{"origem": enderecos[o], "destino": enderecos[d]} for o, d in zip(origens.tolist(), destinos.tolist())]
+
+
+amostrador_enderecos = AmostradorEnderecos()
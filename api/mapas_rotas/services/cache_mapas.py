@@ -0,0 +1,110 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_DIR = Path(__file__).resolve().parents[2] / "resources" / "cache_mapas"
+CACHE_MAX_BYTES = int(float(os.getenv("CACHE_MAPAS_MAX_MB", "256")) * 1024 * 1024)
+
+
+# Cache em disco dos mapas renderizados, com despejo LRU limitado pelo tamanho total em bytes.
+# Os arquivos são nomeados como "<corrida_id>-<etag>" para permitir invalidar todas as variantes de uma corrida.
+class CacheMapas:
+    def __init__(self, diretorio: Path = CACHE_DIR, limite_bytes: int = CACHE_MAX_BYTES):
+        self.diretorio = Path(diretorio)
+        self.limite_bytes = limite_bytes
+        self._entradas = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._carregar_indice()
+
+    # Reconstrói o índice LRU a partir dos arquivos já existentes, do mais antigo para o mais recente.
+    def _carregar_indice(self):
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        arquivos = sorted(self.diretorio.iterdir(), key=lambda arquivo: arquivo.stat().st_mtime)
+        for arquivo in arquivos:
+            if arquivo.is_file() and not arquivo.name.startswith("."):
+                tamanho = arquivo.stat().st_size
+                self._entradas[arquivo.name] = tamanho
+                self._total_bytes += tamanho
+        self._despejar()
+
+    # Gera o ETag de uma variante do mapa a partir de (corrida_id, última modificação, variante).
+    @staticmethod
+    def gerar_etag(corrida_id: int, ultima_modificacao, variante: str) -> str:
+        base = f"{corrida_id}:{ultima_modificacao.isoformat() if ultima_modificacao else ''}:{variante}"
+        return hashlib.sha1(base.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _nome_arquivo(corrida_id: int, etag: str) -> str:
+        return f"{corrida_id}-{etag}"
+
+    # Retorna o conteúdo em cache (marcando-o como usado recentemente) ou None.
+    def obter(self, corrida_id: int, etag: str):
+        nome = self._nome_arquivo(corrida_id, etag)
+        with self._lock:
+            if nome not in self._entradas:
+                return None
+            self._entradas.move_to_end(nome)
+
+        try:
+            return (self.diretorio / nome).read_bytes()
+        except FileNotFoundError:
+            self._remover(nome)
+            return None
+
+    # Salva o conteúdo renderizado e despeja as entradas menos usadas se o limite for excedido.
+    # Cada gravação usa o próprio arquivo temporário, já que duas renderizações do mesmo mapa podem salvar ao mesmo
+    # tempo. O cache é só uma otimização: uma falha na gravação é registrada e ignorada.
+    def salvar(self, corrida_id: int, etag: str, conteudo: bytes):
+        if len(conteudo) > self.limite_bytes:
+            return
+
+        nome = self._nome_arquivo(corrida_id, etag)
+        caminho_tmp = None
+        try:
+            with tempfile.NamedTemporaryFile(dir=self.diretorio, prefix=f".{nome}.", suffix=".tmp",
+                                             delete=False) as arquivo_tmp:
+                caminho_tmp = Path(arquivo_tmp.name)
+                arquivo_tmp.write(conteudo)
+            os.replace(caminho_tmp, self.diretorio / nome)
+        except OSError as e:
+            print(f"Não foi possível salvar o mapa '{nome}' em cache: {e}")
+            if caminho_tmp is not None:
+                caminho_tmp.unlink(missing_ok=True)
+            return
+
+        with self._lock:
+            self._total_bytes -= self._entradas.pop(nome, 0)
+            self._entradas[nome] = len(conteudo)
+            self._total_bytes += len(conteudo)
+            self._despejar()
+
+    # Remove todas as variantes em cache de uma corrida.
+    def invalidar(self, corrida_id: int):
+        prefixo = f"{corrida_id}-"
+        with self._lock:
+            nomes = [nome for nome in self._entradas if nome.startswith(prefixo)]
+        for nome in nomes:
+            self._remover(nome)
+
+    def _remover(self, nome: str):
+        with self._lock:
+            self._total_bytes -= self._entradas.pop(nome, 0)
+        (self.diretorio / nome).unlink(missing_ok=True)
+
+    # Deve ser chamado com o lock adquirido.
+    def _despejar(self):
+        while self._total_bytes > self.limite_bytes and self._entradas:
+            nome, tamanho = self._entradas.popitem(last=False)
+            self._total_bytes -= tamanho
+            (self.diretorio / nome).unlink(missing_ok=True)
+
+
+cache_mapas = CacheMapas()
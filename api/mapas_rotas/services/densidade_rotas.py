@@ -0,0 +1,165 @@
+from collections import Counter
+
+from corridas.models.corrida_model import CorridaModel
+from mapas_rotas.models.densidade_model import DensidadeArestaModel, DensidadeControleModel
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+ESCALA_COORDENADAS = 100000
+TAMANHO_LOTE = 5000
+LINHAS_POR_INSERT = 2000
+
+# Id da única linha de controle (marca d'água) da tabela de densidade
+ID_CONTROLE = 1
+
+# Lotes incorporados por requisição de densidade; o histórico inteiro é incorporado em segundo plano no aquecimento
+LOTES_POR_REQUISICAO = 4
+
+
+# Converte uma coordenada em graus para o inteiro usado como chave (precisão de ~1 m).
+def ajustar_coordenada(valor: float) -> int:
+    return int(round(float(valor) * ESCALA_COORDENADAS))
+
+
+# Conta as arestas (pares de pontos consecutivos) de uma rota serializada como "lat,lon|lat,lon|...".
+# As arestas são não direcionadas: a extremidade menor sempre vem primeiro.
+def contar_arestas(coordenadas_rota: str, contador: Counter, data):
+    pontos = []
+    for ponto in coordenadas_rota.split("|"):
+        lat, lon = ponto.split(",")
+        pontos.append((ajustar_coordenada(lat), ajustar_coordenada(lon)))
+
+    for a, b in zip(pontos, pontos[1:]):
+        if a == b:
+            continue
+        if b < a:
+            a, b = b, a
+        contador[(data, a[0], a[1], b[0], b[1])] += 1
+
+
+# Soma as contagens na tabela de densidade com INSERT ... ON DUPLICATE KEY (ou ON CONFLICT no SQLite) em lotes.
+async def _somar_contagens(db: AsyncSession, contador: Counter):
+    if not contador:
+        return
+
+    linhas = [
+        {"data": data, "lat_a": lat_a, "lon_a": lon_a, "lat_b": lat_b, "lon_b": lon_b, "total": total}
+        for (data, lat_a, lon_a, lat_b, lon_b), total in contador.items()
+    ]
+
+    for i in range(0, len(linhas), LINHAS_POR_INSERT):
+        lote = linhas[i:i + LINHAS_POR_INSERT]
+        if db.bind.dialect.name == "sqlite":
+            stmt = sqlite_insert(DensidadeArestaModel).values(lote)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["data", "lat_a", "lon_a", "lat_b", "lon_b"],
+                set_={"total": DensidadeArestaModel.total + stmt.excluded.total},
+            )
+        else:
+            stmt = mysql_insert(DensidadeArestaModel).values(lote)
+            stmt = stmt.on_duplicate_key_update(total=DensidadeArestaModel.total + stmt.inserted.total)
+
+        await db.execute(stmt)
+
+
+# Cria a linha de controle se ela ainda não existir. O INSERT idempotente (ON DUPLICATE KEY / ON CONFLICT) permite
+# que duas chamadas concorrentes tentem criá-la sem erro e sem duplicar a marca d'água.
+async def garantir_controle(db: AsyncSession):
+    valores = {"id": ID_CONTROLE, "ultima_corrida_id": 0}
+    if db.bind.dialect.name == "sqlite":
+        stmt = sqlite_insert(DensidadeControleModel).values(valores).on_conflict_do_nothing(index_elements=["id"])
+    else:
+        stmt = mysql_insert(DensidadeControleModel).values(valores)
+        stmt = stmt.on_duplicate_key_update(id=DensidadeControleModel.id)
+    await db.execute(stmt)
+    await db.commit()
+
+
+# Incorpora à tabela de densidade apenas as corridas criadas desde a última execução (marca d'água em id), em até
+# "limite_lotes" lotes (None = até acabarem). Retorna a quantidade de corridas processadas.
+async def atualizar_densidade(db: AsyncSession, tamanho_lote: int = TAMANHO_LOTE, limite_lotes: int = None) -> int:
+    processadas = 0
+    lotes = 0
+
+    while limite_lotes is None or lotes < limite_lotes:
+        query = select(DensidadeControleModel).where(DensidadeControleModel.id == ID_CONTROLE).with_for_update()
+        controle = (await db.execute(query)).scalars().first()
+        if not controle:
+            await garantir_controle(db)
+            continue
+
+        query = (
+            select(CorridaModel.id, CorridaModel.horario_pedido, CorridaModel.coordenadas_rota)
+            .where(CorridaModel.id > controle.ultima_corrida_id)
+            .order_by(CorridaModel.id)
+            .limit(tamanho_lote)
+        )
+        corridas = (await db.execute(query)).all()
+
+        if not corridas:
+            await db.commit()
+            return processadas
+
+        contador = Counter()
+        for id_corrida, horario_pedido, coordenadas_rota in corridas:
+            if coordenadas_rota:
+                contar_arestas(coordenadas_rota, contador, horario_pedido.date())
+
+        await _somar_contagens(db, contador)
+        controle.ultima_corrida_id = corridas[-1].id
+        await db.commit()
+
+        processadas += len(corridas)
+        lotes += 1
+        if len(corridas) < tamanho_lote:
+            return processadas
+
+    return processadas
+
+
+# Soma as contagens por aresta dentro da janela [inicio, fim] e devolve as arestas mais usadas.
+async def consultar_densidade(db: AsyncSession, inicio=None, fim=None, limite: int = 5000):
+    total = func.sum(DensidadeArestaModel.total).label("total")
+    query = select(
+        DensidadeArestaModel.lat_a, DensidadeArestaModel.lon_a,
+        DensidadeArestaModel.lat_b, DensidadeArestaModel.lon_b,
+        total,
+    )
+    if inicio is not None:
+        query = query.where(DensidadeArestaModel.data >= inicio)
+    if fim is not None:
+        query = query.where(DensidadeArestaModel.data <= fim)
+
+    query = (
+        query.group_by(
+            DensidadeArestaModel.lat_a, DensidadeArestaModel.lon_a,
+            DensidadeArestaModel.lat_b, DensidadeArestaModel.lon_b,
+        )
+        .order_by(total.desc())
+        .limit(limite)
+    )
+    return (await db.execute(query)).all()
+
+
+# Converte as arestas agregadas em um GeoJSON (uma LineString por aresta, com o total como peso).
+def gerar_geojson_densidade(arestas) -> dict:
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": [
+                        [lon_a / ESCALA_COORDENADAS, lat_a / ESCALA_COORDENADAS],
+                        [lon_b / ESCALA_COORDENADAS, lat_b / ESCALA_COORDENADAS],
+                    ],
+                },
+                "properties": {"total": int(total)},
+            }
+            for lat_a, lon_a, lat_b, lon_b, total in arestas
+        ],
+    }
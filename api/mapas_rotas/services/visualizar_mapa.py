@@ -1,6 +1,159 @@
+import json
+import math
+
 import folium
 from folium.plugins import Fullscreen
 from branca.element import Element
+from shapely.geometry import LineString
+
+# Metros por pixel no nível de zoom 0 (projeção Web Mercator, tiles de 256 px)
+METROS_POR_PIXEL_ZOOM_0 = 156543.03392
+METROS_POR_GRAU = 111320.0
+
+# Template estático do modo leve: apenas Leaflet + uma camada GeoJSON
+TEMPLATE_MAPA_LEVE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Corrida {corrida_id}</title>
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<style>html, body, #mapa {{ height: 100%; margin: 0; }}</style>
+</head>
+<body>
+<div id="mapa"></div>
+<script>
+var dados = {geojson};
+var mapa = L.map("mapa");
+L.tileLayer("https://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png", {{
+    attribution: "&copy; OpenStreetMap"
+}}).addTo(mapa);
+var camada = L.geoJSON(dados, {{
+    style: {{color: "#1E90FF", weight: 6, opacity: 0.8}},
+    pointToLayer: function (f, latlng) {{
+        return L.circleMarker(latlng, {{radius: 7, color: f.properties.cor, fillOpacity: 0.9}});
+    }},
+    onEachFeature: function (f, layer) {{ layer.bindPopup(f.properties.descricao); }}
+}}).addTo(mapa);
+mapa.fitBounds(camada.getBounds());
+</script>
+</body>
+</html>
+"""
+
+# Template estático do mapa de densidade: uma única camada GeoJSON com largura e cor proporcionais ao uso
+TEMPLATE_MAPA_DENSIDADE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Densidade de rotas</title>
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<style>html, body, #mapa {{ height: 100%; margin: 0; }}</style>
+</head>
+<body>
+<div id="mapa"></div>
+<script>
+var dados = {geojson};
+var maximo = {maximo};
+var mapa = L.map("mapa", {{preferCanvas: true}});
+L.tileLayer("https://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png", {{
+    attribution: "&copy; OpenStreetMap"
+}}).addTo(mapa);
+var camada = L.geoJSON(dados, {{
+    style: function (f) {{
+        var p = f.properties.total / maximo;
+        return {{color: "hsl(" + Math.round(60 - 60 * p) + ", 100%, 45%)", weight: 1 + 7 * p, opacity: 0.85}};
+    }},
+    onEachFeature: function (f, layer) {{ layer.bindTooltip(f.properties.total + " corridas"); }}
+}}).addTo(mapa);
+if (dados.features.length) {{ mapa.fitBounds(camada.getBounds()); }} else {{ mapa.setView([0, 0], 2); }}
+</script>
+</body>
+</html>
+"""
+
+
+# Calcula a tolerância (em graus) do Douglas-Peucker equivalente a um pixel no zoom informado.
+def tolerancia_por_zoom(zoom: int, latitude: float) -> float:
+    metros_por_pixel = METROS_POR_PIXEL_ZOOM_0 * math.cos(math.radians(latitude)) / (2 ** zoom)
+    return metros_por_pixel / METROS_POR_GRAU
+
+
+# Simplifica a rota com Douglas-Peucker, mantendo sempre origem e destino.
+def simplificar_rota(coordenadas_rota, zoom: int = 14):
+    if len(coordenadas_rota) < 3:
+        return list(coordenadas_rota)
+
+    latitude_media = sum(lat for lat, _ in coordenadas_rota) / len(coordenadas_rota)
+    linha = LineString([(lon, lat) for lat, lon in coordenadas_rota])
+    simplificada = linha.simplify(tolerancia_por_zoom(zoom, latitude_media), preserve_topology=False)
+    return [(lat, lon) for lon, lat in simplificada.coords]
+
+
+# Gera um GeoJSON com a rota simplificada (LineString) e os pontos de origem e destino.
+def gerar_geojson_rota(corrida, coordenadas_rota, zoom: int = 14) -> dict:
+    if not coordenadas_rota or len(coordenadas_rota) < 2:
+        raise ValueError("A rota precisa de pelo menos dois pontos válidos.")
+
+    rota = simplificar_rota(coordenadas_rota, zoom)
+    preco = f"{corrida.preco_total:.2f}" if corrida.preco_total is not None else None
+
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": [[round(lon, 6), round(lat, 6)] for lat, lon in rota],
+                },
+                "properties": {
+                    "corrida_id": corrida.id,
+                    "distancia_km": float(corrida.distancia_km),
+                    "preco_total": preco,
+                    "pontos_originais": len(coordenadas_rota),
+                    "pontos_simplificados": len(rota),
+                    "descricao": f"Distância total: {corrida.distancia_km:.2f} km"
+                                 + (f" | Preço total: R$ {preco}" if preco else ""),
+                },
+            },
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [float(corrida.origem_longitude), float(corrida.origem_latitude)],
+                },
+                "properties": {
+                    "cor": "green",
+                    "descricao": f"<b>📍 Origem</b><br>{corrida.origem_rua or 'Desconhecido'} - "
+                                 f"{corrida.origem_bairro or 'Desconhecido'}",
+                },
+            },
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [float(corrida.destino_longitude), float(corrida.destino_latitude)],
+                },
+                "properties": {
+                    "cor": "gray",
+                    "descricao": f"<b>🏁 Destino</b><br>{corrida.destino_rua or 'Desconhecido'} - "
+                                 f"{corrida.destino_bairro or 'Desconhecido'}",
+                },
+            },
+        ],
+    }
+
+
+# Cria o mapa no modo leve: um template estático com a rota simplificada em uma única camada GeoJSON.
+def criar_mapa_leve(corrida, coordenadas_rota, zoom: int = 14) -> str:
+    geojson = gerar_geojson_rota(corrida, coordenadas_rota, zoom)
+    return TEMPLATE_MAPA_LEVE.format(
+        corrida_id=corrida.id,
+        geojson=json.dumps(geojson, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/"),
+    )
+
 
 def criar_mapa_interativo(corrida, coordenadas_rota):
     # Verificação básica
@@ -99,4 +252,12 @@ def criar_mapa_interativo(corrida, coordenadas_rota):
     info_element = Element(info_html)
     mapa.get_root().html.add_child(info_element)
 
-    return mapa.get_root().render()
\ No newline at end of file
+    return mapa.get_root().render()
+
+# Cria o mapa de densidade de rotas a partir do GeoJSON agregado por aresta.
+def criar_mapa_densidade(geojson: dict) -> str:
+    maximo = max((feature["properties"]["total"] for feature in geojson["features"]), default=1)
+    return TEMPLATE_MAPA_DENSIDADE.format(
+        geojson=json.dumps(geojson, separators=(",", ":")),
+        maximo=maximo,
+    )
@@ -1,10 +1,16 @@
 import re
+from typing import List
 
 from carros.models.carro_model import CarroModel
+from carros.services.custo_carro import tabela_custos
 from core.dependencies import get_db
+from core.validacao import (
+    MENSAGEM_CONFLITO_LOTE, TAMANHO_BLOCO_CONSULTA, buscar_existentes, limpar_cpfs, verificar_unicidade
+)
 from fastapi import APIRouter, Depends, HTTPException, status
 from motoristas.models.motorista_model import MotoristaModel
 from pydantic import BaseModel
+from sqlalchemy import insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -164,6 +170,7 @@ async def criar_motorista(motorista: MotoristaCreate, db: AsyncSession = Depends
         db.add(novo_motorista)
         await db.commit()
         await db.refresh(novo_motorista)
+        tabela_custos.atualizar_motorista(novo_motorista.id, novo_motorista.id_carro)
 
         return {
             "status": "OK",
@@ -196,6 +203,62 @@ async def criar_motorista(motorista: MotoristaCreate, db: AsyncSession = Depends
         )
 
 
+# Cria vários motoristas de uma vez: valida os CPFs do lote juntos, verifica CPF, telefone e email com uma consulta
+# por coluna e grava os motoristas válidos em uma única transação, retornando os erros de cada linha recusada.
+@router.post("/lote", status_code=status.HTTP_200_OK, summary="Criar motoristas em lote")
+async def criar_motoristas_lote(motoristas: List[MotoristaCreate], db: AsyncSession = Depends(get_db)):
+    linhas = [motorista.model_dump() for motorista in motoristas]
+    erros = {}
+
+    cpfs, validos = limpar_cpfs([linha["cpf"] for linha in linhas])
+    for indice, (linha, cpf, valido) in enumerate(zip(linhas, cpfs, validos)):
+        linha["cpf"] = cpf
+        if not valido:
+            erros[indice] = "CPF inválido. Deve conter 11 dígitos numéricos."
+
+    carros_existentes = await buscar_existentes(db, CarroModel.id, [linha["id_carro"] for linha in linhas])
+    for indice, linha in enumerate(linhas):
+        if indice not in erros and linha["id_carro"] not in carros_existentes:
+            erros[indice] = "Carro não encontrado com o ID informado."
+
+    await verificar_unicidade(db, linhas, {
+        "cpf": MotoristaModel.cpf,
+        "telefone": MotoristaModel.telefone,
+        "email": MotoristaModel.email,
+    }, erros)
+
+    novos = [linha for indice, linha in enumerate(linhas) if indice not in erros]
+    ids_por_cpf = {}
+    if novos:
+        try:
+            await db.execute(insert(MotoristaModel), novos)
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(status_code=400, detail=MENSAGEM_CONFLITO_LOTE)
+        except Exception as e:
+            await db.rollback()
+            raise HTTPException(status_code=500, detail=f"Erro inesperado ao criar motoristas: {str(e)}")
+
+        # Recupera os ids gerados pelo CPF (coluna única)
+        cpfs_novos = [linha["cpf"] for linha in novos]
+        for inicio in range(0, len(cpfs_novos), TAMANHO_BLOCO_CONSULTA):
+            query = select(MotoristaModel.cpf, MotoristaModel.id, MotoristaModel.id_carro).where(
+                MotoristaModel.cpf.in_(cpfs_novos[inicio:inicio + TAMANHO_BLOCO_CONSULTA])
+            )
+            for cpf, id_motorista, id_carro in (await db.execute(query)).all():
+                ids_por_cpf[cpf] = id_motorista
+                tabela_custos.atualizar_motorista(id_motorista, id_carro)
+
+    return {
+        "status": "OK",
+        "recebidos": len(linhas),
+        "inseridos": len(novos),
+        "ids": [None if indice in erros else ids_por_cpf.get(linha["cpf"]) for indice, linha in enumerate(linhas)],
+        "erros": [{"indice": indice, "erro": erro} for indice, erro in sorted(erros.items())],
+    }
+
+
 # Atualiza os dados de um motorista existente com base no ID fornecido.
 @router.put("/{motorista_id}", summary="Editar motorista")
 async def editar_motorista(motorista_id: int, motorista: MotoristaUpdate, db: AsyncSession = Depends(get_db)):
@@ -225,6 +288,7 @@ async def editar_motorista(motorista_id: int, motorista: MotoristaUpdate, db: As
 
         await db.commit()
         await db.refresh(motorista_existente)
+        tabela_custos.atualizar_motorista(motorista_existente.id, motorista_existente.id_carro)
 
         return {
             "status": "OK",
@@ -256,6 +320,7 @@ async def excluir_motorista(motorista_id: int, db: AsyncSession = Depends(get_db
     try:
         await db.delete(motorista)
         await db.commit()
+        tabela_custos.remover_motorista(motorista_id)
         # 204 No Content -> não retorna nada
     except Exception as e:
         await db.rollback()
@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from core.database import Base
+from sqlalchemy import Column, Integer, Float, DateTime
+
+
+class NivelTaxaModel(Base):
+    __tablename__ = 'tb_nivel_taxa'
+
+    nivel = Column(Integer, primary_key=True, autoincrement=False, nullable=False)
+    taxa_manutencao = Column(Float, nullable=False, default=0.0)
+    taxa_limpeza = Column(Float, nullable=False, default=0.0)
+    taxa_pico = Column(Float, nullable=False, default=0.0)
+    taxa_noturna = Column(Float, nullable=False, default=0.0)
+    taxa_excesso_corridas = Column(Float, nullable=False, default=0.0)
+    taxa_cancelamento = Column(Float, nullable=False, default=0.0)
+    atualizado_em = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
@@ -0,0 +1,107 @@
+import asyncio
+import time
+from typing import List
+
+from core.dependencies import get_db
+from fastapi import APIRouter, Depends, HTTPException, status
+from precificacao.services.modelo_taxas import obter_modelo_taxas
+from precificacao.services.motor_precificacao import precificar_corridas
+from precificacao.services.registro_niveis import registro_niveis
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
+
+router = APIRouter(prefix="/precificacao", tags=["Precificação"])
+
+
+# Modelo de entrada com as taxas de uma configuração a ser estimada
+class ConfiguracaoTaxas(BaseModel):
+    taxa_manutencao: float = 0.0
+    taxa_limpeza: float = 0.0
+    taxa_pico: float = 0.0
+    taxa_noturna: float = 0.0
+    taxa_excesso_corridas: float = 0.0
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "taxa_manutencao": 0.3193,
+                "taxa_limpeza": 0.9522,
+                "taxa_pico": 0.7,
+                "taxa_noturna": 0.2963,
+                "taxa_excesso_corridas": 0.3475
+            }
+        }
+
+
+# Modelo de entrada com a corrida a ser precificada e o nível de taxa desejado
+class CorridaPrecificacao(BaseModel):
+    corrida_id: int
+    nivel_taxa: int = Field(ge=1, le=6)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "corrida_id": 1,
+                "nivel_taxa": 3
+            }
+        }
+
+
+# Rota para consultar a tabela de níveis de taxas em uso (versão, origem e taxas de cada nível).
+@router.get("/niveis", status_code=status.HTTP_200_OK, summary="Consultar tabela de níveis de taxas")
+async def consultar_niveis():
+    """Retorna a tabela de níveis de taxas publicada na API."""
+    tabela = registro_niveis.tabela()
+    if tabela is None:
+        raise HTTPException(status_code=503, detail="Tabela de níveis de taxas não disponível.")
+    return tabela.como_dict()
+
+
+# Rota para verificar imediatamente o JSON e a tabela do banco, sem esperar a próxima verificação periódica.
+@router.post("/niveis/recarregar", status_code=status.HTTP_200_OK, summary="Recarregar tabela de níveis de taxas")
+async def recarregar_niveis(db: AsyncSession = Depends(get_db)):
+    """Recarrega a tabela de níveis de taxas se o arquivo ou o banco mudaram."""
+    await asyncio.to_thread(registro_niveis.verificar_arquivo)
+    await registro_niveis.verificar_banco(db)
+
+    tabela = registro_niveis.tabela()
+    if tabela is None:
+        raise HTTPException(status_code=503, detail="Tabela de níveis de taxas não disponível.")
+    return {"versao": tabela.versao, "origem": tabela.origem}
+
+
+# Rota para estimar, em lote, o preço total de várias configurações de taxas com o modelo compilado.
+@router.post("/estimar", status_code=status.HTTP_200_OK, summary="Estimar preço com o modelo de taxas")
+async def estimar_precos(configuracoes: List[ConfiguracaoTaxas]):
+    """Estima o preço total de cada configuração de taxas."""
+    modelo = obter_modelo_taxas()
+    if modelo is None:
+        raise HTTPException(status_code=503, detail="Modelo de taxas não disponível. Exporte o modelo primeiro.")
+
+    inicio = time.perf_counter()
+    precos = modelo.prever_configuracoes([configuracao.model_dump() for configuracao in configuracoes])
+    duracao_us = (time.perf_counter() - inicio) * 1e6
+
+    return {
+        "total": len(configuracoes),
+        "tempo_us": round(duracao_us, 1),
+        "precos_estimados": [round(float(preco), 2) for preco in precos],
+    }
+
+
+# Rota para calcular as tarifas de uma ou várias corridas pendentes, sem finalizá-las.
+@router.post("/calcular", status_code=status.HTTP_200_OK, summary="Calcular tarifas de corridas")
+async def calcular_tarifas(itens: List[CorridaPrecificacao], db: AsyncSession = Depends(get_db)):
+    """Calcula as taxas e o preço total de corridas no status 'solicitado'."""
+    niveis_por_corrida = {item.corrida_id: item.nivel_taxa for item in itens}
+    try:
+        corridas, precos = await precificar_corridas(db, niveis_por_corrida)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    encontradas = {corrida.id for corrida in corridas}
+    return {
+        "total": len(corridas),
+        "corridas": [{"corrida_id": corrida.id, **preco} for corrida, preco in zip(corridas, precos)],
+        "nao_encontradas": [corrida_id for corrida_id in niveis_por_corrida if corrida_id not in encontradas],
+    }
@@ -0,0 +1,91 @@
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CAMINHO_MODELO_PADRAO = (
+    Path(__file__).resolve().parents[3] / "ambiente_teste" / "data" / "ml" / "resultados" / "modelo_taxas.npz"
+)
+MODELO_TAXAS_PATH = Path(os.getenv("MODELO_TAXAS_PATH", str(CAMINHO_MODELO_PADRAO)))
+
+
+# Modelo de preço exportado por ambiente_teste/ml/exportar_modelo.py (árvores achatadas em matrizes).
+# Avalia todas as árvores para um lote de amostras com operações vetorizadas, sem scikit-learn.
+class ModeloTaxasCompilado:
+    def __init__(self, esquerda, direita, feature, limiar, valor, profundidade, features):
+        self.quantidade_arvores, self.max_nos = esquerda.shape
+        self.profundidade = int(profundidade)
+        self.features = list(features)
+
+        # Matrizes achatadas com índices globais (árvore * max_nos + nó) para usar np.take
+        deslocamentos = (np.arange(self.quantidade_arvores, dtype=np.int64) * self.max_nos)[:, None]
+        self.esquerda = (esquerda + deslocamentos).ravel()
+        self.direita = (direita + deslocamentos).ravel()
+        self.feature = feature.astype(np.int64).ravel()
+        self.limiar = limiar.ravel()
+        self.valor = valor.ravel()
+        self._raizes = deslocamentos
+
+    @classmethod
+    def carregar(cls, caminho: Path):
+        with np.load(caminho, allow_pickle=False) as dados:
+            return cls(
+                esquerda=dados["esquerda"],
+                direita=dados["direita"],
+                feature=dados["feature"],
+                limiar=dados["limiar"],
+                valor=dados["valor"],
+                profundidade=dados["profundidade"],
+                features=dados["features"].tolist(),
+            )
+
+    # Retorna a média das árvores para cada linha de X (n_amostras x n_features).
+    # Assim como o scikit-learn, compara as features em float32 com os limiares em float64.
+    def prever(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+
+        X_plano = X.ravel()
+        bases = np.tile(np.arange(X.shape[0], dtype=np.int64) * X.shape[1], self.quantidade_arvores)
+        nos = np.repeat(self._raizes.ravel(), X.shape[0])
+
+        # Percorre apenas os pares (árvore, amostra) que ainda não chegaram a uma folha
+        ativos = np.arange(nos.size)
+        for _ in range(self.profundidade):
+            atuais = nos[ativos]
+            valores = np.take(X_plano, bases[ativos] + np.take(self.feature, atuais))
+            proximos = np.where(valores <= np.take(self.limiar, atuais),
+                                np.take(self.esquerda, atuais), np.take(self.direita, atuais))
+            nos[ativos] = proximos
+            ativos = ativos[proximos != atuais]
+            if ativos.size == 0:
+                break
+
+        folhas = np.take(self.valor, nos).reshape(self.quantidade_arvores, X.shape[0])
+        return folhas.sum(axis=0) / self.quantidade_arvores
+
+    # Prevê a partir de dicionários com as taxas (features ausentes valem 0). Uma lista vazia não tem previsões.
+    def prever_configuracoes(self, configuracoes: list) -> np.ndarray:
+        if not configuracoes:
+            return np.empty(0)
+        X = np.array([[float(config.get(f) or 0.0) for f in self.features] for config in configuracoes])
+        return self.prever(X)
+
+
+_modelo_taxas = None
+_lock = threading.Lock()
+
+
+# Carrega o modelo uma única vez por processo; retorna None se o arquivo não existir.
+def obter_modelo_taxas():
+    global _modelo_taxas
+    if _modelo_taxas is None and MODELO_TAXAS_PATH.exists():
+        with _lock:
+            if _modelo_taxas is None:
+                _modelo_taxas = ModeloTaxasCompilado.carregar(MODELO_TAXAS_PATH)
+    return _modelo_taxas
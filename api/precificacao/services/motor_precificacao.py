@@ -0,0 +1,125 @@
+from datetime import time
+
+import numpy as np
+from carros.services.custo_carro import tabela_custos
+from corridas.models.corrida_model import CorridaModel
+from corridas.services.contador_demanda import contador_demanda
+from precificacao.services.registro_niveis import NIVEIS_TAXAS_PATH, NIVEL_CANCELAMENTO, NIVEL_PADRAO, TAXAS, \
+    registro_niveis
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+TARIFA_FIXA_KM = 0.60
+PERCENTUAL_MOTORISTA = 0.78
+
+# Colunas da matriz de níveis
+MANUTENCAO, LIMPEZA, PICO, NOTURNA, EXCESSO, CANCELAMENTO = range(len(TAXAS))
+
+INTERVALOS_PICO = [(time(7, 0), time(8, 0)), (time(12, 0), time(13, 0)), (time(17, 30), time(18, 30))]
+
+
+# Converte um horário em segundos desde a meia-noite.
+def segundos_do_dia(horario) -> int:
+    return horario.hour * 3600 + horario.minute * 60 + horario.second
+
+
+# Tabelas pré-calculadas por segundo do dia (86.400 posições): horário de pico (intervalos fechados)
+# e horário noturno (a partir das 22h ou até as 6h, inclusive).
+def _montar_tabelas_horario():
+    segundos = np.arange(24 * 3600)
+    pico = np.zeros(segundos.size, dtype=bool)
+    for inicio, fim in INTERVALOS_PICO:
+        pico |= (segundos >= segundos_do_dia(inicio)) & (segundos <= segundos_do_dia(fim))
+    noturno = (segundos >= segundos_do_dia(time(22, 0))) | (segundos <= segundos_do_dia(time(6, 0)))
+    return pico, noturno
+
+
+EH_PICO, EH_NOTURNO = _montar_tabelas_horario()
+
+
+# Precifica um lote de corridas de uma vez. Todos os parâmetros são arrays do mesmo tamanho; custos_km é o custo
+# de combustível por km do carro de cada corrida. Retorna um dicionário de arrays com as taxas aplicadas e os
+# valores finais de cada corrida. Sem matriz informada, usa a tabela de níveis publicada no registro.
+def precificar_lote(distancias, segundos, custos_km, niveis, excesso, matriz_niveis: np.ndarray = None) -> dict:
+    matriz = matriz_niveis
+    if matriz is None:
+        tabela = registro_niveis.tabela()
+        if tabela is None:
+            raise FileNotFoundError(f"Arquivo de níveis de taxas não encontrado: {NIVEIS_TAXAS_PATH}")
+        matriz = tabela.matriz
+
+    distancias = np.asarray(distancias, dtype=float)
+    custos_km = np.asarray(custos_km, dtype=float)
+    niveis = np.asarray(niveis, dtype=int)
+    niveis = np.where((niveis >= 1) & (niveis < len(matriz)), niveis, NIVEL_PADRAO)
+    taxas = matriz[niveis]
+
+    cancelamento = niveis == NIVEL_CANCELAMENTO
+    pico = EH_PICO[segundos] & ~cancelamento
+    noturno = EH_NOTURNO[segundos] & ~cancelamento
+    excesso = np.asarray(excesso, dtype=bool) & ~cancelamento
+
+    aplicadas = {
+        "taxa_manutencao": taxas[:, MANUTENCAO],
+        "taxa_limpeza": np.where(cancelamento, 0.0, taxas[:, LIMPEZA]),
+        "taxa_pico": np.where(pico, taxas[:, PICO], 0.0),
+        "taxa_noturna": np.where(noturno, taxas[:, NOTURNA], 0.0),
+        "taxa_excesso_corridas": np.where(excesso, taxas[:, EXCESSO], 0.0),
+        "taxa_cancelamento": np.where(cancelamento, taxas[:, CANCELAMENTO], 0.0),
+    }
+
+    tarifa_base = custos_km + TARIFA_FIXA_KM
+    percentuais = (aplicadas["taxa_limpeza"] + aplicadas["taxa_pico"] + aplicadas["taxa_noturna"]
+                   + aplicadas["taxa_excesso_corridas"])
+    preco_por_km = tarifa_base * (1 + percentuais) + aplicadas["taxa_manutencao"]
+
+    preco_total = np.where(
+        cancelamento,
+        aplicadas["taxa_manutencao"] + aplicadas["taxa_cancelamento"],
+        preco_por_km * distancias,
+    )
+    preco_km = np.divide(preco_total, distancias, out=np.zeros_like(preco_total), where=distancias > 0)
+
+    return {
+        **aplicadas,
+        "preco_km": np.round(preco_km, 2),
+        "valor_motorista": np.round(preco_total * PERCENTUAL_MOTORISTA, 2),
+        "preco_total": np.round(preco_total, 2),
+        "nivel_taxa": niveis,
+    }
+
+
+# Carrega as corridas pendentes e calcula as tarifas de todas de uma vez.
+# O custo por km vem da tabela de custos dos carros, sem join com motoristas e carros.
+# Todas as corridas do lote usam a mesma versão da tabela de níveis, informada em "versao_niveis".
+# Retorna a lista de corridas encontradas e os resultados por corrida, na mesma ordem.
+async def precificar_corridas(db: AsyncSession, niveis_por_corrida: dict):
+    query = (
+        select(CorridaModel)
+        .where(CorridaModel.id.in_(niveis_por_corrida), CorridaModel.status == "solicitado")
+    )
+    corridas = (await db.execute(query)).scalars().all()
+    if not corridas:
+        return [], []
+
+    tabela = registro_niveis.tabela()
+    if tabela is None:
+        raise FileNotFoundError(f"Arquivo de níveis de taxas não encontrado: {NIVEIS_TAXAS_PATH}")
+
+    await contador_demanda.garantir_hidratado(db)
+    await tabela_custos.garantir_carregada(db)
+
+    resultado = precificar_lote(
+        distancias=[float(corrida.distancia_km) for corrida in corridas],
+        segundos=[segundos_do_dia(corrida.horario_pedido) for corrida in corridas],
+        custos_km=[tabela_custos.custo_por_km(corrida.id_motorista) for corrida in corridas],
+        niveis=[niveis_por_corrida[corrida.id] for corrida in corridas],
+        excesso=[contador_demanda.excesso(corrida.horario_pedido, corrida.origem_bairro) for corrida in corridas],
+        matriz_niveis=tabela.matriz,
+    )
+
+    precos = [
+        {**{campo: valores[i].item() for campo, valores in resultado.items()}, "versao_niveis": tabela.versao}
+        for i in range(len(corridas))
+    ]
+    return corridas, precos
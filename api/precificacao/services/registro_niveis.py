@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from core.database import SessionLocal
+from dotenv import load_dotenv
+from precificacao.models.nivel_taxa_model import NivelTaxaModel
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+load_dotenv()
+
+CAMINHO_NIVEIS_PADRAO = (
+    Path(__file__).resolve().parents[3] / "ambiente_teste" / "data" / "ml" / "resultados"
+    / "niveis_taxas_otimizadas.json"
+)
+NIVEIS_TAXAS_PATH = Path(os.getenv("NIVEIS_TAXAS_PATH", str(CAMINHO_NIVEIS_PADRAO)))
+NIVEIS_INTERVALO_VERIFICACAO_S = float(os.getenv("NIVEIS_INTERVALO_VERIFICACAO_S", "5"))
+
+NIVEL_PADRAO = 5
+NIVEL_CANCELAMENTO = 6
+
+# Ordem das colunas da matriz de níveis
+TAXAS = ["taxa_manutencao", "taxa_limpeza", "taxa_pico", "taxa_noturna", "taxa_excesso_corridas", "taxa_cancelamento"]
+
+# Nível 6 (personalizado): apenas taxa de manutenção e cancelamento
+NIVEL_6 = {
+    "taxa_manutencao": 1.0,
+    "taxa_limpeza": 0.0,
+    "taxa_pico": 0.0,
+    "taxa_noturna": 0.0,
+    "taxa_excesso_corridas": 0.0,
+    "taxa_cancelamento": 4.0
+}
+
+
+# Versão imutável de uma tabela de níveis: as taxas por nível e a matriz (nível x taxa) usada na precificação.
+# A versão é derivada do conteúdo, então recarregar a mesma tabela não gera uma versão nova.
+class TabelaNiveis:
+    def __init__(self, niveis: dict, origem: str):
+        self.niveis = {
+            str(nivel): {taxa: float(taxas.get(taxa) or 0.0) for taxa in TAXAS}
+            for nivel, taxas in sorted(niveis.items(), key=lambda item: int(item[0]))
+        }
+        self.origem = origem
+        conteudo = json.dumps(self.niveis, sort_keys=True).encode("utf-8")
+        self.versao = f"{origem}-{hashlib.sha1(conteudo).hexdigest()[:12]}"
+        self.carregada_em = datetime.now()
+
+        # Níveis desconhecidos usam o nível 5
+        maior_nivel = max(int(nivel) for nivel in self.niveis)
+        self.matriz = np.empty((maior_nivel + 1, len(TAXAS)))
+        self.matriz[:] = [self.niveis[str(NIVEL_PADRAO)][taxa] for taxa in TAXAS]
+        for nivel, taxas in self.niveis.items():
+            self.matriz[int(nivel)] = [taxas[taxa] for taxa in TAXAS]
+        self.matriz.setflags(write=False)
+
+    def como_dict(self) -> dict:
+        return {
+            "versao": self.versao,
+            "origem": self.origem,
+            "carregada_em": self.carregada_em.isoformat(),
+            "niveis": self.niveis,
+        }
+
+
+# Lê a tabela de níveis do JSON gerado pela otimização; o nível 6 é sempre o personalizado.
+def carregar_tabela_arquivo(caminho: Path) -> TabelaNiveis:
+    with open(caminho, "r", encoding="utf-8") as f:
+        niveis = json.load(f)
+    if str(NIVEL_PADRAO) not in niveis:
+        raise ValueError(f"O nível {NIVEL_PADRAO} é obrigatório na tabela de níveis.")
+    niveis[str(NIVEL_CANCELAMENTO)] = NIVEL_6
+    return TabelaNiveis(niveis, origem="arquivo")
+
+
+# Registro da tabela de níveis em uso pela API.
+# Mantém a última versão válida do JSON e da tabela tb_nivel_taxa (que tem prioridade quando não está vazia)
+# e troca a tabela publicada de uma só vez; quem precifica pega a referência uma vez por lote, sem ler arquivos.
+class RegistroNiveis:
+    def __init__(self, caminho: Path = NIVEIS_TAXAS_PATH):
+        self.caminho = Path(caminho)
+        self._tabela = None
+        self._tabela_arquivo = None
+        self._tabela_banco = None
+        self._assinatura_arquivo = None
+        self._assinatura_banco = None
+        self._lock = threading.Lock()
+
+    # Tabela publicada (carrega o JSON na primeira chamada); None se não houver nenhuma tabela válida.
+    def tabela(self):
+        if self._tabela is None:
+            self.verificar_arquivo()
+        return self._tabela
+
+    # Recarrega o JSON se a data de modificação ou o tamanho mudaram. Um arquivo inválido mantém a versão anterior.
+    def verificar_arquivo(self) -> bool:
+        try:
+            estado = self.caminho.stat()
+        except FileNotFoundError:
+            return False
+
+        assinatura = (estado.st_mtime_ns, estado.st_size)
+        if assinatura == self._assinatura_arquivo:
+            return False
+
+        try:
+            tabela = carregar_tabela_arquivo(self.caminho)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Guarda a assinatura para só tentar de novo quando o arquivo mudar outra vez
+            self._assinatura_arquivo = assinatura
+            print(f"Tabela de níveis inválida em {self.caminho.name}, mantendo a versão anterior: {e}")
+            return False
+
+        with self._lock:
+            self._assinatura_arquivo = assinatura
+            self._tabela_arquivo = tabela
+        return self._publicar()
+
+    # Recarrega tb_nivel_taxa se a quantidade de linhas ou a última atualização mudaram.
+    async def verificar_banco(self, db: AsyncSession) -> bool:
+        quantidade, atualizado_em = (await db.execute(
+            select(func.count(NivelTaxaModel.nivel), func.max(NivelTaxaModel.atualizado_em))
+        )).one()
+        assinatura = (quantidade, atualizado_em)
+        if assinatura == self._assinatura_banco:
+            return False
+
+        tabela = None
+        if quantidade:
+            linhas = (await db.execute(select(NivelTaxaModel))).scalars().all()
+            niveis = {str(linha.nivel): {taxa: getattr(linha, taxa) for taxa in TAXAS} for linha in linhas}
+            if str(NIVEL_PADRAO) not in niveis:
+                print(f"Tabela tb_nivel_taxa sem o nível {NIVEL_PADRAO}, ignorada.")
+            else:
+                niveis.setdefault(str(NIVEL_CANCELAMENTO), NIVEL_6)
+                tabela = TabelaNiveis(niveis, origem="banco")
+
+        with self._lock:
+            self._assinatura_banco = assinatura
+            self._tabela_banco = tabela
+        return self._publicar()
+
+    # Publica a tabela do banco (ou, na falta dela, a do arquivo) se a versão mudou.
+    def _publicar(self) -> bool:
+        with self._lock:
+            nova = self._tabela_banco or self._tabela_arquivo
+            if nova is None or (self._tabela is not None and nova.versao == self._tabela.versao):
+                return False
+            self._tabela = nova
+        print(f"Tabela de níveis {nova.versao} publicada.")
+        return True
+
+    # Verifica periodicamente o JSON e o banco; roda em segundo plano durante a vida da API.
+    async def monitorar(self, intervalo_s: float = NIVEIS_INTERVALO_VERIFICACAO_S):
+        erro_banco = None
+        while True:
+            await asyncio.to_thread(self.verificar_arquivo)
+            try:
+                async with SessionLocal() as db:
+                    await self.verificar_banco(db)
+                erro_banco = None
+            except Exception as e:
+                if str(e) != erro_banco:
+                    print(f"Não foi possível verificar a tabela de níveis no banco: {e}")
+                erro_banco = str(e)
+            await asyncio.sleep(intervalo_s)
+
+
+registro_niveis = RegistroNiveis()